@@ -16,19 +16,38 @@
     3）根据约定，根据pdf本地路径，推导出pdf模型的json，并读入
     
 
+第三个：
+  接收一个本地目录、glob通配符或者jsonl清单(每行和第一个命令读到的json一样，含file_location和doc_layout_result)，然后：
+    1）在一个有上限的进程池里并发执行 分类->解析->生成markdown，每个文档一个子进程
+    2）每个文档有超时时间，失败或超时后可以重试
+    3）每个文档的最终状态追加写入进度文件(ledger)，再次用同一种解析方法运行时跳过已经成功的文档
+    4）输出写在 magic-pdf/{文件名}_{路径的hash}/{method} 下，不同目录下的同名pdf不会互相覆盖
+
 效果：
 python magicpdf.py --json  s3://llm-pdf-text/scihub/xxxx.json?bytes=0,81350 
 python magicpdf.py --pdf  /home/llm/Downloads/xxxx.pdf --model /home/llm/Downloads/xxxx.json  或者 python magicpdf.py --pdf  /home/llm/Downloads/xxxx.pdf
+python magicpdf.py batch-command --input /home/llm/Downloads/pdfs --workers 8 --timeout 600 --retry 1
 """
 
 import os
+import glob
+import importlib
 import json as json_parse
 import sys
+import time
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
 import click
 from loguru import logger
 from pathlib import Path
 
+from magic_pdf.filter.classify_cache import ClassifyCache
 from magic_pdf.libs.draw_bbox import draw_layout_bbox, draw_span_bbox
+from magic_pdf.libs.hash_utils import compute_sha256
+from magic_pdf.libs.pdf_image_tools import skip_existing_images
+from magic_pdf.libs.nlp_utils import get_spacy_model
+from magic_pdf.libs.perf_recorder import PerfRecorder
 from magic_pdf.pipe.UNIPipe import UNIPipe
 from magic_pdf.pipe.OCRPipe import OCRPipe
 from magic_pdf.pipe.TXTPipe import TXTPipe
@@ -45,6 +64,15 @@ from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
 
 parse_pdf_methods = click.Choice(["ocr", "txt", "auto"])
 
+'''
+batch-command在fork子进程之前预先加载的重型依赖，这些依赖平时都是第一次用到时才加载的
+不预先加载的话，每个文档的子进程都要各自重新加载一遍
+'''
+BATCH_WARM_UP_SPACY_MODELS = ["en_core_web_sm", "zh_core_web_sm"]
+BATCH_WARM_UP_MODULES = ["wordninja"]
+BATCH_WARM_UP_S3_MODULES = ["boto3", "botocore.config", "s3pathlib"]
+classify_cache_help = "分类结果缓存的本地目录或s3路径，同一个pdf重跑时不再分类"
+
 
 def prepare_env(pdf_file_name, method):
     local_parent_dir = os.path.join(
@@ -58,13 +86,33 @@ def prepare_env(pdf_file_name, method):
     return local_image_dir, local_md_dir
 
 
-def _do_parse(pdf_file_name, pdf_bytes, model_list, parse_method, image_writer, md_writer, image_dir, local_md_dir):
+def get_classify_cache(classify_cache_path):
+    """
+    classify_cache_path为s3路径时用magic-pdf.json里这个bucket的ak,sk缓存到s3上，否则缓存到本地目录，为None时不缓存
+    """
+    if classify_cache_path is None:
+        return None
+    if classify_cache_path.startswith("s3://"):
+        bucket, _ = parse_s3path(classify_cache_path)
+        s3_ak, s3_sk, s3_endpoint = get_s3_config(bucket)
+        return ClassifyCache(S3ReaderWriter(s3_ak, s3_sk, s3_endpoint, "auto", classify_cache_path))
+    return ClassifyCache(classify_cache_path)
+
+
+def _do_parse(pdf_file_name, pdf_bytes, model_list, parse_method, image_writer, md_writer, image_dir, local_md_dir,
+              profile=False, classify_cache_path=None):
+    """
+    profile为True时，记录各阶段耗时，写到{pdf_file_name}_perf.json
+    classify_cache_path: auto模式下分类结果缓存的位置，见get_classify_cache
+    """
+    recorder = PerfRecorder(enabled=profile)
     if parse_method == "auto":
-        pipe = UNIPipe(pdf_bytes, model_list, image_writer, is_debug=True)
+        pipe = UNIPipe(pdf_bytes, model_list, image_writer, is_debug=True, recorder=recorder,
+                       classify_cache=get_classify_cache(classify_cache_path))
     elif parse_method == "txt":
-        pipe = TXTPipe(pdf_bytes, model_list, image_writer, is_debug=True)
+        pipe = TXTPipe(pdf_bytes, model_list, image_writer, is_debug=True, recorder=recorder)
     elif parse_method == "ocr":
-        pipe = OCRPipe(pdf_bytes, model_list, image_writer, is_debug=True)
+        pipe = OCRPipe(pdf_bytes, model_list, image_writer, is_debug=True, recorder=recorder)
     else:
         print("unknow parse method")
         os.exit(1)
@@ -72,8 +120,9 @@ def _do_parse(pdf_file_name, pdf_bytes, model_list, parse_method, image_writer,
     pipe.pipe_classify()
     pipe.pipe_parse()
     pdf_info = pipe.pdf_mid_data['pdf_info']
-    draw_layout_bbox(pdf_info, pdf_bytes, local_md_dir)
-    draw_span_bbox(pdf_info, pdf_bytes, local_md_dir)
+    with recorder.stage("draw_bbox"):
+        draw_layout_bbox(pdf_info, pdf_bytes, local_md_dir)
+        draw_span_bbox(pdf_info, pdf_bytes, local_md_dir)
     md_content = pipe.pipe_mk_markdown(image_dir)
     #part_file_name = datetime.now().strftime("%H-%M-%S")
     md_writer.write(
@@ -91,6 +140,219 @@ def _do_parse(pdf_file_name, pdf_bytes, model_list, parse_method, image_writer,
     md_writer.write(
         str(content_list), f"{pdf_file_name}.txt", AbsReaderWriter.MODE_TXT
     )
+    if profile:
+        md_writer.write(recorder.to_json(indent=4), f"{pdf_file_name}_perf.json", AbsReaderWriter.MODE_TXT)
+
+
+def read_s3_path(s3path):
+    bucket, key = parse_s3path(s3path)
+
+    s3_ak, s3_sk, s3_endpoint = get_s3_config(bucket)
+    s3_rw = S3ReaderWriter(
+        s3_ak, s3_sk, s3_endpoint, "auto", remove_non_official_s3_args(s3path)
+    )
+    may_range_params = parse_s3_range_params(s3path)
+    if may_range_params is None or 2 != len(may_range_params):
+        byte_start, byte_end = 0, None
+    else:
+        byte_start, byte_end = int(may_range_params[0]), int(may_range_params[1])
+        byte_end += byte_start - 1
+    return s3_rw.read_jsonl(
+        remove_non_official_s3_args(s3path),
+        byte_start,
+        byte_end,
+        AbsReaderWriter.MODE_BIN,
+    )
+
+
+def read_local_path(path):
+    disk_rw = DiskReaderWriter(os.path.dirname(path))
+    return disk_rw.read(os.path.basename(path), AbsReaderWriter.MODE_BIN)
+
+
+def _collect_batch_tasks(input_path):
+    """
+    把目录、glob通配符或者jsonl清单展开成任务列表，每个任务用key唯一标识
+    """
+    tasks = []
+    if os.path.isfile(input_path) and input_path.endswith(".jsonl"):
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                jso = json_parse.loads(line)
+                tasks.append({"key": jso["file_location"], "record": jso})
+        return tasks
+
+    if os.path.isdir(input_path):
+        pdf_paths = glob.glob(os.path.join(input_path, "*.pdf"))
+    else:
+        pdf_paths = glob.glob(input_path)
+    for pdf_path in sorted(pdf_paths):
+        model_path = pdf_path.replace(".pdf", ".json")
+        if not os.path.exists(model_path):
+            logger.warning(f"model json {model_path} not found, skip {pdf_path}")
+            continue
+        tasks.append({"key": os.path.abspath(pdf_path), "pdf": pdf_path, "model": model_path})
+    return tasks
+
+
+def _get_batch_task_location(task):
+    return task["record"]["file_location"] if "record" in task else task["pdf"]
+
+
+def _get_batch_output_name(task):
+    """
+    批量处理时每个文档的输出目录名: {文件名}_{key的sha256前8位}
+    不同目录下同名的pdf(例如s3://a/x.pdf和s3://b/x.pdf)会同时处理，只用文件名的话会互相覆盖输出
+    """
+    pdf_file_name = Path(remove_non_official_s3_args(_get_batch_task_location(task))).stem
+    return f"{pdf_file_name}_{compute_sha256(task['key'])[:8]}"
+
+
+def _batch_parse_one(task, method, classify_cache_path=None):
+    """
+    子进程中处理一个文档，成功时进程退出码为0
+    输出写到 magic-pdf/{_get_batch_output_name(task)}/{method} 下，文件名仍然是pdf的文件名
+    """
+    try:
+        if "record" in task:
+            jso = task["record"]
+            pdf_location = jso["file_location"]
+            if pdf_location.startswith("s3://"):
+                pdf_data = read_s3_path(pdf_location)
+            else:
+                pdf_data = read_local_path(pdf_location)
+            model_list = jso["doc_layout_result"]
+        else:
+            pdf_location = task["pdf"]
+            pdf_data = read_local_path(pdf_location)
+            model_list = json_parse.loads(read_local_path(task["model"]).decode("utf-8"))
+
+        pdf_file_name = Path(remove_non_official_s3_args(pdf_location)).stem
+        local_image_dir, local_md_dir = prepare_env(_get_batch_output_name(task), method)
+        local_image_rw, local_md_rw = DiskReaderWriter(local_image_dir), DiskReaderWriter(
+            local_md_dir
+        )
+        # 重试和续跑时输出目录里可能已经有上一次写好的截图
+        skip_existing_images(local_image_rw)
+        _do_parse(
+            pdf_file_name,
+            pdf_data,
+            model_list,
+            method,
+            local_image_rw,
+            local_md_rw,
+            os.path.basename(local_image_dir),
+            local_md_dir,
+            classify_cache_path=classify_cache_path,
+        )
+    except Exception as e:
+        logger.exception(e)
+        sys.exit(1)
+
+
+def _load_batch_ledger(ledger_path, method):
+    """
+    读取进度文件，返回已经用method成功处理的任务key
+    同一个文档换一种解析方法重跑时不能被跳过，所以只认method相同的记录
+    """
+    done = set()
+    if not os.path.exists(ledger_path):
+        return done
+    with open(ledger_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json_parse.loads(line)
+            except ValueError:  # 上次运行被中断时可能留下不完整的行
+                continue
+            if record.get("status") == "success" and record.get("method") == method:
+                done.add(record["key"])
+    return done
+
+
+def _warm_up_batch_worker(tasks):
+    """
+    在父进程中加载spacy模型、wordninja词表，有s3上的文档时再加上boto3，fork出来的子进程直接继承
+    某个依赖没有安装时只记一条警告，子进程里真正用到时照常报错
+    """
+    for model_name in BATCH_WARM_UP_SPACY_MODELS:
+        try:
+            get_spacy_model(model_name)
+        except Exception as e:
+            logger.warning(f"warm up spacy model {model_name} failed: {e}")
+    module_names = list(BATCH_WARM_UP_MODULES)
+    if any(task["key"].startswith("s3://") for task in tasks):
+        module_names += BATCH_WARM_UP_S3_MODULES
+    for module_name in module_names:
+        try:
+            importlib.import_module(module_name)
+        except ImportError as e:
+            logger.warning(f"warm up module {module_name} failed: {e}")
+
+
+def _run_batch(tasks, method, workers, timeout, retry, ledger_path, classify_cache_path=None):
+    """
+    每个文档fork一个子进程处理，同时运行的子进程不超过workers个。
+    fork之前先在父进程里加载好spacy模型等重型依赖(_warm_up_batch_worker)，子进程直接继承，
+    不用每个文档重新付出加载的代价；不支持fork的平台上子进程是全新启动的，预先加载没有意义，直接跳过。
+    超时的子进程会被直接杀掉，不会拖住整个批次
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_ctx = multiprocessing.get_context("fork")
+        if tasks:
+            _warm_up_batch_worker(tasks)
+    else:
+        mp_ctx = multiprocessing.get_context()
+
+    pending = deque((task, 1) for task in tasks)
+    running = {}  # sentinel -> (process, task, attempt, start_time)
+    stats = {"success": 0, "failed": 0, "timeout": 0}
+
+    with open(ledger_path, "a", encoding="utf-8") as ledger:
+        while pending or running:
+            while pending and len(running) < workers:
+                task, attempt = pending.popleft()
+                proc = mp_ctx.Process(target=_batch_parse_one, args=(task, method, classify_cache_path),
+                                       daemon=True)
+                proc.start()
+                running[proc.sentinel] = (proc, task, attempt, time.time())
+
+            wait(list(running.keys()), timeout=1)
+
+            now = time.time()
+            for sentinel, (proc, task, attempt, start_time) in list(running.items()):
+                if proc.is_alive():
+                    if timeout is None or now - start_time < timeout:
+                        continue
+                    proc.terminate()
+                    proc.join()
+                    status = "timeout"
+                else:
+                    proc.join()
+                    status = "success" if proc.exitcode == 0 else "failed"
+                del running[sentinel]
+
+                if status != "success" and attempt <= retry:
+                    logger.warning(f"{task['key']} {status} on attempt {attempt}, retry")
+                    pending.append((task, attempt + 1))
+                    continue
+
+                stats[status] += 1
+                ledger.write(json_parse.dumps(
+                    {"key": task["key"], "method": method, "status": status, "attempts": attempt,
+                     "cost_time": round(now - start_time, 2)},
+                    ensure_ascii=False) + "\n")
+                ledger.flush()
+                if status == "success":
+                    logger.info(f"{task['key']} {status}")
+                else:
+                    logger.error(f"{task['key']} {status} after {attempt} attempts")
+    return stats
 
 
 @click.group()
@@ -106,31 +368,13 @@ def cli():
     help="指定解析方法。txt: 文本型 pdf 解析方法， ocr: 光学识别解析 pdf, auto: 程序智能选择解析方法",
     default="auto",
 )
-def json_command(json, method):
+@click.option("--profile", is_flag=True, default=False, help="记录各阶段耗时，输出到{文件名}_perf.json")
+@click.option("--classify-cache", "classify_cache_path", type=str, default=None, help=classify_cache_help)
+def json_command(json, method, profile, classify_cache_path):
     if not json.startswith("s3://"):
         print("usage: python magipdf.py --json s3://some_bucket/some_path")
         os.exit(1)
 
-    def read_s3_path(s3path):
-        bucket, key = parse_s3path(s3path)
-
-        s3_ak, s3_sk, s3_endpoint = get_s3_config(bucket)
-        s3_rw = S3ReaderWriter(
-            s3_ak, s3_sk, s3_endpoint, "auto", remove_non_official_s3_args(s3path)
-        )
-        may_range_params = parse_s3_range_params(s3path)
-        if may_range_params is None or 2 != len(may_range_params):
-            byte_start, byte_end = 0, None
-        else:
-            byte_start, byte_end = int(may_range_params[0]), int(may_range_params[1])
-            byte_end += byte_start - 1
-        return s3_rw.read_jsonl(
-            remove_non_official_s3_args(s3path),
-            byte_start,
-            byte_end,
-            AbsReaderWriter.MODE_BIN,
-        )
-
     jso = json_parse.loads(read_s3_path(json).decode("utf-8"))
     s3_file_path = jso["file_location"]
     pdf_file_name = Path(s3_file_path).stem
@@ -149,7 +393,9 @@ def json_command(json, method):
         local_image_rw,
         local_md_rw,
         os.path.basename(local_image_dir),
-        local_md_dir
+        local_md_dir,
+        profile=profile,
+        classify_cache_path=classify_cache_path,
     )
 
 
@@ -164,7 +410,9 @@ def json_command(json, method):
     help="指定解析方法。txt: 文本型 pdf 解析方法， ocr: 光学识别解析 pdf, auto: 程序智能选择解析方法",
     default="auto",
 )
-def pdf_command(pdf, model, method):
+@click.option("--profile", is_flag=True, default=False, help="记录各阶段耗时，输出到{文件名}_perf.json")
+@click.option("--classify-cache", "classify_cache_path", type=str, default=None, help=classify_cache_help)
+def pdf_command(pdf, model, method, profile, classify_cache_path):
     # 这里处理pdf和模型相关的逻辑
     if model is None:
         model = pdf.replace(".pdf", ".json")
@@ -172,12 +420,8 @@ def pdf_command(pdf, model, method):
             print(f"make sure json {model} existed and place under {os.path.dirname(pdf)}", file=sys.stderr)
             exit(1)
 
-    def read_fn(path):
-        disk_rw = DiskReaderWriter(os.path.dirname(path))
-        return disk_rw.read(os.path.basename(path), AbsReaderWriter.MODE_BIN)
-
-    pdf_data = read_fn(pdf)
-    jso = json_parse.loads(read_fn(model).decode("utf-8"))
+    pdf_data = read_local_path(pdf)
+    jso = json_parse.loads(read_local_path(model).decode("utf-8"))
     pdf_file_name = Path(pdf).stem
     local_image_dir, local_md_dir = prepare_env(pdf_file_name, method)
     local_image_rw, local_md_rw = DiskReaderWriter(local_image_dir), DiskReaderWriter(
@@ -191,10 +435,45 @@ def pdf_command(pdf, model, method):
         local_image_rw,
         local_md_rw,
         os.path.basename(local_image_dir),
-        local_md_dir
+        local_md_dir,
+        profile=profile,
+        classify_cache_path=classify_cache_path,
     )
 
 
+@cli.command()
+@click.option("--input", "input_path", type=str, required=True,
+              help="pdf所在目录、pdf的glob通配符(模型json与pdf同名同目录)或者jsonl清单的路径")
+@click.option(
+    "--method",
+    type=parse_pdf_methods,
+    help="指定解析方法。txt: 文本型 pdf 解析方法， ocr: 光学识别解析 pdf, auto: 程序智能选择解析方法",
+    default="auto",
+)
+@click.option("--workers", type=int, default=os.cpu_count(), help="同时处理的文档数")
+@click.option("--timeout", type=int, default=600, help="单个文档的超时时间(秒)，0表示不限制")
+@click.option("--retry", type=int, default=1, help="失败或超时后的重试次数")
+@click.option("--ledger", type=str, default=None,
+              help="进度文件路径，默认在临时输出目录下的 magic-pdf/batch_ledger.jsonl，用同一种方法已经成功的文档不会再处理")
+@click.option("--classify-cache", "classify_cache_path", type=str, default=None, help=classify_cache_help)
+def batch_command(input_path, method, workers, timeout, retry, ledger, classify_cache_path):
+    if ledger is None:
+        ledger_dir = os.path.join(get_local_dir(), "magic-pdf")
+        os.makedirs(ledger_dir, exist_ok=True)
+        ledger = os.path.join(ledger_dir, "batch_ledger.jsonl")
+
+    tasks = _collect_batch_tasks(input_path)
+    done = _load_batch_ledger(ledger, method)
+    todo_tasks = [task for task in tasks if task["key"] not in done]
+    logger.info(f"total {len(tasks)} documents, {len(tasks) - len(todo_tasks)} already done, {len(todo_tasks)} to run")
+
+    stats = _run_batch(todo_tasks, method, max(1, workers), timeout if timeout > 0 else None, retry, ledger,
+                       classify_cache_path)
+    logger.info(f"batch finished: {stats}")
+    if stats["failed"] or stats["timeout"]:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     """
     python magic_pdf/cli/magicpdf.py json-command --json s3://llm-pdf-text/pdf_ebook_and_paper/manual/v001/part-660407a28beb-000002.jsonl?bytes=0,63551
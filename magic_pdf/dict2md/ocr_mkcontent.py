@@ -1,17 +1,35 @@
+from functools import lru_cache
+
 from loguru import logger
 
 from magic_pdf.libs.commons import join_path
 from magic_pdf.libs.language import detect_lang
 from magic_pdf.libs.markdown_utils import ocr_escape_special_markdown_char
 from magic_pdf.libs.ocr_content_type import ContentType, BlockType
-import wordninja
 import re
 
 
+'''
+span文本的缓存大小，页眉页脚、编号、常用词等文本在一本书里会重复出现很多次
+'''
+SPAN_TEXT_CACHE_SIZE = 65536
+
+RE_WORD_OR_PUNCT = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+
+'''
+split_long_words会丢掉空格以外的空白字符，只有没有长词且没有这类空白字符时，结果才和原文相同
+'''
+RE_NEED_SPLIT = re.compile(r'\w{16}|[^\S ]', re.UNICODE)
+
+
+@lru_cache(maxsize=SPAN_TEXT_CACHE_SIZE)
 def split_long_words(text):
+    if RE_NEED_SPLIT.search(text) is None:
+        return text
+    import wordninja  # wordninja导入时要加载词表，只有真的需要切分长词时才导入
     segments = text.split(' ')
     for i in range(len(segments)):
-        words = re.findall(r'\w+|[^\w\s]', segments[i], re.UNICODE)
+        words = RE_WORD_OR_PUNCT.findall(segments[i])
         for j in range(len(words)):
             if len(words[j]) > 15:
                 words[j] = ' '.join(wordninja.split(words[j]))
@@ -19,6 +37,20 @@ def split_long_words(text):
     return ' '.join(segments)
 
 
+@lru_cache(maxsize=SPAN_TEXT_CACHE_SIZE)
+def text_span_content_and_language(content):
+    """
+    对文本span的内容做语言检测、英文长词切分和markdown转义，返回(处理后的内容, 语言)
+    同样的文本结果相同，按文本缓存，整篇文档里重复的span只检测一次
+    """
+    language = detect_lang(content)
+    if language == 'en':  # 只对英文长词进行分词处理，中文分词会丢失文本
+        content = ocr_escape_special_markdown_char(split_long_words(content))
+    else:
+        content = ocr_escape_special_markdown_char(content)
+    return content, language
+
+
 def ocr_mk_mm_markdown_with_para(pdf_info_list: list, img_buket_path):
     markdown = []
     for page_info in pdf_info_list:
@@ -28,6 +60,17 @@ def ocr_mk_mm_markdown_with_para(pdf_info_list: list, img_buket_path):
     return '\n\n'.join(markdown)
 
 
+def ocr_mk_mm_markdown_with_para_iter(pdf_info_iter, img_buket_path):
+    """
+    逐页产出markdown，跳过没有内容的页面；把产出的内容用'\n\n'连接起来与ocr_mk_mm_markdown_with_para的结果一致
+    """
+    for page_info in pdf_info_iter:
+        paras_of_layout = page_info.get("para_blocks")
+        page_markdown = ocr_mk_markdown_with_para_core_v2(paras_of_layout, "mm", img_buket_path)
+        if len(page_markdown) > 0:
+            yield '\n\n'.join(page_markdown)
+
+
 def ocr_mk_nlp_markdown_with_para(pdf_info_dict: list):
     markdown = []
     for page_info in pdf_info_dict:
@@ -64,12 +107,7 @@ def ocr_mk_markdown_with_para_core(paras_of_layout, mode, img_buket_path=""):
                     content = ''
                     language = ''
                     if span_type == ContentType.Text:
-                        content = span['content']
-                        language = detect_lang(content)
-                        if language == 'en':  # 只对英文长词进行分词处理，中文分词会丢失文本
-                            content = ocr_escape_special_markdown_char(split_long_words(content))
-                        else:
-                            content = ocr_escape_special_markdown_char(content)
+                        content, language = text_span_content_and_language(span['content'])
                     elif span_type == ContentType.InlineEquation:
                         content = f"${span['content']}$"
                     elif span_type == ContentType.InterlineEquation:
@@ -147,12 +185,7 @@ def merge_para_with_text(para_block):
             content = ''
             language = ''
             if span_type == ContentType.Text:
-                content = span['content']
-                language = detect_lang(content)
-                if language == 'en':  # 只对英文长词进行分词处理，中文分词会丢失文本
-                    content = ocr_escape_special_markdown_char(split_long_words(content))
-                else:
-                    content = ocr_escape_special_markdown_char(content)
+                content, language = text_span_content_and_language(span['content'])
             elif span_type == ContentType.InlineEquation:
                 content = f"${span['content']}$"
             elif span_type == ContentType.InterlineEquation:
@@ -179,12 +212,7 @@ def para_to_standard_format(para, img_buket_path):
                 span_type = span.get('type')
                 content = ""
                 if span_type == ContentType.Text:
-                    content = span['content']
-                    language = detect_lang(content)
-                    if language == 'en':  # 只对英文长词进行分词处理，中文分词会丢失文本
-                        content = ocr_escape_special_markdown_char(split_long_words(content))
-                    else:
-                        content = ocr_escape_special_markdown_char(content)
+                    content, language = text_span_content_and_language(span['content'])
                 elif span_type == ContentType.InlineEquation:
                     content = f"${span['content']}$"
                     inline_equation_num += 1
@@ -0,0 +1,75 @@
+"""
+txt/ocr分类结论的持久化缓存
+分类结论只取决于pdf的字节，按pdf的md5(compute_md5)每个文档存一个json，重跑流水线、spark重试、升级解析模型时同一个pdf不用再分类
+存储可以是本地目录，也可以是任意实现了exists的AbsReaderWriter(例如S3ReaderWriter)
+
+缓存内容:
+    {
+        "version": 1,
+        "classify": {"pdf_type": "txt", "results": {...}, "text_scanned_page_cnt": 3, "total_page": 10}
+                    或者 {"drop_reason": "total_page=0"}
+    }
+分类是边扫描边判断的，结论确定后就停止，不会产生完整的pdf_meta_scan结果，所以缓存里只有分类结论
+"""
+import json
+
+from loguru import logger
+
+from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+'''分类规则变化时加一，旧版本写入的缓存会被当作未命中并被覆盖'''
+CLASSIFY_CACHE_VERSION = 1
+
+
+class ClassifyCache:
+    """
+    用法:
+        classify_cache = ClassifyCache("/tmp/classify_cache")  # 或者ClassifyCache(S3ReaderWriter(...))
+        pipe = UNIPipe(pdf_bytes, model_list, image_writer, classify_cache=classify_cache)
+    读写失败只记日志，当作未命中，不影响分类和解析
+    """
+
+    def __init__(self, reader_writer, version=CLASSIFY_CACHE_VERSION):
+        """
+        reader_writer: 本地目录的路径，或者一个AbsReaderWriter，缓存文件写在它的根目录下
+        """
+        if isinstance(reader_writer, str):
+            reader_writer = DiskReaderWriter(reader_writer)
+        self.reader_writer = reader_writer
+        self.version = version
+
+    @staticmethod
+    def get_cache_path(pdf_md5: str):
+        return f"{pdf_md5}.json"
+
+    def get(self, pdf_md5: str):
+        """
+        返回pdf_md5对应的缓存内容，没有缓存、版本不一致或者读取失败时返回None
+        """
+        path = self.get_cache_path(pdf_md5)
+        try:
+            if not self.reader_writer.exists(path):
+                return None
+            entry = json.loads(self.reader_writer.read(path, AbsReaderWriter.MODE_TXT))
+        except Exception as e:
+            logger.warning(f"read classify cache {path} failed: {e}")
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != self.version:
+            return None
+        return entry
+
+    def get_classify(self, pdf_md5: str):
+        entry = self.get(pdf_md5)
+        return entry.get("classify") if entry is not None else None
+
+    def put_classify(self, pdf_md5: str, classify_result: dict):
+        """
+        直接覆盖写入，不先读出旧的缓存：调用方都是get_classify未命中之后才写入，再读一次只是多一次请求
+        """
+        entry = {"version": self.version, "classify": classify_result}
+        path = self.get_cache_path(pdf_md5)
+        try:
+            self.reader_writer.write(json.dumps(entry, ensure_ascii=False), path, AbsReaderWriter.MODE_TXT)
+        except Exception as e:
+            logger.warning(f"write classify cache {path} failed: {e}")
@@ -18,7 +18,9 @@ import numpy as np
 from loguru import logger
 
 from magic_pdf.libs.commons import mymax, get_top_percent_list
-from magic_pdf.filter.pdf_meta_scan import scan_max_page, junk_limit_min
+from magic_pdf.filter.pdf_meta_scan import scan_max_page, junk_limit_min, META_SCAN_FULL_PAGE_LIMIT, \
+    META_SCAN_SAMPLE_PAGES, get_scan_page_ids, get_pdf_page_size_pts, get_image_info, get_page_text_layout
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
 
 TEXT_LEN_THRESHOLD = 100
 AVG_TEXT_LEN_THRESHOLD = 200
@@ -149,13 +151,9 @@ def classify_by_area(total_page: int, page_width, page_height, img_sz_list, text
 
 
 
-def classify_by_text_len(text_len_list: list, total_page: int):
+def sample_text_len_page_idx(scanned_page_cnt: int, total_page: int):
     """
-    随机抽取10%的页面，如果少于5个页面，那么就取全部页面。
-    查看页面上的文字长度，如果有任何一个页面的文字长度大于TEXT_LEN_THRESHOLD，那么就是文字pdf
-    :param total_page:
-    :param text_len_list:
-    :return:
+    classify_by_text_len要看的页面在text_len_list中的下标
     """
     select_page_cnt = int(total_page * TEXT_LEN_SAMPLE_RATIO)  # 选取10%的页面
     if select_page_cnt < 5:
@@ -168,7 +166,20 @@ def classify_by_text_len(text_len_list: list, total_page: int):
     #     page_range = list(range(total_page))  # 否则选择所有页面
     # page_num = np.random.choice(page_range, min(select_page_cnt, len(page_range)), replace=False)
     # 排除前后10页对只有21，22页的pdf很尴尬，如果选出来的中间那一两页恰好没字容易误判，有了avg_words规则，这个规则可以忽略
-    page_num = np.random.choice(total_page, select_page_cnt, replace=False)
+    # 长文档meta_scan只抽样扫描了部分页面，text_len_list比total_page短，就在扫描过的页面里抽
+    select_page_cnt = min(select_page_cnt, scanned_page_cnt)
+    return np.random.choice(scanned_page_cnt, select_page_cnt, replace=False)
+
+
+def classify_by_text_len(text_len_list: list, total_page: int):
+    """
+    随机抽取10%的页面，如果少于5个页面，那么就取全部页面。
+    查看页面上的文字长度，如果有任何一个页面的文字长度大于TEXT_LEN_THRESHOLD，那么就是文字pdf
+    :param total_page:
+    :param text_len_list:
+    :return:
+    """
+    page_num = sample_text_len_page_idx(len(text_len_list), total_page)
     text_len_lst = [text_len_list[i] for i in page_num]
     is_text_pdf = any([text_len > TEXT_LEN_THRESHOLD for text_len in text_len_lst])
     return is_text_pdf
@@ -328,6 +339,87 @@ def classify(total_page: int, page_width, page_height, img_sz_list: list, text_l
         return False, results
 
 
+def classify_by_text_layout_early(text_layout_list: list, remaining_page_cnt: int):
+    """
+    还有remaining_page_cnt页的文本布局不知道时，classify_by_text_layout的结论
+    剩下的页全是横排和全是竖排这两种极端情况结论相同时，结论就已经确定，否则返回None
+    """
+    all_horizontal = classify_by_text_layout(text_layout_list + ['horizontal'] * remaining_page_cnt)
+    all_vertical = classify_by_text_layout(text_layout_list + ['vertical'] * remaining_page_cnt)
+    return all_horizontal if all_horizontal == all_vertical else None
+
+
+def classify_incrementally(doc_context: PdfDocContext, full_scan_page_limit=META_SCAN_FULL_PAGE_LIMIT,
+                           sample_page_cnt=META_SCAN_SAMPLE_PAGES):
+    """
+    结论与classify(pdf_meta_scan(...)中的各项)相同，但是边扫描边判断，结论确定后就不再抽取剩下页面的文本
+    1. 只依赖图片信息的规则(by_image_area, by_img_num, by_img_narrow_strips)先算，有一条为False就直接判为非文字版
+    2. 依赖文本的规则按扫描顺序逐页累加：by_text_len在抽中的页里出现长文本时为True，by_avg_words在累计字数已经足够时为True，
+       by_text_layout在剩下的页无论什么布局都不会改变结论时确定
+    3. 有一条规则确定为False，或者全部规则确定为True时停止
+    :return: (is_text_pdf, results, text_scanned_page_cnt)
+             results中没来得及确定的规则为None；text_scanned_page_cnt是实际抽取了文本的页数
+    """
+    doc = doc_context.pdf_docs
+    text_cache = doc_context.text_cache
+    total_page = len(doc)
+    scan_page_ids = get_scan_page_ids(total_page, full_scan_page_limit, sample_page_cnt)
+    scan_page_cnt = len(scan_page_ids)
+    # 和classify_by_text_len用同样的方式抽样，随机数的消耗也和classify相同
+    remaining_text_len_idx = set(sample_text_len_page_idx(scan_page_cnt, total_page).tolist())
+
+    page_width_pts, page_height_pts = get_pdf_page_size_pts(doc, doc_context)
+    page_images_list = [doc[page_id].get_images() for page_id in scan_page_ids]
+    img_sz_list, _ = get_image_info(doc, page_width_pts, page_height_pts, page_images_list)
+    img_num_list = [len(page_images) for page_images in page_images_list]
+    page_width_pts, page_height_pts = int(page_width_pts), int(page_height_pts)
+
+    results = {
+        'by_image_area': classify_by_area(total_page, page_width_pts, page_height_pts, img_sz_list, None),
+        'by_text_len': None,
+        'by_avg_words': None,
+        'by_img_num': classify_by_img_num(img_sz_list, img_num_list),
+        'by_text_layout': None,
+        'by_img_narrow_strips': classify_by_img_narrow_strips(page_width_pts, page_height_pts, img_sz_list)
+    }
+    if not all([results['by_image_area'], results['by_img_num'], results['by_img_narrow_strips']]):
+        return False, results, 0
+
+    head_page_cnt = min(scan_max_page, total_page)
+    text_layout_list = []
+    text_len_sum = 0
+    for i, page_id in enumerate(scan_page_ids):
+        text_len = len(text_cache.get_text(page_id))
+        text_len_sum += text_len
+
+        if i in remaining_text_len_idx:
+            remaining_text_len_idx.remove(i)
+            if text_len > TEXT_LEN_THRESHOLD:
+                results['by_text_len'] = True
+            elif len(remaining_text_len_idx) == 0 and results['by_text_len'] is None:
+                results['by_text_len'] = False
+
+        # 字数只增不减，平均字数已经超过阈值时结论不会再变
+        if results['by_avg_words'] is None:
+            if round(text_len_sum / scan_page_cnt) > AVG_TEXT_LEN_THRESHOLD:
+                results['by_avg_words'] = True
+            elif i == scan_page_cnt - 1:
+                results['by_avg_words'] = False
+
+        if page_id < scan_max_page and results['by_text_layout'] is None:
+            text_layout_list.append(get_page_text_layout(text_cache.get_dict_blocks(page_id)))
+            results['by_text_layout'] = classify_by_text_layout_early(text_layout_list,
+                                                                      head_page_cnt - len(text_layout_list))
+
+        if any([result is False for result in results.values()]):
+            return False, results, i + 1
+        if all(results.values()):
+            return True, results, i + 1
+
+    # 扫完所有页面时每条规则都已经确定，不会走到这里
+    return all(results.values()), results, scan_page_cnt
+
+
 @click.command()
 @click.option("--json-file", type=str, help="pdf信息")
 def main(json_file):
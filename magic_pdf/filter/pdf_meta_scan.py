@@ -12,10 +12,37 @@ from collections import Counter
 
 from magic_pdf.libs.drop_reason import DropReason
 from magic_pdf.libs.language import detect_lang
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
+from magic_pdf.libs.pdf_text_cache import PdfTextCache
 
 scan_max_page = 50
 junk_limit_min = 10
 
+"""
+页数很多的文档只扫描一部分页面：前scan_max_page页全部扫描(图片位置、文本布局、语言只看这些页)，
+其余页面平均分成sample_page_cnt段，每段取中间一页，用来统计每页的图片数和文本长度
+"""
+META_SCAN_FULL_PAGE_LIMIT = 300  # 不超过这么多页的文档扫描全部页面
+META_SCAN_SAMPLE_PAGES = 150  # 超过时，除前scan_max_page页之外再抽样的页数
+
+
+def get_scan_page_ids(total_page: int, full_scan_page_limit=META_SCAN_FULL_PAGE_LIMIT,
+                      sample_page_cnt=META_SCAN_SAMPLE_PAGES):
+    """
+    返回meta_scan需要扫描的页码(升序)，开头的min(total_page, scan_max_page)页总是全部包含
+    """
+    if total_page <= full_scan_page_limit:
+        return list(range(total_page))
+    head_page_cnt = min(scan_max_page, total_page)
+    rest_page_cnt = total_page - head_page_cnt
+    sample_page_cnt = min(sample_page_cnt, rest_page_cnt)
+    sampled_page_ids = []
+    for k in range(sample_page_cnt):
+        start = head_page_cnt + rest_page_cnt * k // sample_page_cnt
+        end = head_page_cnt + rest_page_cnt * (k + 1) // sample_page_cnt
+        sampled_page_ids.append((start + end) // 2)
+    return list(range(head_page_cnt)) + sampled_page_ids
+
 
 def calculate_max_image_area_per_page(result:list, page_width_pts, page_height_pts):
     max_image_area_per_page = [mymax([(x1 - x0) * (y1 - y0) for x0, y0, x1, y1, _ in page_img_sz]) for page_img_sz in
@@ -25,9 +52,12 @@ def calculate_max_image_area_per_page(result:list, page_width_pts, page_height_p
     max_image_area_per_page = [area for area in max_image_area_per_page if area > 0.6]
     return max_image_area_per_page
 
-def process_image(page, junk_img_bojids=[]):
+def process_image(page, junk_img_bojids=[], page_images=None):
+    """
+    page_images: 已经取过的page.get_images()结果，不传时重新获取
+    """
     page_result = []# 存每个页面里的多张图四元组信息
-    items = page.get_images()
+    items = page_images if page_images is not None else page.get_images()
     dedup = set()
     for img in items:
         # 这里返回的是图片在page上的实际展示的大小。返回一个数组，每个元素第一部分是
@@ -47,17 +77,21 @@ def process_image(page, junk_img_bojids=[]):
             dedup.add((x0, y0, x1, y1, img_bojid))
             page_result.append([x0, y0, x1, y1, img_bojid])
     return page_result
-def get_image_info(doc: fitz.Document, page_width_pts, page_height_pts) -> list:
+def get_image_info(doc: fitz.Document, page_width_pts, page_height_pts, page_images_list=None) -> list:
     """
     返回每个页面里的图片的四元组，每个页面多个图片。
     :param doc:
+    :param page_images_list: 扫描过的页面的page.get_images()结果，开头的scan_max_page页必须都在里面(见get_scan_page_ids)；
+                             不传时取全部页面
     :return:
     """
+    if page_images_list is None:
+        page_images_list = [page.get_images() for page in doc]
     # 使用 Counter 计数 img_bojid 的出现次数
-    img_bojid_counter = Counter(img[0] for page in doc for img in page.get_images())
-    # 找出出现次数超过 len(doc) 半数的 img_bojid
+    img_bojid_counter = Counter(img[0] for page_images in page_images_list for img in page_images)
+    # 找出出现次数超过扫描页数半数的 img_bojid
 
-    junk_limit = max(len(doc)*0.5, junk_limit_min)# 对一些页数比较少的进行豁免
+    junk_limit = max(len(page_images_list)*0.5, junk_limit_min)# 对一些页数比较少的进行豁免
 
     junk_img_bojids = [img_bojid for img_bojid, count in img_bojid_counter.items() if count >= junk_limit]
 
@@ -66,19 +100,21 @@ def get_image_info(doc: fitz.Document, page_width_pts, page_height_pts) -> list:
     #扫描版1：每页都有所有扫描页图片，特点是图占比大，每页展示1张
     #扫描版2，每页存储的扫描页图片数量递增，特点是图占比大，每页展示1张，需要清空junklist跑前50页图片信息用于分类判断
     #文字版1.每页存储所有图片，特点是图片占页面比例不大，每页展示可能为0也可能不止1张 这种pdf需要拿前10页抽样检测img大小和个数，如果符合需要清空junklist
-    imgs_len_list = [len(page.get_images()) for page in doc]
+    imgs_len_list = [len(page_images) for page_images in page_images_list]
 
     special_limit_pages = 10
+    # 前scan_max_page页在下面会用到两次，只加载一次
+    head_pages = [doc[i] for i in range(min(scan_max_page, len(doc)))]
 
     # 统一用前十页结果做判断
     result = []
     break_loop = False
-    for i, page in enumerate(doc):
+    for i, page in enumerate(head_pages):
         if break_loop:
             break
         if i >= special_limit_pages:
             break
-        page_result = process_image(page)  # 这里不传junk_img_bojids，拿前十页所有图片信息用于后续分析
+        page_result = process_image(page, page_images=page_images_list[i])  # 这里不传junk_img_bojids，拿前十页所有图片信息用于后续分析
         result.append(page_result)
         for item in result:
             if not any(item):  # 如果任何一页没有图片，说明是个文字版，需要判断是否为特殊文字版
@@ -108,27 +144,28 @@ def get_image_info(doc: fitz.Document, page_width_pts, page_height_pts) -> list:
 
     #正式进入取前50页图片的信息流程
     result = []
-    for i, page in enumerate(doc):
-        if i >= scan_max_page:
-            break
-        page_result = process_image(page, junk_img_bojids)
+    for i, page in enumerate(head_pages):
+        page_result = process_image(page, junk_img_bojids, page_images_list[i])
         # logger.info(f"page {i} img_len: {len(page_result)}")
         result.append(page_result)
 
     return result, junk_img_bojids
 
 
-def get_pdf_page_size_pts(doc: fitz.Document):
+def get_pdf_page_size_pts(doc: fitz.Document, doc_context: PdfDocContext = None):
     page_cnt = len(doc)
     l: int = min(page_cnt, 50)
     #把所有宽度和高度塞到两个list 分别取中位数（中间遇到了个在纵页里塞横页的pdf，导致宽高互换了）
     page_width_list = []
     page_height_list = []
     for i in range(l):
-        page = doc[i]
-        page_rect = page.rect
-        page_width_list.append(page_rect.width)
-        page_height_list.append(page_rect.height)
+        if doc_context is not None:
+            page_width, page_height = doc_context.get_page_size(i)
+        else:
+            page_rect = doc[i].rect
+            page_width, page_height = page_rect.width, page_rect.height
+        page_width_list.append(page_width)
+        page_height_list.append(page_height)
 
     page_width_list.sort()
     page_height_list.sort()
@@ -140,97 +177,111 @@ def get_pdf_page_size_pts(doc: fitz.Document):
     return median_width, median_height
 
 
-def get_pdf_textlen_per_page(doc: fitz.Document):
+def get_pdf_textlen_per_page(doc: fitz.Document, text_cache: PdfTextCache = None, page_ids=None):
+    """
+    page_ids: 只统计这些页，不传时统计全部页面
+    """
+    if text_cache is None:
+        text_cache = PdfTextCache(doc)
+    if page_ids is None:
+        page_ids = range(len(doc))
     text_len_lst = []
-    for page in doc:
+    for page_id in page_ids:
         # 拿包含img和text的所有blocks
         # text_block = page.get_text("blocks")
         # 拿所有text的blocks
         # text_block = page.get_text("words")
         # text_block_len = sum([len(t[4]) for t in text_block])
         #拿所有text的str
-        text_block = page.get_text("text")
+        text_block = text_cache.get_text(page_id)
         text_block_len = len(text_block)
-        # logger.info(f"page {page.number} text_block_len: {text_block_len}")
+        # logger.info(f"page {page_id} text_block_len: {text_block_len}")
         text_len_lst.append(text_block_len)
 
     return text_len_lst
 
-def get_pdf_text_layout_per_page(doc: fitz.Document):
+def get_page_text_layout(text_blocks):
+    """
+    根据一页的dict blocks判断该页的文本布局是横向、纵向还是未知
+    """
+    # 创建每一页的纵向和横向的文本行数计数器
+    vertical_count = 0
+    horizontal_count = 0
+    for block in text_blocks:
+        if 'lines' in block:
+            for line in block["lines"]:
+                # 获取line的bbox顶点坐标
+                x0, y0, x1, y1 = line['bbox']
+                # 计算bbox的宽高
+                width = x1 - x0
+                height = y1 - y0
+                # 计算bbox的面积
+                area = width * height
+                font_sizes = []
+                for span in line['spans']:
+                    if 'size' in span:
+                        font_sizes.append(span['size'])
+                if len(font_sizes) > 0:
+                    average_font_size = sum(font_sizes) / len(font_sizes)
+                else:
+                    average_font_size = 10  # 有的line拿不到font_size，先定一个阈值100
+                if area <= average_font_size ** 2:  # 判断bbox的面积是否小于平均字体大小的平方,单字无法计算是横向还是纵向
+                    continue
+                else:
+                    if 'wmode' in line:  # 通过wmode判断文本方向
+                        if line['wmode'] == 1:  # 判断是否为竖向文本
+                            vertical_count += 1
+                        elif line['wmode'] == 0:  # 判断是否为横向文本
+                            horizontal_count += 1
+                #     if 'dir' in line:  # 通过旋转角度计算判断文本方向
+                #         # 获取行的 "dir" 值
+                #         dir_value = line['dir']
+                #         cosine, sine = dir_value
+                #         # 计算角度
+                #         angle = math.degrees(math.acos(cosine))
+                #
+                #         # 判断是否为横向文本
+                #         if abs(angle - 0) < 0.01 or abs(angle - 180) < 0.01:
+                #             # line_text = ' '.join(span['text'] for span in line['spans'])
+                #             # print('This line is horizontal:', line_text)
+                #             horizontal_count += 1
+                #         # 判断是否为纵向文本
+                #         elif abs(angle - 90) < 0.01 or abs(angle - 270) < 0.01:
+                #             # line_text = ' '.join(span['text'] for span in line['spans'])
+                #             # print('This line is vertical:', line_text)
+                #             vertical_count += 1
+    # print(f"page_id: {page_id}, vertical_count: {vertical_count}, horizontal_count: {horizontal_count}")
+    # 判断每一页的文本布局
+    if vertical_count == 0 and horizontal_count == 0:  # 该页没有文本，无法判断
+        return "unknow"
+    else:
+        if vertical_count > horizontal_count:  # 该页的文本纵向行数大于横向的
+            return "vertical"
+        else:  # 该页的文本横向行数大于纵向的
+            return "horizontal"
+
+
+def get_pdf_text_layout_per_page(doc: fitz.Document, text_cache: PdfTextCache = None):
     """
     根据PDF文档的每一页文本布局，判断该页的文本布局是横向、纵向还是未知。
 
     Args:
         doc (fitz.Document): PDF文档对象。
+        text_cache (PdfTextCache): doc的文本抽取缓存，不传时新建一个。
 
     Returns:
         List[str]: 每一页的文本布局（横向、纵向、未知）。
 
     """
+    if text_cache is None:
+        text_cache = PdfTextCache(doc)
     text_layout_list = []
 
-    for page_id, page in enumerate(doc):
+    for page_id in range(len(doc)):
         if page_id >= scan_max_page:
             break
-        # 创建每一页的纵向和横向的文本行数计数器
-        vertical_count = 0
-        horizontal_count = 0
-        text_dict = page.get_text("dict")
-        if "blocks" in text_dict:
-            for block in text_dict["blocks"]:
-                if 'lines' in block:
-                    for line in block["lines"]:
-                        # 获取line的bbox顶点坐标
-                        x0, y0, x1, y1 = line['bbox']
-                        # 计算bbox的宽高
-                        width = x1 - x0
-                        height = y1 - y0
-                        # 计算bbox的面积
-                        area = width * height
-                        font_sizes = []
-                        for span in line['spans']:
-                            if 'size' in span:
-                                font_sizes.append(span['size'])
-                        if len(font_sizes) > 0:
-                            average_font_size = sum(font_sizes) / len(font_sizes)
-                        else:
-                            average_font_size = 10  # 有的line拿不到font_size，先定一个阈值100
-                        if area <= average_font_size ** 2:  # 判断bbox的面积是否小于平均字体大小的平方,单字无法计算是横向还是纵向
-                            continue
-                        else:
-                            if 'wmode' in line:  # 通过wmode判断文本方向
-                                if line['wmode'] == 1:  # 判断是否为竖向文本
-                                    vertical_count += 1
-                                elif line['wmode'] == 0:  # 判断是否为横向文本
-                                    horizontal_count += 1
-                        #     if 'dir' in line:  # 通过旋转角度计算判断文本方向
-                        #         # 获取行的 "dir" 值
-                        #         dir_value = line['dir']
-                        #         cosine, sine = dir_value
-                        #         # 计算角度
-                        #         angle = math.degrees(math.acos(cosine))
-                        #
-                        #         # 判断是否为横向文本
-                        #         if abs(angle - 0) < 0.01 or abs(angle - 180) < 0.01:
-                        #             # line_text = ' '.join(span['text'] for span in line['spans'])
-                        #             # print('This line is horizontal:', line_text)
-                        #             horizontal_count += 1
-                        #         # 判断是否为纵向文本
-                        #         elif abs(angle - 90) < 0.01 or abs(angle - 270) < 0.01:
-                        #             # line_text = ' '.join(span['text'] for span in line['spans'])
-                        #             # print('This line is vertical:', line_text)
-                        #             vertical_count += 1
-        # print(f"page_id: {page_id}, vertical_count: {vertical_count}, horizontal_count: {horizontal_count}")
-        # 判断每一页的文本布局
-        if vertical_count == 0 and horizontal_count == 0:  # 该页没有文本，无法判断
-            text_layout_list.append("unknow")
-            continue
-        else:
-            if vertical_count > horizontal_count:  # 该页的文本纵向行数大于横向的
-                text_layout_list.append("vertical")
-            else:  # 该页的文本横向行数大于纵向的
-                text_layout_list.append("horizontal")
-        # logger.info(f"page_id: {page_id}, vertical_count: {vertical_count}, horizontal_count: {horizontal_count}")
+        # 只统计文本行，用不到图片block，和分类、解析共用同一次文本抽取
+        text_layout_list.append(get_page_text_layout(text_cache.get_dict_blocks(page_id)))
     return text_layout_list
 
 '''定义一个自定义异常用来抛出单页svg太多的pdf'''
@@ -261,25 +312,32 @@ def get_imgs_per_page(doc: fitz.Document):
     return imgs_len_list
 
 
-def get_language(doc: fitz.Document):
+def get_language(doc: fitz.Document, text_cache: PdfTextCache = None):
     """
     获取PDF文档的语言。
     Args:
         doc (fitz.Document): PDF文档对象。
+        text_cache (PdfTextCache): doc的文本抽取缓存，不传时新建一个。
     Returns:
         str: 文档语言，如 "en-US"。
     """
+    if text_cache is None:
+        text_cache = PdfTextCache(doc)
     language_lst = []
-    for page_id, page in enumerate(doc):
+    for page_id in range(len(doc)):
         if page_id >= scan_max_page:
             break
         # 拿所有text的str
-        text_block = page.get_text("text")
+        text_block = text_cache.get_text(page_id)
         page_language = detect_lang(text_block)
         language_lst.append(page_language)
 
         # logger.info(f"page_id: {page_id}, page_language: {page_language}")
 
+    return get_most_common_language(language_lst)
+
+
+def get_most_common_language(language_lst: list):
     # 统计text_language_list中每种语言的个数
     count_dict = Counter(language_lst)
     # 输出text_language_list中出现的次数最多的语言
@@ -287,13 +345,39 @@ def get_language(doc: fitz.Document):
     return language
 
 
-def pdf_meta_scan(pdf_bytes: bytes):
+def scan_pages(doc: fitz.Document, text_cache: PdfTextCache, page_ids: list):
+    """
+    一次遍历page_ids中的页面，取出meta_scan用到的所有单页特征，每页的文本只抽取一次
+    返回(每页的page.get_images(), 每页的文本长度, 前scan_max_page页每页的文本布局, 前scan_max_page页每页的语言)
+    """
+    page_images_list = []
+    text_len_lst = []
+    text_layout_list = []
+    language_lst = []
+    for page_id in page_ids:
+        page_images_list.append(doc[page_id].get_images())
+        text = text_cache.get_text(page_id)
+        text_len_lst.append(len(text))
+        if page_id < scan_max_page:
+            text_layout_list.append(get_page_text_layout(text_cache.get_dict_blocks(page_id)))
+            language_lst.append(detect_lang(text))
+    return page_images_list, text_len_lst, text_layout_list, language_lst
+
+
+def pdf_meta_scan(pdf_bytes: bytes, doc_context: PdfDocContext = None,
+                  full_scan_page_limit=META_SCAN_FULL_PAGE_LIMIT, sample_page_cnt=META_SCAN_SAMPLE_PAGES):
     """
     :param s3_pdf_path:
     :param pdf_bytes: pdf文件的二进制数据
+    :param doc_context: pdf_bytes的PdfDocContext，传入时直接使用其中打开的文档，文本抽取结果之后可以给解析复用
+    :param full_scan_page_limit, sample_page_cnt: 页数超过full_scan_page_limit时，除前scan_max_page页外只抽样扫描sample_page_cnt页，
+           此时imgs_per_page、text_len_per_page只包含scan_page_ids中的页面
     几个维度来评价：是否加密，是否需要密码，纸张大小，总页数，是否文字可提取
     """
-    doc = fitz.open("pdf", pdf_bytes)
+    if doc_context is None:
+        doc_context = PdfDocContext(pdf_bytes)
+    doc = doc_context.pdf_docs
+    text_cache = doc_context.text_cache
     is_needs_password = doc.needs_pass
     is_encrypted = doc.is_encrypted
     total_page = len(doc)
@@ -302,21 +386,21 @@ def pdf_meta_scan(pdf_bytes: bytes):
         result = {"_need_drop": True, "_drop_reason": DropReason.EMPTY_PDF}
         return result
     else:
-        page_width_pts, page_height_pts = get_pdf_page_size_pts(doc)
+        page_width_pts, page_height_pts = get_pdf_page_size_pts(doc, doc_context)
         # logger.info(f"page_width_pts: {page_width_pts}, page_height_pts: {page_height_pts}")
 
         # svgs_per_page = get_svgs_per_page(doc)
         # logger.info(f"svgs_per_page: {svgs_per_page}")
-        imgs_per_page = get_imgs_per_page(doc)
+        scan_page_ids = get_scan_page_ids(total_page, full_scan_page_limit, sample_page_cnt)
+        page_images_list, text_len_per_page, text_layout_per_page, language_lst = scan_pages(doc, text_cache, scan_page_ids)
+        imgs_per_page = [len(page_images) for page_images in page_images_list]
         # logger.info(f"imgs_per_page: {imgs_per_page}")
 
-        image_info_per_page, junk_img_bojids = get_image_info(doc, page_width_pts, page_height_pts)
+        image_info_per_page, junk_img_bojids = get_image_info(doc, page_width_pts, page_height_pts, page_images_list)
         # logger.info(f"image_info_per_page: {image_info_per_page}, junk_img_bojids: {junk_img_bojids}")
-        text_len_per_page = get_pdf_textlen_per_page(doc)
         # logger.info(f"text_len_per_page: {text_len_per_page}")
-        text_layout_per_page = get_pdf_text_layout_per_page(doc)
         # logger.info(f"text_layout_per_page: {text_layout_per_page}")
-        text_language = get_language(doc)
+        text_language = get_most_common_language(language_lst)
         # logger.info(f"text_language: {text_language}")
 
 
@@ -334,6 +418,7 @@ def pdf_meta_scan(pdf_bytes: bytes):
             # "svgs_per_page": svgs_per_page,
             "imgs_per_page": imgs_per_page,  # 增加每页img数量list
             "junk_img_bojids": junk_img_bojids,  # 增加垃圾图片的bojid list
+            "scan_page_ids": scan_page_ids,  # imgs_per_page和text_len_per_page对应的页码，长文档只抽样扫描了部分页面
             "metadata": doc.metadata
         }
         # logger.info(json.dumps(res, ensure_ascii=False))
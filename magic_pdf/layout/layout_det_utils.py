@@ -1,12 +1,15 @@
 from magic_pdf.layout.bbox_sort import X0_EXT_IDX, X0_IDX, X1_EXT_IDX, X1_IDX, Y0_IDX, Y1_EXT_IDX, Y1_IDX
+from magic_pdf.libs.bbox_index import BboxIndex, DIRECTION_LEFT, DIRECTION_RIGHT, DIRECTION_TOP, DIRECTION_BOTTOM
 from magic_pdf.libs.boxbase import _is_bottom_full_overlap, _left_intersect, _right_intersect
 
 
-def find_all_left_bbox_direct(this_bbox, all_bboxes) -> list:
+def find_all_left_bbox_direct(this_bbox, all_bboxes, bbox_index=None) -> list:
     """
     在all_bboxes里找到所有右侧垂直方向上和this_bbox有重叠的bbox， 不用延长线
     并且要考虑两个box左右相交的情况，如果相交了，那么右侧的box就不算最左侧。
     """
+    if bbox_index is not None:
+        all_bboxes = [all_bboxes[i] for i in bbox_index.query_direction(this_bbox, DIRECTION_LEFT)]
     left_boxes = [box for box in all_bboxes if box[X1_IDX] <= this_bbox[X0_IDX] 
          and any([
          box[Y0_IDX] < this_bbox[Y0_IDX] < box[Y1_IDX], box[Y0_IDX] < this_bbox[Y1_IDX] < box[Y1_IDX],
@@ -21,10 +24,12 @@ def find_all_left_bbox_direct(this_bbox, all_bboxes) -> list:
         left_boxes = None
     return left_boxes
 
-def find_all_right_bbox_direct(this_bbox, all_bboxes) -> list:
+def find_all_right_bbox_direct(this_bbox, all_bboxes, bbox_index=None) -> list:
     """
     找到在this_bbox右侧且距离this_bbox距离最近的bbox.必须是直接遮挡的那种
     """
+    if bbox_index is not None:
+        all_bboxes = [all_bboxes[i] for i in bbox_index.query_direction(this_bbox, DIRECTION_RIGHT)]
     right_bboxes = [box for box in all_bboxes if box[X0_IDX] >= this_bbox[X1_IDX] 
         and any([
         this_bbox[Y0_IDX] < box[Y0_IDX] < this_bbox[Y1_IDX], this_bbox[Y0_IDX] < box[Y1_IDX] < this_bbox[Y1_IDX],
@@ -38,10 +43,12 @@ def find_all_right_bbox_direct(this_bbox, all_bboxes) -> list:
         right_bboxes = None
     return right_bboxes
 
-def find_all_top_bbox_direct(this_bbox, all_bboxes) -> list:
+def find_all_top_bbox_direct(this_bbox, all_bboxes, bbox_index=None) -> list:
     """
     找到在this_bbox上侧且距离this_bbox距离最近的bbox.必须是直接遮挡的那种
     """
+    if bbox_index is not None:
+        all_bboxes = [all_bboxes[i] for i in bbox_index.query_direction(this_bbox, DIRECTION_TOP)]
     top_bboxes = [box for box in all_bboxes if box[Y1_IDX] <= this_bbox[Y0_IDX] and any([
         box[X0_IDX] < this_bbox[X0_IDX] < box[X1_IDX], box[X0_IDX] < this_bbox[X1_IDX] < box[X1_IDX],
         this_bbox[X0_IDX] < box[X0_IDX] < this_bbox[X1_IDX], this_bbox[X0_IDX] < box[X1_IDX] < this_bbox[X1_IDX],
@@ -54,10 +61,12 @@ def find_all_top_bbox_direct(this_bbox, all_bboxes) -> list:
         top_bboxes = None
     return top_bboxes
 
-def find_all_bottom_bbox_direct(this_bbox, all_bboxes) -> list:
+def find_all_bottom_bbox_direct(this_bbox, all_bboxes, bbox_index=None) -> list:
     """
     找到在this_bbox下侧且距离this_bbox距离最近的bbox.必须是直接遮挡的那种
     """
+    if bbox_index is not None:
+        all_bboxes = [all_bboxes[i] for i in bbox_index.query_direction(this_bbox, DIRECTION_BOTTOM)]
     bottom_bboxes = [box for box in all_bboxes if box[Y0_IDX] >= this_bbox[Y1_IDX] and any([
         this_bbox[X0_IDX] < box[X0_IDX] < this_bbox[X1_IDX], this_bbox[X0_IDX] < box[X1_IDX] < this_bbox[X1_IDX],
         box[X0_IDX] < this_bbox[X0_IDX] < box[X1_IDX], box[X0_IDX] < this_bbox[X1_IDX] < box[X1_IDX],
@@ -157,14 +166,16 @@ def get_left_edge_bboxes(all_bboxes) -> list:
     """
     返回最左边的bbox
     """
-    left_bboxes = [box for box in all_bboxes if find_all_left_bbox_direct(box, all_bboxes) is None]
+    bbox_index = BboxIndex(all_bboxes)
+    left_bboxes = [box for box in all_bboxes if find_all_left_bbox_direct(box, all_bboxes, bbox_index) is None]
     return left_bboxes
     
 def get_right_edge_bboxes(all_bboxes) -> list:
     """
     返回最右边的bbox
     """
-    right_bboxes = [box for box in all_bboxes if find_all_right_bbox_direct(box, all_bboxes) is None]
+    bbox_index = BboxIndex(all_bboxes)
+    right_bboxes = [box for box in all_bboxes if find_all_right_bbox_direct(box, all_bboxes, bbox_index) is None]
     return right_bboxes
 
 def fix_vertical_bbox_pos(bboxes:list):
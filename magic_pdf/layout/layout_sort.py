@@ -5,6 +5,7 @@
 from loguru import logger
 from magic_pdf.layout.bbox_sort import CONTENT_IDX, CONTENT_TYPE_IDX, X0_EXT_IDX, X0_IDX, X1_EXT_IDX, X1_IDX, Y0_EXT_IDX, Y0_IDX, Y1_EXT_IDX, Y1_IDX, paper_bbox_sort
 from magic_pdf.layout.layout_det_utils import find_all_left_bbox_direct, find_all_right_bbox_direct, find_bottom_bbox_direct_from_left_edge, find_bottom_bbox_direct_from_right_edge, find_top_bbox_direct_from_left_edge, find_top_bbox_direct_from_right_edge, find_all_top_bbox_direct, find_all_bottom_bbox_direct, get_left_edge_bboxes, get_right_edge_bboxes
+from magic_pdf.libs.bbox_index import BboxIndex
 from magic_pdf.libs.boxbase import get_bbox_in_boundry
 
 
@@ -51,9 +52,10 @@ def _horizontal_split(bboxes:list, boundry:tuple, avg_font_size=20)-> list:
     
     """
     last_h_split_line_y1 = bound_y0 #记录下上次的水平分割线
+    all_bboxes_index, bboxes_index = BboxIndex(all_bboxes), BboxIndex(bboxes) # 循环中只修改扩展线，bbox本身的坐标不变
     for i, bbox in enumerate(all_bboxes):
-        left_nearest_bbox = find_all_left_bbox_direct(bbox, all_bboxes) # 非扩展线
-        right_nearest_bbox = find_all_right_bbox_direct(bbox, all_bboxes)
+        left_nearest_bbox = find_all_left_bbox_direct(bbox, all_bboxes, all_bboxes_index) # 非扩展线
+        right_nearest_bbox = find_all_right_bbox_direct(bbox, all_bboxes, all_bboxes_index)
         if left_nearest_bbox is None and right_nearest_bbox is None: # 独占一行
             """
             然而，如果只是孤立的一行文字，那么就还要满足以下几个条件才可以：
@@ -107,11 +109,11 @@ def _horizontal_split(bboxes:list, boundry:tuple, avg_font_size=20)-> list:
                 
                 if not any([b[X0_IDX] <= min_x0-1 <= b[X1_IDX] or b[X0_IDX] <= max_x1+1 <= b[X1_IDX] for b in bbox_in_bound_check]):
                     # 其上，下都不能被扩展成行，暂时只检查一下上方 TODO
-                    top_nearest_bbox = find_all_top_bbox_direct(bbox, bboxes)
-                    bottom_nearest_bbox = find_all_bottom_bbox_direct(bbox, bboxes)
+                    top_nearest_bbox = find_all_top_bbox_direct(bbox, bboxes, bboxes_index)
+                    bottom_nearest_bbox = find_all_bottom_bbox_direct(bbox, bboxes, bboxes_index)
                     if not any([
-                        top_nearest_bbox is not None and (find_all_left_bbox_direct(top_nearest_bbox, bboxes) is  None and  find_all_right_bbox_direct(top_nearest_bbox, bboxes) is None),
-                        bottom_nearest_bbox is not None and (find_all_left_bbox_direct(bottom_nearest_bbox, bboxes) is  None and  find_all_right_bbox_direct(bottom_nearest_bbox, bboxes) is None),
+                        top_nearest_bbox is not None and (find_all_left_bbox_direct(top_nearest_bbox, bboxes, bboxes_index) is  None and  find_all_right_bbox_direct(top_nearest_bbox, bboxes, bboxes_index) is None),
+                        bottom_nearest_bbox is not None and (find_all_left_bbox_direct(bottom_nearest_bbox, bboxes, bboxes_index) is  None and  find_all_right_bbox_direct(bottom_nearest_bbox, bboxes, bboxes_index) is None),
                         top_nearest_bbox is None or bottom_nearest_bbox is None
                         ]):
                             is_belong_to_col = True
@@ -441,9 +443,10 @@ def _vertical_split(bboxes:list, boundry:tuple)-> list:
     首先在垂直方向上扩展独占一行的bbox
     
     """
+    all_bboxes_index = BboxIndex(all_bboxes) # 循环中只修改扩展线，bbox本身的坐标不变
     for bbox in all_bboxes:
-        top_nearest_bbox = find_all_top_bbox_direct(bbox, all_bboxes) # 非扩展线
-        bottom_nearest_bbox = find_all_bottom_bbox_direct(bbox, all_bboxes)
+        top_nearest_bbox = find_all_top_bbox_direct(bbox, all_bboxes, all_bboxes_index) # 非扩展线
+        bottom_nearest_bbox = find_all_bottom_bbox_direct(bbox, all_bboxes, all_bboxes_index)
         if top_nearest_bbox is None and bottom_nearest_bbox is None  and not any([b[X0_IDX]<bbox[X1_IDX]<b[X1_IDX] or b[X0_IDX]<bbox[X0_IDX]<b[X1_IDX] for b in all_bboxes]): # 独占一列, 且不和其他重叠
             bbox[X0_EXT_IDX] = bbox[X0_IDX]
             bbox[Y0_EXT_IDX] = bound_y0
@@ -0,0 +1,123 @@
+"""
+页面内bbox的网格空间索引
+把bbox按外接矩形登记到均匀网格里，查询时只取相关网格中的bbox作为候选，避免对整页做两两比较
+索引只负责缩小候选范围，精确的判断仍由调用方用boxbase中的原有函数完成，所以结果和全量扫描完全一致
+建好索引后，bbox的坐标不能再被修改
+"""
+import math
+
+from magic_pdf.libs.boxbase import _is_in
+
+DIRECTION_LEFT = "left"
+DIRECTION_RIGHT = "right"
+DIRECTION_TOP = "top"
+DIRECTION_BOTTOM = "bottom"
+
+
+def _extent(bbox):
+    """
+    bbox的外接矩形，兼容x0>x1或y0>y1的bbox
+    """
+    x0, y0, x1, y1 = bbox[0], bbox[1], bbox[2], bbox[3]
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+class BboxIndex:
+    def __init__(self, bboxes, cell_size=None):
+        """
+        bboxes: bbox列表，只使用每个bbox的前4个值(x0, y0, x1, y1)
+        cell_size: 网格边长，不传时按bbox分布自动估计
+        """
+        self.__bboxes = list(bboxes)
+        self.__extents = [_extent(bbox) for bbox in self.__bboxes]
+        self.__cells = {}
+        self.__outliers = []  # 坐标里有nan/inf的bbox无法落到网格里，每次查询都作为候选返回
+
+        finite_ids = []
+        for i, ext in enumerate(self.__extents):
+            if all(math.isfinite(v) for v in ext):
+                finite_ids.append(i)
+            else:
+                self.__outliers.append(i)
+        if len(finite_ids) == 0:
+            self.__origin = None
+            return
+
+        min_x = min(self.__extents[i][0] for i in finite_ids)
+        min_y = min(self.__extents[i][1] for i in finite_ids)
+        max_x = max(self.__extents[i][2] for i in finite_ids)
+        max_y = max(self.__extents[i][3] for i in finite_ids)
+        if cell_size is None:
+            '''让网格总数和bbox数量大致相当，且每个方向上的网格数不超过bbox数量'''
+            w, h, n = max_x - min_x, max_y - min_y, len(finite_ids)
+            cell_size = max(math.sqrt(w * h / n), max(w, h) / n)
+        if not cell_size > 0:
+            cell_size = 1.0
+        self.__cell_size = cell_size
+        self.__origin = (min_x, min_y)
+        self.__bound = (min_x, min_y, max_x, max_y)
+
+        for i in finite_ids:
+            cx0, cy0, cx1, cy1 = self.__cell_range(*self.__extents[i])
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.__cells.setdefault((cx, cy), []).append(i)
+
+    def __len__(self):
+        return len(self.__bboxes)
+
+    def __cell_range(self, x0, y0, x1, y1):
+        ox, oy = self.__origin
+        cs = self.__cell_size
+        return int((x0 - ox) // cs), int((y0 - oy) // cs), int((x1 - ox) // cs), int((y1 - oy) // cs)
+
+    def __candidates(self, x0, y0, x1, y1):
+        """
+        外接矩形与闭区间矩形[x0, y0, x1, y1]相交的bbox下标，按建索引时的顺序返回
+        """
+        if any(math.isnan(v) for v in (x0, y0, x1, y1)):
+            return list(range(len(self.__bboxes)))
+        ids = set(self.__outliers)
+        if self.__origin is not None:
+            '''把查询范围截到索引的边界内，这样也能处理无穷远的查询范围'''
+            bx0, by0, bx1, by1 = self.__bound
+            qx0, qy0, qx1, qy1 = max(x0, bx0), max(y0, by0), min(x1, bx1), min(y1, by1)
+            if qx0 <= qx1 and qy0 <= qy1:
+                cx0, cy0, cx1, cy1 = self.__cell_range(qx0, qy0, qx1, qy1)
+                for cx in range(cx0, cx1 + 1):
+                    for cy in range(cy0, cy1 + 1):
+                        for i in self.__cells.get((cx, cy), ()):
+                            ex0, ey0, ex1, ey1 = self.__extents[i]
+                            if ex0 <= x1 and ex1 >= x0 and ey0 <= y1 and ey1 >= y0:
+                                ids.add(i)
+        return sorted(ids)
+
+    def query_overlap(self, bbox):
+        """
+        返回外接矩形与bbox相交(含边界相接)的bbox下标
+        任何要求两个bbox重叠面积大于0或者互相包含的判断，满足条件的bbox都在返回结果中
+        """
+        return self.__candidates(*_extent(bbox))
+
+    def query_containing(self, bbox):
+        """
+        返回完全包含bbox的bbox下标，即满足_is_in(bbox, bboxes[i])的i
+        """
+        return [i for i in self.query_overlap(bbox) if _is_in(bbox[:4], self.__bboxes[i][:4])]
+
+    def query_direction(self, bbox, direction):
+        """
+        返回位于bbox某一侧、且在垂直于该方向上与bbox有交集的bbox下标
+        用于查找某个方向上直接遮挡bbox的候选框，与bbox左右(上下)边界相交的bbox也包含在内
+        """
+        x0, y0, x1, y1 = _extent(bbox)
+        if direction == DIRECTION_LEFT:
+            return self.__candidates(-math.inf, y0, x1, y1)
+        elif direction == DIRECTION_RIGHT:
+            return self.__candidates(x0, y0, math.inf, y1)
+        elif direction == DIRECTION_TOP:
+            return self.__candidates(x0, -math.inf, x1, y1)
+        elif direction == DIRECTION_BOTTOM:
+            return self.__candidates(x0, y0, x1, math.inf)
+        else:
+            raise Exception(f"unknown direction: {direction}")
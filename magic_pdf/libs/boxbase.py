@@ -2,6 +2,7 @@
 
 from loguru import logger
 import math
+import numpy as np
 
 def _is_in_or_part_overlap(box1, box2) -> bool:
     """
@@ -370,4 +371,132 @@ def bbox_distance(bbox1, bbox2):
     elif top:
         return y2 - y1b
     else:             # rectangles intersect
-        return 0
\ No newline at end of file
+        return 0
+
+"""
+以下是上面部分函数的批量版本：输入N个和M个bbox(形如N×4、M×4的数组或者bbox列表，每个bbox只取前4个值)，返回N×M的矩阵
+矩阵第i行第j列的值与对应标量函数(bboxes1[i], bboxes2[j])的返回值相等，计算顺序与标量函数保持一致，坐标中不能有nan
+"""
+def _to_bbox_array(bboxes):
+    if isinstance(bboxes, np.ndarray):
+        return bboxes[:, :4].astype(np.float64, copy=False).reshape(-1, 4)
+    return np.array([bbox[:4] for bbox in bboxes], dtype=np.float64).reshape(-1, 4)
+
+
+def _split_bbox_array(bboxes1, bboxes2):
+    """
+    把两组bbox拆成可以广播成N×M的坐标列
+    """
+    b1 = _to_bbox_array(bboxes1)
+    b2 = _to_bbox_array(bboxes2)
+    x0_1, y0_1, x1_1, y1_1 = (b1[:, k:k + 1] for k in range(4))
+    x0_2, y0_2, x1_2, y1_2 = (b2[:, k] for k in range(4))
+    return (x0_1, y0_1, x1_1, y1_1), (x0_2, y0_2, x1_2, y1_2)
+
+
+def _intersection_area_batch(bboxes1, bboxes2):
+    """
+    返回重叠面积矩阵和是否相交的矩阵，不相交的位置面积记为0
+    """
+    (x0_1, y0_1, x1_1, y1_1), (x0_2, y0_2, x1_2, y1_2) = _split_bbox_array(bboxes1, bboxes2)
+    x_left = np.maximum(x0_1, x0_2)
+    y_top = np.maximum(y0_1, y0_2)
+    x_right = np.minimum(x1_1, x1_2)
+    y_bottom = np.minimum(y1_1, y1_2)
+    overlap = ~((x_right < x_left) | (y_bottom < y_top))
+    intersection_area = np.where(overlap, (x_right - x_left) * (y_bottom - y_top), 0.0)
+    return intersection_area, overlap
+
+
+def calculate_iou_batch(bboxes1, bboxes2):
+    """
+    calculate_iou的批量版本，标量版本会除0的情况同样抛出ZeroDivisionError
+    """
+    (x0_1, y0_1, x1_1, y1_1), (x0_2, y0_2, x1_2, y1_2) = _split_bbox_array(bboxes1, bboxes2)
+    intersection_area, overlap = _intersection_area_batch(bboxes1, bboxes2)
+    bbox1_area = (x1_1 - x0_1) * (y1_1 - y0_1)
+    bbox2_area = (x1_2 - x0_2) * (y1_2 - y0_2)
+    union_area = bbox1_area + bbox2_area - intersection_area
+    if np.any(overlap & (union_area == 0)):
+        raise ZeroDivisionError("float division by zero")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(overlap, intersection_area / union_area, 0.0)
+
+
+def calculate_overlap_area_2_minbox_area_ratio_batch(bboxes1, bboxes2):
+    """
+    calculate_overlap_area_2_minbox_area_ratio的批量版本
+    """
+    (x0_1, y0_1, x1_1, y1_1), (x0_2, y0_2, x1_2, y1_2) = _split_bbox_array(bboxes1, bboxes2)
+    intersection_area, overlap = _intersection_area_batch(bboxes1, bboxes2)
+    min_box_area = np.minimum((x1_1 - x0_1) * (y1_1 - y0_1), (y1_2 - y0_2) * (x1_2 - x0_2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(overlap & (min_box_area != 0), intersection_area / min_box_area, 0.0)
+
+
+def calculate_overlap_area_in_bbox1_area_ratio_batch(bboxes1, bboxes2):
+    """
+    calculate_overlap_area_in_bbox1_area_ratio的批量版本
+    """
+    (x0_1, y0_1, x1_1, y1_1), _ = _split_bbox_array(bboxes1, bboxes2)
+    intersection_area, overlap = _intersection_area_batch(bboxes1, bboxes2)
+    bbox1_area = (x1_1 - x0_1) * (y1_1 - y0_1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(overlap & (bbox1_area != 0), intersection_area / bbox1_area, 0.0)
+
+
+MINBOX_NONE = 0
+MINBOX_BBOX1 = 1
+MINBOX_BBOX2 = 2
+
+
+def get_minbox_if_overlap_by_ratio_batch(bboxes1, bboxes2, ratio):
+    """
+    get_minbox_if_overlap_by_ratio的批量版本
+    返回的矩阵中，MINBOX_BBOX1表示返回bboxes1[i]，MINBOX_BBOX2表示返回bboxes2[j]，MINBOX_NONE表示返回None
+    """
+    (x0_1, y0_1, x1_1, y1_1), (x0_2, y0_2, x1_2, y1_2) = _split_bbox_array(bboxes1, bboxes2)
+    area1 = (x1_1 - x0_1) * (y1_1 - y0_1)
+    area2 = (x1_2 - x0_2) * (y1_2 - y0_2)
+    overlap_ratio = calculate_overlap_area_2_minbox_area_ratio_batch(bboxes1, bboxes2)
+    minbox = np.where(area1 <= area2, MINBOX_BBOX1, MINBOX_BBOX2)
+    return np.where(overlap_ratio > ratio, minbox, MINBOX_NONE).astype(np.int8)
+
+
+def _is_in_batch(bboxes1, bboxes2):
+    """
+    _is_in的批量版本，矩阵第i行第j列表示bboxes1[i]是否完全在bboxes2[j]里面
+    """
+    (x0_1, y0_1, x1_1, y1_1), (x0_2, y0_2, x1_2, y1_2) = _split_bbox_array(bboxes1, bboxes2)
+    return (x0_1 >= x0_2) & (y0_1 >= y0_2) & (x1_1 <= x1_2) & (y1_1 <= y1_2)
+
+
+def bbox_relative_pos_batch(bboxes1, bboxes2):
+    """
+    bbox_relative_pos的批量版本，返回left, right, bottom, top四个布尔矩阵
+    """
+    (x1, y1, x1b, y1b), (x2, y2, x2b, y2b) = _split_bbox_array(bboxes1, bboxes2)
+    left = x2b < x1
+    right = x1b < x2
+    bottom = y2b < y1
+    top = y1b < y2
+    return left, right, bottom, top
+
+
+def bbox_distance_batch(bboxes1, bboxes2):
+    """
+    bbox_distance的批量版本
+    平方用np.float_power计算，和标量版本中的**2一样调用C库的pow，保证结果逐位相同
+    """
+    def dist(dx, dy):
+        return np.sqrt(np.float_power(dx, 2) + np.float_power(dy, 2))
+
+    (x1, y1, x1b, y1b), (x2, y2, x2b, y2b) = _split_bbox_array(bboxes1, bboxes2)
+    left, right, bottom, top = bbox_relative_pos_batch(bboxes1, bboxes2)
+    return np.select(
+        [top & left, left & bottom, bottom & right, right & top, left, right, bottom, top],
+        [dist(x1 - x2b, y1b - y2), dist(x1 - x2b, y1 - y2b), dist(x1b - x2, y1 - y2b), dist(x1b - x2, y1b - y2),
+         np.broadcast_to(x1 - x2b, left.shape), np.broadcast_to(x2 - x1b, left.shape),
+         np.broadcast_to(y1 - y2b, left.shape), np.broadcast_to(y2 - y1b, left.shape)],
+        default=0.0,
+    )
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+def dbscan_1d(values, eps, min_samples):
+    """
+    一维数据的DBSCAN聚类，返回每个值的类别标签，噪声点为-1
+    与sklearn.cluster.DBSCAN(eps=eps, min_samples=min_samples).fit([[v, 0] for v in values]).labels_ 完全一致：
+    - 距离不超过eps(含eps)的点互为邻居，邻居数(含自身)不少于min_samples的是核心点
+    - 相邻的核心点属于同一类；非核心点归入能到达它的类中编号最小的那个
+    - 类别按类中下标最小的核心点的先后顺序编号
+    一维时排序后扫描一遍即可，O(n log n)，也省掉了sklearn每次fit的开销
+    """
+    values = [float(v) for v in values]
+    n = len(values)
+    labels = np.full(n, -1, dtype=np.intp)
+    if n == 0:
+        return labels
+
+    order = sorted(range(n), key=lambda i: values[i])
+    v = [values[i] for i in order]
+
+    '''双指针求每个点(排序后)的邻居范围[lo, hi]，距离用abs(a-b)<=eps判断，与sklearn的判断保持一致'''
+    is_core = [False] * n
+    lo = 0
+    hi = 0
+    for i in range(n):
+        while v[i] - v[lo] > eps:
+            lo += 1
+        while hi + 1 < n and v[hi + 1] - v[i] <= eps:
+            hi += 1
+        is_core[i] = hi - lo + 1 >= min_samples
+
+    '''排序后相邻的两个核心点距离不超过eps就连通，否则中间断开成两类'''
+    component_of = [-1] * n
+    component_min_index = []
+    prev_core = -1
+    for i in range(n):
+        if not is_core[i]:
+            continue
+        if prev_core == -1 or v[i] - v[prev_core] > eps:
+            component_min_index.append(order[i])
+        else:
+            component_min_index[-1] = min(component_min_index[-1], order[i])
+        component_of[i] = len(component_min_index) - 1
+        prev_core = i
+
+    '''按sklearn的扩展顺序给类编号：类中最小的核心点下标越小，编号越小'''
+    component_label = [0] * len(component_min_index)
+    for label, component in enumerate(sorted(range(len(component_min_index)), key=lambda c: component_min_index[c])):
+        component_label[component] = label
+
+    '''非核心点只可能被左右最近的核心点所在的类到达，取先扩展到它的那一类'''
+    nearest_left_core = [-1] * n
+    last_core = -1
+    for i in range(n):
+        if is_core[i]:
+            last_core = i
+        nearest_left_core[i] = last_core
+    nearest_right_core = [-1] * n
+    last_core = -1
+    for i in range(n - 1, -1, -1):
+        if is_core[i]:
+            last_core = i
+        nearest_right_core[i] = last_core
+
+    for i in range(n):
+        if is_core[i]:
+            labels[order[i]] = component_label[component_of[i]]
+            continue
+        candidates = []
+        left, right = nearest_left_core[i], nearest_right_core[i]
+        if left != -1 and v[i] - v[left] <= eps:
+            candidates.append(component_label[component_of[left]])
+        if right != -1 and v[right] - v[i] <= eps:
+            candidates.append(component_label[component_of[right]])
+        if len(candidates) > 0:
+            labels[order[i]] = min(candidates)
+
+    return labels
@@ -3,10 +3,7 @@ import json
 import os, re, configparser
 import time
 
-import boto3
 from loguru import logger
-from boto3.s3.transfer import TransferConfig
-from botocore.config import Config
 
 import fitz # 1.23.9中已经切换到rebase
 # import fitz_old as fitz  # 使用1.23.9之前的pymupdf库
@@ -108,6 +105,8 @@ def parse_bucket_key(s3_full_path: str):
 
 def read_file(pdf_path: str, s3_profile):
     if pdf_path.startswith("s3://"):
+        import boto3  # boto3导入很慢，只在真正读s3时才导入
+        from botocore.config import Config
         ak, sk, end_point, addressing_style = parse_aws_param(s3_profile)
         cli = boto3.client(service_name="s3", aws_access_key_id=ak, aws_secret_access_key=sk, endpoint_url=end_point,
                            config=Config(s3={'addressing_style': addressing_style}, retries={'max_attempts': 10, 'mode': 'standard'}))
@@ -134,12 +133,12 @@ def list_dir(dir_path:str, s3_profile:str):
     ret = []
     
     if dir_path.startswith("s3"):
+        from magic_pdf.rw import S3ReaderWriter  # 和S3ReaderWriter共用进程内的client池
         ak, sk, end_point, addressing_style = parse_aws_param(s3_profile)
         s3info = re.findall(r"s3:\/\/([^\/]+)\/(.*)", dir_path)
         bucket, path = s3info[0][0], s3info[0][1]
         try:
-            cli = boto3.client(service_name="s3", aws_access_key_id=ak, aws_secret_access_key=sk, endpoint_url=end_point,
-                                            config=Config(s3={'addressing_style': addressing_style}))
+            cli = S3ReaderWriter.get_s3_client(ak, sk, end_point, addressing_style)
             def list_obj_scluster():
                 marker = None
                 while True:
@@ -181,6 +180,8 @@ def get_img_s3_client(save_path:str, image_s3_config:str):
     """
     """
     if save_path.startswith("s3://"):  # 放这里是为了最少创建一个s3 client
+        import boto3
+        from botocore.config import Config
         ak, sk, end_point, addressing_style = parse_aws_param(image_s3_config)
         img_s3_client = boto3.client(
             service_name="s3",
@@ -1,7 +1,14 @@
+def get_page_pixel_size(page):
+    """
+    页面按72dpi渲染后的像素宽高，和page.get_pixmap(dpi=72)的pix.w, pix.h相同
+    只根据页面的cropbox和旋转角度计算(page.rect向外取整)，不需要渲染整页
+    """
+    page_irect = page.rect.irect
+    return page_irect.width, page_irect.height
+
+
 def get_scale_ratio(model_page_info, page):
-    pix = page.get_pixmap(dpi=72)
-    pymu_width = int(pix.w)
-    pymu_height = int(pix.h)
+    pymu_width, pymu_height = get_page_pixel_size(page)
     width_from_json = model_page_info['page_info']['width']
     height_from_json = model_page_info['page_info']['height']
     horizontal_scale_ratio = width_from_json / pymu_width
@@ -1,4 +1,6 @@
+import importlib
 import re
+import threading
 from os import path
 
 from collections import Counter
@@ -6,13 +8,38 @@ from collections import Counter
 from loguru import logger
 
 # from langdetect import detect
-import spacy
-import en_core_web_sm
-import zh_core_web_sm
 
 from magic_pdf.libs.language import detect_lang
 
 
+'''
+进程内共享的spacy模型，按模型名缓存，第一次用到时才加载
+spacy和模型本身都很大，只处理中文(或英文)的文档、或者根本没触发NLP判断时，就不需要付出加载另一个模型的时间和内存
+'''
+__spacy_models = {}
+__spacy_models_lock = threading.Lock()
+
+
+def get_spacy_model(model_name):
+    """
+    获取进程内共享的spacy模型，没有加载过时加载
+    优先以python包的方式加载(en_core_web_sm.load())，不是已安装的包时交给spacy.load按名字或路径加载
+    """
+    nlp_model = __spacy_models.get(model_name)
+    if nlp_model is not None:
+        return nlp_model
+    with __spacy_models_lock:
+        nlp_model = __spacy_models.get(model_name)
+        if nlp_model is None:
+            try:
+                nlp_model = importlib.import_module(model_name).load()
+            except ImportError:
+                import spacy
+                nlp_model = spacy.load(model_name)
+            __spacy_models[model_name] = nlp_model
+    return nlp_model
+
+
 class NLPModels:
     """
     How to upload local models to s3:
@@ -64,8 +91,14 @@ class NLPModels:
                 "version": "3.7.0",
             },
         }
-        self.en_core_web_sm_model = en_core_web_sm.load()
-        self.zh_core_web_sm_model = zh_core_web_sm.load()
+
+    @property
+    def en_core_web_sm_model(self):
+        return get_spacy_model("en_core_web_sm")
+
+    @property
+    def zh_core_web_sm_model(self):
+        return get_spacy_model("zh_core_web_sm")
 
     def load_model(self, model_name, model_type, model_version):
         if (
@@ -73,7 +106,8 @@ class NLPModels:
             and self.nlp_models[model_name]["type"] == model_type
             and self.nlp_models[model_name]["version"] == model_version
         ):
-            return spacy.load(model_name) if spacy.util.is_package(model_name) else None
+            import spacy
+            return get_spacy_model(model_name) if spacy.util.is_package(model_name) else None
 
         else:
             logger.error(f"Unsupported model name or version: {model_name} {model_version}")
@@ -115,25 +149,54 @@ class NLPModels:
         str
             The most frequent entity type.
         """
-        lang = self.detect_language(text, use_langdetect=True)
+        return self.detect_entity_catgr_using_nlp_batch([text], threshold)[0]
 
-        if lang == "en":
-            nlp_model = self.en_core_web_sm_model
-        elif lang == "zh":
-            nlp_model = self.zh_core_web_sm_model
-        else:
-            # logger.error(f"Unsupported language: {lang}")
-            return {}
-
-        # Splitting text into smaller parts
-        text_parts = re.split(r"[,;，；、\s & |]+", text)
+    def detect_entity_catgr_using_nlp_batch(self, texts, threshold=0.5):
+        """
+        Batched version of detect_entity_catgr_using_nlp. Texts are grouped by language and
+        each group is processed with a single nlp.pipe call.
 
-        text_parts = [part for part in text_parts if not re.match(r"[\d\W]+", part)]  # Remove non-words
-        text_combined = " ".join(text_parts)
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to be processed.
 
+        Returns
+        -------
+        list
+            The result of detect_entity_catgr_using_nlp for each text, in the same order.
+        """
+        results = [None] * len(texts)
+        texts_combined_by_lang = {"en": [], "zh": []}
+        for i, text in enumerate(texts):
+            lang = self.detect_language(text, use_langdetect=True)
+            if lang not in texts_combined_by_lang:
+                # logger.error(f"Unsupported language: {lang}")
+                results[i] = {}
+                continue
+
+            # Splitting text into smaller parts
+            text_parts = re.split(r"[,;，；、\s & |]+", text)
+
+            text_parts = [part for part in text_parts if not re.match(r"[\d\W]+", part)]  # Remove non-words
+            texts_combined_by_lang[lang].append((i, " ".join(text_parts)))
+
+        for lang, texts_combined in texts_combined_by_lang.items():
+            if len(texts_combined) == 0:
+                continue
+            nlp_model = self.en_core_web_sm_model if lang == "en" else self.zh_core_web_sm_model
+            try:
+                docs = list(nlp_model.pipe([text_combined for _, text_combined in texts_combined]))
+            except Exception as e:
+                logger.error(f"Error in entity detection: {e}")
+                continue
+            for (i, _), doc in zip(texts_combined, docs):
+                results[i] = self.__get_most_common_entity(doc, threshold)
+        return results
+
+    @staticmethod
+    def __get_most_common_entity(doc, threshold):
         try:
-            doc = nlp_model(text_combined)
-            entity_counts = Counter([ent.label_ for ent in doc.ents])
             word_counts_in_entities = Counter()
 
             for ent in doc.ents:
@@ -1,7 +1,4 @@
 
-
-from s3pathlib import S3Path
-
 def remove_non_official_s3_args(s3path):
     """
     example: s3://abc/xxxx.json?bytes=0,81350 ==> s3://abc/xxxx.json
@@ -10,6 +7,7 @@ def remove_non_official_s3_args(s3path):
     return arr[0]
 
 def parse_s3path(s3path: str):
+    from s3pathlib import S3Path  # s3pathlib会间接导入boto3，只在用到时才导入
     p = S3Path(remove_non_official_s3_args(s3path))
     return p.bucket, p.key
 
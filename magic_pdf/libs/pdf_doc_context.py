@@ -0,0 +1,62 @@
+"""
+一个pdf文档在分类、txt解析、降级到ocr解析之间共享的上下文
+pdf只打开一次、md5只计算一次，都在第一次用到时才做(例如分类缓存命中时只需要md5，不用打开文档)，
+页面宽高和文本抽取结果按页在第一次用到时计算并缓存
+"""
+from magic_pdf.libs.commons import fitz
+from magic_pdf.libs.hash_utils import compute_md5
+from magic_pdf.libs.pdf_text_cache import PdfTextCache
+
+
+class PdfDocContext:
+    """
+    按需打开的文档(pdf_docs)、文本抽取缓存(text_cache)，以及按需计算的md5和页面宽高
+    """
+
+    def __init__(self, pdf_bytes: bytes, pdf_bytes_md5: str = None, max_cached_pages=128):
+        """
+        pdf_bytes_md5: 已经算好的md5，传入时不再重新计算(例如并行解析时的子进程)
+        """
+        self.pdf_bytes = pdf_bytes
+        self.__max_cached_pages = max_cached_pages
+        self.__pdf_docs = None
+        self.__text_cache = None
+        self.__pdf_bytes_md5 = pdf_bytes_md5
+        self.__page_sizes = {}
+
+    @property
+    def is_opened(self) -> bool:
+        return self.__pdf_docs is not None
+
+    @property
+    def pdf_docs(self) -> fitz.Document:
+        if self.__pdf_docs is None:
+            self.__pdf_docs = fitz.open("pdf", self.pdf_bytes)
+        return self.__pdf_docs
+
+    @property
+    def text_cache(self) -> PdfTextCache:
+        if self.__text_cache is None:
+            self.__text_cache = PdfTextCache(self.pdf_docs, max_cached_pages=self.__max_cached_pages)
+        return self.__text_cache
+
+    @property
+    def pdf_bytes_md5(self) -> str:
+        if self.__pdf_bytes_md5 is None:
+            self.__pdf_bytes_md5 = compute_md5(self.pdf_bytes)
+        return self.__pdf_bytes_md5
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pdf_docs)
+
+    def get_page_size(self, page_id: int):
+        """
+        返回页面的(宽, 高)，与page.rect.width, page.rect.height相同
+        """
+        page_size = self.__page_sizes.get(page_id)
+        if page_size is None:
+            page_rect = self.pdf_docs[page_id].rect
+            page_size = (page_rect.width, page_rect.height)
+            self.__page_sizes[page_id] = page_size
+        return page_size
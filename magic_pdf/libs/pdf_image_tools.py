@@ -1,17 +1,47 @@
+import weakref
 
 from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
 from magic_pdf.libs.commons import fitz
 from magic_pdf.libs.commons import join_path
 from magic_pdf.libs.hash_utils import compute_sha256
+from magic_pdf.libs.perf_recorder import NULL_PERF_RECORDER
 
+CUT_IMAGE_ZOOM = 3
+CUT_IMAGE_JPG_QUALITY = 95
 
-def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWriter: AbsReaderWriter):
+'''
+每个imageWriter已经写过(或者确认已经存在)的图片路径
+图片路径由(pdf md5, 页码, bbox, 缩放倍数, jpg质量)决定，同样的路径内容一定相同，不需要重复截图和写入
+'''
+_written_image_paths = weakref.WeakKeyDictionary()
+
+'''调用过skip_existing_images的imageWriter，截图前还要查询imageWriter中是否已经有这张图片'''
+_skip_existing_image_writers = weakref.WeakSet()
+
+
+def skip_existing_images(imageWriter: AbsReaderWriter):
+    """
+    重跑、续跑时对imageWriter调用，之后cut_image截图前先用imageWriter.exists检查图片是否已经写过，已经存在的不再截图和写入
+    默认只按进程内写过的路径去重，不查询imageWriter：S3ReaderWriter的exists是一次同步的HEAD请求，
+    全新的输出目录上每张图片都会多一次往返，而且页面循环要等它返回
+    """
+    _skip_existing_image_writers.add(imageWriter)
+
+
+def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWriter: AbsReaderWriter,
+              zoom=CUT_IMAGE_ZOOM, jpg_quality=CUT_IMAGE_JPG_QUALITY, recorder=NULL_PERF_RECORDER):
     """
     从第page_num页的page中，根据bbox进行裁剪出一张jpg图片，返回图片路径
     save_path：需要同时支持s3和本地, 图片存放在save_path下，文件名是: {page_num}_{bbox[0]}_{bbox[1]}_{bbox[2]}_{bbox[3]}.jpg , bbox内数字取整。
+    同一进程内已经写过的图片不再重新截图和写入(txt降级到ocr、同一个bbox出现多次)
+    对imageWriter调用过skip_existing_images时，imageWriter中已经存在的图片也跳过(重跑)
+    recorder: PerfRecorder，分别记录截图、编码、写入的耗时和跳过的图片数
     """
     # 拼接文件名
     filename = f"{page_num}_{int(bbox[0])}_{int(bbox[1])}_{int(bbox[2])}_{int(bbox[3])}"
+    # 默认参数之外的缩放倍数和质量截出的图片不同，文件名也要区分开
+    if zoom != CUT_IMAGE_ZOOM or jpg_quality != CUT_IMAGE_JPG_QUALITY:
+        filename = f"{filename}_{zoom}_{jpg_quality}"
 
     # 老版本返回不带bucket的路径
     img_path = join_path(return_path, filename) if return_path is not None else None
@@ -19,15 +49,28 @@ def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWri
     # 新版本生成平铺路径
     img_hash256_path = f"{compute_sha256(img_path)}.jpg"
 
+    written_paths = _written_image_paths.setdefault(imageWriter, set())
+    if img_hash256_path in written_paths:
+        recorder.add_count("image_skipped", page_id=page_num)
+        return img_hash256_path
+    if imageWriter in _skip_existing_image_writers and imageWriter.exists(img_hash256_path):
+        written_paths.add(img_hash256_path)
+        recorder.add_count("image_skipped", page_id=page_num)
+        return img_hash256_path
+
     # 将坐标转换为fitz.Rect对象
     rect = fitz.Rect(*bbox)
-    # 配置缩放倍数为3倍
-    zoom = fitz.Matrix(3, 3)
+    # 配置缩放倍数
+    zoom_matrix = fitz.Matrix(zoom, zoom)
     # 截取图片
-    pix = page.get_pixmap(clip=rect, matrix=zoom)
+    with recorder.stage("image_crop", page_num):
+        pix = page.get_pixmap(clip=rect, matrix=zoom_matrix)
 
-    byte_data = pix.tobytes(output='jpeg', jpg_quality=95)
+    with recorder.stage("image_encode", page_num):
+        byte_data = pix.tobytes(output='jpeg', jpg_quality=jpg_quality)
 
-    imageWriter.write(byte_data, img_hash256_path, AbsReaderWriter.MODE_BIN)
+    with recorder.stage("image_write", page_num):
+        imageWriter.write(byte_data, img_hash256_path, AbsReaderWriter.MODE_BIN)
+    written_paths.add(img_hash256_path)
 
     return img_hash256_path
@@ -0,0 +1,101 @@
+"""
+按页缓存pymupdf的文本抽取结果
+真正耗时的是构建TextPage(把页面内容流解析成字符)，get_text("text"/"dict"/"rawdict")只是把TextPage转换成不同的格式
+所以每页只构建一次TextPage，分类、txt解析用到的text/dict/rawdict都从它得到；同时需要dict和rawdict时，dict由rawdict直接推导
+TextPage比较占内存，只保留最近使用的max_cached_pages页；每页的纯文本很小，全部保留
+"""
+from collections import OrderedDict
+
+from magic_pdf.libs.commons import fitz
+
+
+def rawdict_to_dict_blocks(rawdict_blocks):
+    """
+    由rawdict的blocks推导出dict的blocks，span中的chars换成拼好的text，其余字段不变
+    返回的是新的对象，修改它不会影响rawdict_blocks
+    """
+    dict_blocks = []
+    for block in rawdict_blocks:
+        dict_block = {k: v for k, v in block.items() if k != "lines"}
+        if "lines" in block:
+            dict_block["lines"] = []
+            for line in block["lines"]:
+                dict_line = {k: v for k, v in line.items() if k != "spans"}
+                dict_line["spans"] = []
+                for span in line["spans"]:
+                    dict_span = {k: v for k, v in span.items() if k != "chars"}
+                    dict_span["text"] = "".join(char["c"] for char in span["chars"])
+                    dict_line["spans"].append(dict_span)
+                dict_block["lines"].append(dict_line)
+        dict_blocks.append(dict_block)
+    return dict_blocks
+
+
+def extract_dict_and_rawdict_blocks(page, textpage=None):
+    """
+    只抽取一次rawdict，返回(dict_blocks, rawdict_blocks)，与分别调用get_text("dict")和get_text("rawdict")的结果相同
+    """
+    if textpage is None:
+        rawdict_blocks = page.get_text("rawdict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]
+    else:
+        rawdict_blocks = page.get_text("rawdict", textpage=textpage)["blocks"]
+    return rawdict_to_dict_blocks(rawdict_blocks), rawdict_blocks
+
+
+class PdfTextCache:
+    """
+    一个pdf文档的文本抽取缓存，每次调用都返回新的对象，调用方可以随意修改
+    """
+
+    def __init__(self, pdf_docs, max_cached_pages=128):
+        self.pdf_docs = pdf_docs
+        self.__max_cached_pages = max_cached_pages
+        self.__textpages = OrderedDict()
+        self.__texts = {}
+
+    def __get_page_and_textpage(self, page_id):
+        """
+        get_text复用TextPage时要求传入构建它的那个page对象，所以两者一起缓存
+        """
+        cached = self.__textpages.get(page_id)
+        if cached is not None:
+            self.__textpages.move_to_end(page_id)
+            return cached
+        page = self.pdf_docs[page_id]
+        cached = (page, page.get_textpage(flags=fitz.TEXTFLAGS_TEXT))
+        self.__textpages[page_id] = cached
+        if len(self.__textpages) > self.__max_cached_pages:
+            self.__textpages.popitem(last=False)
+        return cached
+
+    def get_text(self, page_id):
+        """
+        与page.get_text("text")相同
+        """
+        text = self.__texts.get(page_id)
+        if text is None:
+            page, textpage = self.__get_page_and_textpage(page_id)
+            text = page.get_text("text", textpage=textpage)
+            self.__texts[page_id] = text
+        return text
+
+    def get_dict_blocks(self, page_id):
+        """
+        与page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]相同
+        """
+        page, textpage = self.__get_page_and_textpage(page_id)
+        return page.get_text("dict", textpage=textpage)["blocks"]
+
+    def get_rawdict_blocks(self, page_id):
+        """
+        与page.get_text("rawdict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]相同
+        """
+        page, textpage = self.__get_page_and_textpage(page_id)
+        return page.get_text("rawdict", textpage=textpage)["blocks"]
+
+    def get_dict_and_rawdict_blocks(self, page_id):
+        """
+        同时需要dict和rawdict时使用，只转换一次rawdict
+        """
+        page, textpage = self.__get_page_and_textpage(page_id)
+        return extract_dict_and_rawdict_blocks(page, textpage=textpage)
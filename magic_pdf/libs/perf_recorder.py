@@ -0,0 +1,116 @@
+import json
+import time
+
+
+class _StageTimer:
+    """
+    一次阶段计时，退出时把耗时和调用次数累加到文档级和页级的统计上
+    """
+    __slots__ = ("__stats_list", "__start")
+
+    def __init__(self, stats_list):
+        self.__stats_list = stats_list
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        cost = time.perf_counter() - self.__start
+        for stats in self.__stats_list:
+            stats["count"] += 1
+            stats["time"] += cost
+        return False
+
+
+class _NullStage:
+    """
+    关闭时使用的空计时，什么都不做
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class PerfRecorder:
+    """
+    解析流水线的分阶段耗时记录
+    按阶段名记录累计耗时(秒)和调用次数，带page_id的阶段同时记到该页和整个文档上
+    用法:
+        with recorder.stage("layout_sort", page_id):
+            ...
+        recorder.add_count("image_skipped", page_id=page_id)
+    结果用to_dict()/to_json()导出，可以和pdf_mid_data放在一起保存
+    enabled=False时stage()直接返回一个共享的空计时对象，几乎没有开销
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.__doc_stages = {}
+        self.__page_stages = {}
+
+    def __get_stats_list(self, name, page_id):
+        doc_stats = self.__doc_stages.get(name)
+        if doc_stats is None:
+            doc_stats = self.__doc_stages[name] = {"count": 0, "time": 0.0}
+        if page_id is None:
+            return (doc_stats,)
+        page_stages = self.__page_stages.setdefault(page_id, {})
+        page_stats = page_stages.get(name)
+        if page_stats is None:
+            page_stats = page_stages[name] = {"count": 0, "time": 0.0}
+        return doc_stats, page_stats
+
+    def stage(self, name, page_id=None):
+        """
+        返回一个上下文管理器，记录with块的耗时，调用次数加一
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self.__get_stats_list(name, page_id))
+
+    def add_count(self, name, n=1, page_id=None):
+        """
+        只计数不计时，例如跳过的截图数
+        """
+        if not self.enabled:
+            return
+        for stats in self.__get_stats_list(name, page_id):
+            stats["count"] += n
+
+    def merge(self, perf_dict):
+        """
+        合并另一个PerfRecorder的to_dict()结果，例如按页并行时子进程里记录的页面
+        """
+        if not self.enabled or perf_dict is None:
+            return
+        for name, stats in perf_dict["stages"].items():
+            for own_stats in self.__get_stats_list(name, None):
+                own_stats["count"] += stats["count"]
+                own_stats["time"] += stats["time"]
+        for page_id, page_stages in perf_dict["pages"].items():
+            for name, stats in page_stages.items():
+                own_stats = self.__get_stats_list(name, page_id)[1]
+                own_stats["count"] += stats["count"]
+                own_stats["time"] += stats["time"]
+
+    def to_dict(self):
+        return {
+            "stages": {name: dict(stats) for name, stats in self.__doc_stages.items()},
+            "pages": {page_id: {name: dict(stats) for name, stats in page_stages.items()}
+                      for page_id, page_stages in sorted(self.__page_stages.items())},
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+'''不需要记录时使用的全局空记录器'''
+NULL_PERF_RECORDER = PerfRecorder(enabled=False)
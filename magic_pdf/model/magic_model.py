@@ -1,75 +1,95 @@
 import json
 import math
 
+import numpy as np
+
 from magic_pdf.libs.commons import fitz
 from loguru import logger
 
 from magic_pdf.libs.commons import join_path
 from magic_pdf.libs.coordinate_transform import get_scale_ratio
 from magic_pdf.libs.ocr_content_type import ContentType
+from magic_pdf.libs.perf_recorder import NULL_PERF_RECORDER
 from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
 from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
 from magic_pdf.libs.math import float_gt
-from magic_pdf.libs.boxbase import _is_in, bbox_relative_pos, bbox_distance
+from magic_pdf.libs.bbox_index import BboxIndex
+from magic_pdf.libs.boxbase import _is_in, bbox_distance, bbox_distance_batch, bbox_relative_pos_batch
 from magic_pdf.libs.ModelBlockTypeEnum import ModelBlockTypeEnum
 
 
 class MagicModel:
     """
     每个函数没有得到元素的时候返回空list
-
+    模型结果按页在第一次用到时才做坐标转换和低置信度过滤，不修改传入的model_list
     """
 
-    def __fix_axis(self):
-        for model_page_info in self.__model_list:
-            need_remove_list = []
-            page_no = model_page_info["page_info"]["page_no"]
-            horizontal_scale_ratio, vertical_scale_ratio = get_scale_ratio(
-                model_page_info, self.__docs[page_no]
-            )
-            layout_dets = model_page_info["layout_dets"]
-            for layout_det in layout_dets:
-                x0, y0, _, _, x1, y1, _, _ = layout_det["poly"]
-                bbox = [
-                    int(x0 / horizontal_scale_ratio),
-                    int(y0 / vertical_scale_ratio),
-                    int(x1 / horizontal_scale_ratio),
-                    int(y1 / vertical_scale_ratio),
-                ]
-                layout_det["bbox"] = bbox
-                # 删除高度或者宽度为0的spans
-                if bbox[2] - bbox[0] == 0 or bbox[3] - bbox[1] == 0:
-                    need_remove_list.append(layout_det)
-            for need_remove in need_remove_list:
-                layout_dets.remove(need_remove)
-
-    def __fix_by_confidence(self):
-        for model_page_info in self.__model_list:
-            need_remove_list = []
-            layout_dets = model_page_info["layout_dets"]
-            for layout_det in layout_dets:
-                if layout_det["score"] <= 0.05:
-                    need_remove_list.append(layout_det)
-                else:
-                    continue
-            for need_remove in need_remove_list:
-                layout_dets.remove(need_remove)
+    def __fix_axis(self, model_page_info):
+        """
+        返回坐标转换后的layout_dets，每个layout_det都是新的dict，删除了高度或者宽度为0的
+        """
+        page_no = model_page_info["page_info"]["page_no"]
+        horizontal_scale_ratio, vertical_scale_ratio = get_scale_ratio(
+            model_page_info, self.__docs[page_no]
+        )
+        layout_dets = []
+        for layout_det in model_page_info["layout_dets"]:
+            x0, y0, _, _, x1, y1, _, _ = layout_det["poly"]
+            bbox = [
+                int(x0 / horizontal_scale_ratio),
+                int(y0 / vertical_scale_ratio),
+                int(x1 / horizontal_scale_ratio),
+                int(y1 / vertical_scale_ratio),
+            ]
+            # 删除高度或者宽度为0的spans
+            if bbox[2] - bbox[0] == 0 or bbox[3] - bbox[1] == 0:
+                continue
+            layout_det = dict(layout_det)
+            layout_det["bbox"] = bbox
+            layout_dets.append(layout_det)
+        return layout_dets
 
-    def __init__(self, model_list: list, docs: fitz.Document):
+    def __fix_by_confidence(self, layout_dets):
+        return [layout_det for layout_det in layout_dets if layout_det["score"] > 0.05]
+
+    def __get_page(self, page_idx: int) -> dict:
+        """
+        model_list中第page_idx个元素修正之后的结果，每页只修正一次
+        """
+        page = self.__fixed_pages.get(page_idx)
+        if page is None:
+            with self.recorder.stage("model_fix_page", page_idx):
+                model_page_info = self.__model_list[page_idx]
+                layout_dets = self.__fix_axis(model_page_info)
+                layout_dets = self.__fix_by_confidence(layout_dets)
+                page = {"page_info": model_page_info["page_info"], "layout_dets": layout_dets}
+            self.__fixed_pages[page_idx] = page
+        return page
+
+    def __init__(self, model_list: list, docs: fitz.Document, recorder=NULL_PERF_RECORDER):
+        """
+        recorder: PerfRecorder，记录按页延迟执行的坐标修正(model_fix_page)和配对(model_tie_up)的耗时
+        """
         self.__model_list = model_list
         self.__docs = docs
-        self.__fix_axis()
-        self.__fix_by_confidence()
+        self.recorder = recorder
+        self.__fixed_pages = {}
+        self.__tie_up_results = {}
+        self.__page_sizes = {}
+        '''page_no对应的model_list下标，只读page_info，不做修正'''
+        self.__page_idx_of_page_no = {}
+        for page_idx, model_page_info in enumerate(model_list):
+            page_no = model_page_info.get("page_info", {}).get("page_no", -1)
+            self.__page_idx_of_page_no.setdefault(page_no, []).append(page_idx)
 
     def __reduct_overlap(self, bboxes):
         N = len(bboxes)
         keep = [True] * N
+        bbox_index = BboxIndex(bboxes)
         for i in range(N):
-            for j in range(N):
-                if i == j:
-                    continue
-                if _is_in(bboxes[i], bboxes[j]):
-                    keep[i] = False
+            # 被其他任意一个bbox包含的bbox都去掉
+            if any(j != i for j in bbox_index.query_containing(bboxes[i])):
+                keep[i] = False
 
         return [bboxes[i] for i in range(N) if keep[i]]
 
@@ -78,7 +98,20 @@ class MagicModel:
     ):
         """
         假定每个 subject 最多有一个 object (可以有多个相邻的 object 合并为单个 object)，每个 object 只能属于一个 subject
+        同一页同样的配对只计算一次
         """
+        key = (page_no, subject_category_id, object_category_id)
+        if key not in self.__tie_up_results:
+            # 先修正这一页，配对的耗时里不包含修正的耗时
+            self.__get_page(page_no)
+            with self.recorder.stage("model_tie_up", page_no):
+                result = self.__do_tie_up_category_by_distance(page_no, subject_category_id, object_category_id)
+            self.__tie_up_results[key] = result
+        return self.__tie_up_results[key]
+
+    def __do_tie_up_category_by_distance(
+            self, page_no, subject_category_id, object_category_id
+    ):
         ret = []
         MAX_DIS_OF_POINT = 10 ** 9 + 7
 
@@ -88,7 +121,7 @@ class MagicModel:
                     lambda x: x["bbox"],
                     filter(
                         lambda x: x["category_id"] == subject_category_id,
-                        self.__model_list[page_no]["layout_dets"],
+                        self.__get_page(page_no)["layout_dets"],
                     ),
                 )
             )
@@ -100,7 +133,7 @@ class MagicModel:
                     lambda x: x["bbox"],
                     filter(
                         lambda x: x["category_id"] == object_category_id,
-                        self.__model_list[page_no]["layout_dets"],
+                        self.__get_page(page_no)["layout_dets"],
                     ),
                 )
             )
@@ -118,87 +151,56 @@ class MagicModel:
             all_bboxes.append({"category_id": object_category_id, "bbox": v})
 
         N = len(all_bboxes)
-        dis = [[MAX_DIS_OF_POINT] * N for _ in range(N)]
-
-        for i in range(N):
-            for j in range(i):
-                if (
-                        all_bboxes[i]["category_id"] == subject_category_id
-                        and all_bboxes[j]["category_id"] == subject_category_id
-                ):
-                    continue
-
-                dis[i][j] = bbox_distance(all_bboxes[i]["bbox"], all_bboxes[j]["bbox"])
-                dis[j][i] = dis[i][j]
+        bboxes = [v["bbox"] for v in all_bboxes]
+        is_subject = np.array([v["category_id"] == subject_category_id for v in all_bboxes], dtype=bool)
+
+        '''subject之间以及自身的距离记为MAX_DIS_OF_POINT'''
+        dis = bbox_distance_batch(bboxes, bboxes)
+        upper = np.triu_indices(N, 1)
+        dis[upper] = dis.T[upper]  # 与逐对计算时一致，上三角取下三角(i > j)的值
+        dis[is_subject[:, None] & is_subject[None, :]] = MAX_DIS_OF_POINT
+        np.fill_diagonal(dis, MAX_DIS_OF_POINT)
+        dis_list = dis.tolist()
+
+        '''两两之间的相对位置，在多于一个方向上分离的(斜对角)不参与配对'''
+        pos_flag_count = sum(m.astype(int) for m in bbox_relative_pos_batch(bboxes, bboxes))
+        '''可以配对的(j, k)：k是object，两者不是斜对角关系，距离不是MAX_DIS_OF_POINT'''
+        is_object = np.array([v["category_id"] == object_category_id for v in all_bboxes], dtype=bool)
+        pair_candidate = (pos_flag_count <= 1) & is_object[None, :] & (dis != MAX_DIS_OF_POINT)
+
+        '''nearest_order[k]: 按到 k 的距离从小到大排列的下标'''
+        nearest_order = np.argsort(dis, axis=0, kind="stable").T.tolist()
 
         used = set()
+        used_mask = np.zeros(N, dtype=bool)
         for i in range(N):
             # 求第 i 个 subject 所关联的 object
             if all_bboxes[i]["category_id"] != subject_category_id:
                 continue
             seen = set()
             candidates = []
-            arr = []
-            for j in range(N):
-
-                pos_flag_count = sum(
-                    list(
-                        map(
-                            lambda x: 1 if x else 0,
-                            bbox_relative_pos(
-                                all_bboxes[i]["bbox"], all_bboxes[j]["bbox"]
-                            ),
-                        )
-                    )
-                )
-                if pos_flag_count > 1:
-                    continue
-                if (
-                        all_bboxes[j]["category_id"] != object_category_id
-                        or j in used
-                        or dis[i][j] == MAX_DIS_OF_POINT
-                ):
-                    continue
-                arr.append((dis[i][j], j))
-
-            arr.sort(key=lambda x: x[0])
-            if len(arr) > 0:
-                candidates.append(arr[0][1])
-                seen.add(arr[0][1])
+            # 距离最近的未使用object作为种子，距离相同时取下标最小的
+            seed_candidates = np.flatnonzero(pair_candidate[i] & ~used_mask)
+            if len(seed_candidates) > 0:
+                seed = int(seed_candidates[np.argmin(dis[i, seed_candidates])])
+                candidates.append(seed)
+                seen.add(seed)
 
             # 已经获取初始种子
             for j in set(candidates):
                 tmp = []
-                for k in range(i + 1, N):
-                    pos_flag_count = sum(
-                        list(
-                            map(
-                                lambda x: 1 if x else 0,
-                                bbox_relative_pos(
-                                    all_bboxes[j]["bbox"], all_bboxes[k]["bbox"]
-                                ),
-                            )
-                        )
-                    )
-
-                    if pos_flag_count > 1:
-                        continue
-
-                    if (
-                            all_bboxes[k]["category_id"] != object_category_id
-                            or k in used
-                            or k in seen
-                            or dis[j][k] == MAX_DIS_OF_POINT
-                    ):
+                for k in np.flatnonzero(pair_candidate[j, i + 1:] & ~used_mask[i + 1:]) + i + 1:
+                    k = int(k)
+                    if k in seen:
                         continue
+                    # k 需要比下标大于 i 的其他未使用、未选中的 bbox 都离 j 更近
+                    # float_gt 对第一个参数单调，只需要和其中离 k 最近的那个比较
                     is_nearest = True
-                    for l in range(i + 1, N):
-                        if l in (j, k) or l in used or l in seen:
+                    for l in nearest_order[k]:
+                        if l <= i or l in (j, k) or l in used or l in seen:
                             continue
-
-                        if not float_gt(dis[l][k], dis[j][k]):
-                            is_nearest = False
-                            break
+                        is_nearest = float_gt(dis_list[l][k], dis_list[j][k])
+                        break
 
                     if is_nearest:
                         tmp.append(k)
@@ -260,6 +262,7 @@ class MagicModel:
                 for j in seen:
                     if _is_in(all_bboxes[j]["bbox"], caption_bbox):
                         used.add(j)
+                        used_mask[j] = True
                         subject_object_relation_map[i].append(j)
 
         for i in sorted(subject_object_relation_map.keys()):
@@ -316,7 +319,7 @@ class MagicModel:
                         or j in with_caption_subject
                 ):
                     continue
-                candidates.append((dis[i][j], j))
+                candidates.append((dis_list[i][j], j))
             if len(candidates) > 0:
                 candidates.sort(key=lambda x: x[0])
                 total_subject_object_dis += candidates[0][1]
@@ -377,7 +380,7 @@ class MagicModel:
 
     def get_ocr_text(self, page_no: int) -> list:  # paddle 搞的，有字也有坐标
         text_spans = []
-        model_page_info = self.__model_list[page_no]
+        model_page_info = self.__get_page(page_no)
         layout_dets = model_page_info["layout_dets"]
         for layout_det in layout_dets:
             if layout_det["category_id"] == "15":
@@ -390,7 +393,7 @@ class MagicModel:
 
     def get_all_spans(self, page_no: int) -> list:
         all_spans = []
-        model_page_info = self.__model_list[page_no]
+        model_page_info = self.__get_page(page_no)
         layout_dets = model_page_info["layout_dets"]
         allow_category_id_list = [3, 5, 13, 14, 15]
         """当成span拼接的"""
@@ -422,21 +425,17 @@ class MagicModel:
         return all_spans
 
     def get_page_size(self, page_no: int):  # 获取页面宽高
-        # 获取当前页的page对象
-        page = self.__docs[page_no]
-        # 获取当前页的宽高
-        page_w = page.rect.width
-        page_h = page.rect.height
-        return page_w, page_h
+        if page_no not in self.__page_sizes:
+            # 获取当前页的page对象
+            page = self.__docs[page_no]
+            # 获取当前页的宽高
+            self.__page_sizes[page_no] = (page.rect.width, page.rect.height)
+        return self.__page_sizes[page_no]
 
     def __get_blocks_by_type(self, type: int, page_no: int, extra_col: list[str] = []) -> list:
         blocks = []
-        for page_dict in self.__model_list:
-            layout_dets = page_dict.get("layout_dets", [])
-            page_info = page_dict.get("page_info", {})
-            page_number = page_info.get("page_no", -1)
-            if page_no != page_number:
-                continue
+        for page_idx in self.__page_idx_of_page_no.get(page_no, []):
+            layout_dets = self.__get_page(page_idx).get("layout_dets", [])
             for item in layout_dets:
                 category_id = item.get("category_id", -1)
                 bbox = item.get("bbox", None)
@@ -1,8 +1,8 @@
-from sklearn.cluster import DBSCAN
 import numpy as np
 from loguru import logger
 
 from magic_pdf.libs.boxbase import _is_in_or_part_overlap_with_area_ratio as is_in_layout
+from magic_pdf.libs.clustering import dbscan_1d
 from magic_pdf.libs.ocr_content_type import ContentType
 
 
@@ -132,28 +132,29 @@ def __valign_lines(blocks, layout_bboxes):
         if len(blocks_in_layoutbox)==0:
             continue
         
-        x0_lst = np.array([[line['bbox'][0], 0] for block in blocks_in_layoutbox for line in block['lines']])
-        x1_lst = np.array([[line['bbox'][2], 0] for block in blocks_in_layoutbox for line in block['lines']])
-        x0_clusters = DBSCAN(eps=min_distance, min_samples=min_sample).fit(x0_lst)
-        x1_clusters = DBSCAN(eps=min_distance, min_samples=min_sample).fit(x1_lst)
-        x0_uniq_label = np.unique(x0_clusters.labels_)
-        x1_uniq_label = np.unique(x1_clusters.labels_)
+        x0_lst = np.array([line['bbox'][0] for block in blocks_in_layoutbox for line in block['lines']])
+        x1_lst = np.array([line['bbox'][2] for block in blocks_in_layoutbox for line in block['lines']])
+        # 一维聚类，分组结果与DBSCAN(eps=min_distance, min_samples=min_sample)相同
+        x0_labels = dbscan_1d(x0_lst, min_distance, min_sample)
+        x1_labels = dbscan_1d(x1_lst, min_distance, min_sample)
+        x0_uniq_label = np.unique(x0_labels)
+        x1_uniq_label = np.unique(x1_labels)
         
         x0_2_new_val = {} # 存储旧值对应的新值映射
         x1_2_new_val = {}
         for label in x0_uniq_label:
             if label==-1:
                 continue
-            x0_index_of_label = np.where(x0_clusters.labels_==label)
-            x0_raw_val = x0_lst[x0_index_of_label][:,0]
-            x0_new_val = np.min(x0_lst[x0_index_of_label][:,0])
+            x0_index_of_label = np.where(x0_labels==label)
+            x0_raw_val = x0_lst[x0_index_of_label]
+            x0_new_val = np.min(x0_lst[x0_index_of_label])
             x0_2_new_val.update({idx: x0_new_val for idx in x0_raw_val})
         for label in x1_uniq_label:
             if label==-1:
                 continue
-            x1_index_of_label = np.where(x1_clusters.labels_==label)
-            x1_raw_val = x1_lst[x1_index_of_label][:,0]
-            x1_new_val = np.max(x1_lst[x1_index_of_label][:,0])
+            x1_index_of_label = np.where(x1_labels==label)
+            x1_raw_val = x1_lst[x1_index_of_label]
+            x1_new_val = np.max(x1_lst[x1_index_of_label])
             x1_2_new_val.update({idx: x1_new_val for idx in x1_raw_val})
         
         for block in blocks_in_layoutbox:
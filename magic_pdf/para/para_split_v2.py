@@ -1,8 +1,9 @@
-from sklearn.cluster import DBSCAN
 import numpy as np
 from loguru import logger
 
 from magic_pdf.libs.boxbase import _is_in_or_part_overlap_with_area_ratio as is_in_layout
+from magic_pdf.libs.clustering import dbscan_1d
+from magic_pdf.libs.perf_recorder import NULL_PERF_RECORDER
 from magic_pdf.libs.ocr_content_type import ContentType, BlockType
 from magic_pdf.model.magic_model import MagicModel
 
@@ -140,28 +141,29 @@ def __valign_lines(blocks, layout_bboxes):
             new_layout_bboxes.append(layout_box['layout_bbox'])
             continue
 
-        x0_lst = np.array([[line['bbox'][0], 0] for block in blocks_in_layoutbox for line in block['lines']])
-        x1_lst = np.array([[line['bbox'][2], 0] for block in blocks_in_layoutbox for line in block['lines']])
-        x0_clusters = DBSCAN(eps=min_distance, min_samples=min_sample).fit(x0_lst)
-        x1_clusters = DBSCAN(eps=min_distance, min_samples=min_sample).fit(x1_lst)
-        x0_uniq_label = np.unique(x0_clusters.labels_)
-        x1_uniq_label = np.unique(x1_clusters.labels_)
+        x0_lst = np.array([line['bbox'][0] for block in blocks_in_layoutbox for line in block['lines']])
+        x1_lst = np.array([line['bbox'][2] for block in blocks_in_layoutbox for line in block['lines']])
+        # 一维聚类，分组结果与DBSCAN(eps=min_distance, min_samples=min_sample)相同
+        x0_labels = dbscan_1d(x0_lst, min_distance, min_sample)
+        x1_labels = dbscan_1d(x1_lst, min_distance, min_sample)
+        x0_uniq_label = np.unique(x0_labels)
+        x1_uniq_label = np.unique(x1_labels)
 
         x0_2_new_val = {}  # 存储旧值对应的新值映射
         x1_2_new_val = {}
         for label in x0_uniq_label:
             if label == -1:
                 continue
-            x0_index_of_label = np.where(x0_clusters.labels_ == label)
-            x0_raw_val = x0_lst[x0_index_of_label][:, 0]
-            x0_new_val = np.min(x0_lst[x0_index_of_label][:, 0])
+            x0_index_of_label = np.where(x0_labels == label)
+            x0_raw_val = x0_lst[x0_index_of_label]
+            x0_new_val = np.min(x0_lst[x0_index_of_label])
             x0_2_new_val.update({idx: x0_new_val for idx in x0_raw_val})
         for label in x1_uniq_label:
             if label == -1:
                 continue
-            x1_index_of_label = np.where(x1_clusters.labels_ == label)
-            x1_raw_val = x1_lst[x1_index_of_label][:, 0]
-            x1_new_val = np.max(x1_lst[x1_index_of_label][:, 0])
+            x1_index_of_label = np.where(x1_labels == label)
+            x1_raw_val = x1_lst[x1_index_of_label]
+            x1_new_val = np.max(x1_lst[x1_index_of_label])
             x1_2_new_val.update({idx: x1_new_val for idx in x1_raw_val})
 
         for block in blocks_in_layoutbox:
@@ -664,53 +666,71 @@ def __do_split_page(blocks, layout_bboxes, new_layout_bbox, page_num, lang):
 
 
 
-def para_split(pdf_info_dict, debug_mode, lang="en"):
-    new_layout_of_pages = []  # 数组的数组，每个元素是一个页面的layoutS
-    all_page_list_info = []  # 保存每个页面开头和结尾是否是列表
-    for page_num, page in pdf_info_dict.items():
-        blocks = page['preproc_blocks']
-        layout_bboxes = page['layout_bboxes']
-        new_layout_bbox = __common_pre_proc(blocks, layout_bboxes)
-        new_layout_of_pages.append(new_layout_bbox)
-        splited_blocks, page_list_info = __do_split_page(blocks, layout_bboxes, new_layout_bbox, page_num, lang)
-        all_page_list_info.append(page_list_info)
-        page['para_blocks'] = splited_blocks
-
-    """连接页面与页面之间的可能合并的段落"""
-    pdf_infos = list(pdf_info_dict.values())
-    for page_num, page in enumerate(pdf_info_dict.values()):
-        if page_num == 0:
-            continue
-        pre_page_paras = pdf_infos[page_num - 1]['para_blocks']
-        next_page_paras = pdf_infos[page_num]['para_blocks']
-        pre_page_layout_bbox = new_layout_of_pages[page_num - 1]
-        next_page_layout_bbox = new_layout_of_pages[page_num]
-
-        is_conn = __connect_para_inter_page(pre_page_paras, next_page_paras, pre_page_layout_bbox,
-                                            next_page_layout_bbox, page_num, lang)
-        if debug_mode:
-            if is_conn:
-                logger.info(f"连接了第{page_num - 1}页和第{page_num}页的段落")
-
-        is_list_conn = __connect_list_inter_page(pre_page_paras, next_page_paras, pre_page_layout_bbox,
-                                                 next_page_layout_bbox, all_page_list_info[page_num - 1],
-                                                 all_page_list_info[page_num], page_num, lang)
-        if debug_mode:
-            if is_list_conn:
-                logger.info(f"连接了第{page_num - 1}页和第{page_num}页的列表段落")
-
+def __finish_page(page, new_layout_bbox, page_num, lang, debug_mode):
     """接下来可能会漏掉一些特别的一些可以合并的内容，对他们进行段落连接
     1. 正文中有时出现一个行顶格，接下来几行缩进的情况。
     2. 居中的一些连续单行，如果高度相同，那么可能是一个段落。
     """
-    for page_num, page in enumerate(pdf_info_dict.values()):
-        page_paras = page['para_blocks']
-        new_layout_bbox = new_layout_of_pages[page_num]
-        __connect_middle_align_text(page_paras, new_layout_bbox, page_num, lang, debug_mode=debug_mode)
-        __merge_signle_list_text(page_paras, new_layout_bbox, page_num, lang)
+    page_paras = page['para_blocks']
+    __connect_middle_align_text(page_paras, new_layout_bbox, page_num, lang, debug_mode=debug_mode)
+    __merge_signle_list_text(page_paras, new_layout_bbox, page_num, lang)
 
     # layout展平
-    for page_num, page in enumerate(pdf_info_dict.values()):
-        page_paras = page['para_blocks']
-        page_blocks = [block for layout in page_paras for block in layout]
-        page["para_blocks"] = page_blocks
+    page_blocks = [block for layout in page_paras for block in layout]
+    page["para_blocks"] = page_blocks
+    return page
+
+
+def para_split_iter(page_infos, debug_mode, lang="en", recorder=NULL_PERF_RECORDER):
+    """
+    按页序消费page_info，逐页产出分好段的page_info。
+    跨页的段落连接只发生在相邻两页之间，所以一页和下一页连接完成后它的分段就不会再变了，此时即可产出；
+    最终结果和对整本文档调用para_split完全一致。
+    recorder: PerfRecorder，按页记录分段的耗时，不包含产出page_info之前上游解析和之后下游消费的时间
+    """
+    pre_page = None
+    pre_page_layout_bbox = None
+    pre_page_list_info = None
+    for page_num, page in enumerate(page_infos):
+        finished_page = None
+        with recorder.stage("para_split", page.get('page_idx')):
+            blocks = page['preproc_blocks']
+            layout_bboxes = page['layout_bboxes']
+            new_layout_bbox = __common_pre_proc(blocks, layout_bboxes)
+            splited_blocks, page_list_info = __do_split_page(blocks, layout_bboxes, new_layout_bbox, page_num, lang)
+            page['para_blocks'] = splited_blocks
+
+            if pre_page is not None:
+                """连接页面与页面之间的可能合并的段落"""
+                pre_page_paras = pre_page['para_blocks']
+                next_page_paras = page['para_blocks']
+
+                is_conn = __connect_para_inter_page(pre_page_paras, next_page_paras, pre_page_layout_bbox,
+                                                    new_layout_bbox, page_num, lang)
+                if debug_mode:
+                    if is_conn:
+                        logger.info(f"连接了第{page_num - 1}页和第{page_num}页的段落")
+
+                is_list_conn = __connect_list_inter_page(pre_page_paras, next_page_paras, pre_page_layout_bbox,
+                                                         new_layout_bbox, pre_page_list_info,
+                                                         page_list_info, page_num, lang)
+                if debug_mode:
+                    if is_list_conn:
+                        logger.info(f"连接了第{page_num - 1}页和第{page_num}页的列表段落")
+
+                finished_page = __finish_page(pre_page, pre_page_layout_bbox, page_num - 1, lang, debug_mode)
+
+        if finished_page is not None:
+            yield finished_page
+
+        pre_page, pre_page_layout_bbox, pre_page_list_info = page, new_layout_bbox, page_list_info
+
+    if pre_page is not None:
+        with recorder.stage("para_split", pre_page.get('page_idx')):
+            finished_page = __finish_page(pre_page, pre_page_layout_bbox, page_num, lang, debug_mode)
+        yield finished_page
+
+
+def para_split(pdf_info_dict, debug_mode, lang="en"):
+    for _ in para_split_iter(pdf_info_dict.values(), debug_mode, lang):
+        pass
@@ -0,0 +1,316 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from loguru import logger
+
+from magic_pdf.layout.layout_sort import get_bboxes_layout
+from magic_pdf.libs.commons import get_delta_time
+from magic_pdf.libs.math import float_equal
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
+from magic_pdf.libs.perf_recorder import PerfRecorder, NULL_PERF_RECORDER
+from magic_pdf.libs.pdf_text_cache import extract_dict_and_rawdict_blocks
+from magic_pdf.libs.ocr_content_type import ContentType
+from magic_pdf.model.magic_model import MagicModel
+from magic_pdf.para.para_split_v2 import para_split_iter
+from magic_pdf.pre_proc.citationmarker_remove import remove_citation_marker
+from magic_pdf.pre_proc.construct_page_dict import ocr_construct_page_component_v2
+from magic_pdf.pre_proc.cut_image import ocr_cut_image_and_table
+from magic_pdf.pre_proc.equations_replace import (
+    combine_chars_to_pymudict,
+    remove_chars_in_text_blocks,
+    replace_equations_in_textblock,
+)
+from magic_pdf.pre_proc.ocr_detect_all_bboxes import ocr_prepare_bboxes_for_layout_split
+from magic_pdf.pre_proc.ocr_dict_merge import sort_blocks_by_layout, fill_spans_in_blocks, fix_block_spans
+from magic_pdf.pre_proc.ocr_span_list_modify import remove_overlaps_min_spans, get_qa_need_list_v2
+
+PARSE_MODE_TXT = "txt"
+PARSE_MODE_OCR = "ocr"
+'''按页决定用txt还是ocr的文本span，layout、截图等与span来源无关的步骤每页只做一次'''
+PARSE_MODE_UNION = "union"
+
+
+def txt_spans_extract(pdf_page, inline_equations, interline_equations, text_cache=None):
+    '''只抽取一次rawdict，dict由它推导'''
+    if text_cache is not None:
+        text_raw_blocks, char_level_text_blocks = text_cache.get_dict_and_rawdict_blocks(pdf_page.number)
+    else:
+        text_raw_blocks, char_level_text_blocks = extract_dict_and_rawdict_blocks(pdf_page)
+    text_blocks = combine_chars_to_pymudict(text_raw_blocks, char_level_text_blocks)
+    text_blocks = replace_equations_in_textblock(
+        text_blocks, inline_equations, interline_equations
+    )
+    text_blocks = remove_citation_marker(text_blocks)
+    text_blocks = remove_chars_in_text_blocks(text_blocks)
+    spans = []
+    for v in text_blocks:
+        for line in v["lines"]:
+            for span in line["spans"]:
+                bbox = span["bbox"]
+                if float_equal(bbox[0], bbox[2]) or float_equal(bbox[1], bbox[3]):
+                    continue
+                spans.append(
+                    {
+                        "bbox": list(span["bbox"]),
+                        "content": span["text"],
+                        "type": ContentType.Text,
+                    }
+                )
+    return spans
+
+
+def replace_text_span(pymu_spans, ocr_spans):
+    return list(filter(lambda x: x["type"] != ContentType.Text, ocr_spans)) + pymu_spans
+
+
+def union_spans_extract(pdf_page, ocr_spans, inline_equations, interline_equations, text_cache=None):
+    """
+    单页的txt/ocr选择：页面没有文字层(扫描页)或者txt方式抽取出错时，这一页直接使用ocr的span
+    返回(spans, 这一页实际使用的解析方式)
+    """
+    page_id = pdf_page.number
+    page_text = text_cache.get_text(page_id) if text_cache is not None else pdf_page.get_text("text")
+    if len(page_text.strip()) == 0:
+        logger.warning(f"page_id: {page_id} has no text layer, use ocr spans")
+        return ocr_spans, PARSE_MODE_OCR
+    try:
+        pymu_spans = txt_spans_extract(pdf_page, inline_equations, interline_equations, text_cache)
+    except Exception as e:
+        logger.exception(e)
+        logger.warning(f"page_id: {page_id} txt spans extract failed, use ocr spans")
+        return ocr_spans, PARSE_MODE_OCR
+    return replace_text_span(pymu_spans, ocr_spans), PARSE_MODE_TXT
+
+
+def parse_page_core(pdf_docs, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, text_cache=None,
+                    recorder=NULL_PERF_RECORDER):
+    """
+    解析单个页面，返回该页的page_info
+    这一步与其他页面无关，可以按页并行
+    text_cache: 文档的PdfTextCache，txt方式抽取文本时使用
+    recorder: PerfRecorder，按页记录各阶段耗时
+    parse_mode为PARSE_MODE_UNION且这一页改用了ocr的span时，page_info中会带上"_parse_type": "ocr"
+    """
+    with recorder.stage("model_blocks", page_id):
+        '''从magic_model对象中获取后面会用到的区块信息'''
+        img_blocks = magic_model.get_imgs(page_id)
+        table_blocks = magic_model.get_tables(page_id)
+        discarded_blocks = magic_model.get_discarded(page_id)
+        text_blocks = magic_model.get_text_blocks(page_id)
+        title_blocks = magic_model.get_title_blocks(page_id)
+        inline_equations, interline_equations, interline_equation_blocks = magic_model.get_equations(page_id)
+
+        page_w, page_h = magic_model.get_page_size(page_id)
+
+    with recorder.stage("layout_sort", page_id):
+        '''将所有区块的bbox整理到一起'''
+        all_bboxes = ocr_prepare_bboxes_for_layout_split(
+            img_blocks, table_blocks, discarded_blocks, text_blocks, title_blocks,
+            interline_equations, page_w, page_h)
+
+        '''根据区块信息计算layout'''
+        page_boundry = [0, 0, page_w, page_h]
+        layout_bboxes, layout_tree = get_bboxes_layout(all_bboxes, page_boundry, page_id)
+
+        '''根据layout顺序，对当前页面所有需要留下的block进行排序'''
+        sorted_blocks = sort_blocks_by_layout(all_bboxes, layout_bboxes)
+
+    with recorder.stage("span_extract", page_id):
+        '''获取所有需要拼接的span资源'''
+        spans = magic_model.get_all_spans(page_id)
+        page_parse_mode = parse_mode
+        if parse_mode == PARSE_MODE_TXT:
+            '''ocr 中文本类的 span 用 pymu spans 替换！'''
+            pymu_spans = txt_spans_extract(pdf_docs[page_id], inline_equations, interline_equations, text_cache)
+            spans = replace_text_span(pymu_spans, spans)
+        elif parse_mode == PARSE_MODE_UNION:
+            spans, page_parse_mode = union_spans_extract(pdf_docs[page_id], spans, inline_equations,
+                                                         interline_equations, text_cache)
+        elif parse_mode != PARSE_MODE_OCR:
+            raise Exception(f"unknown parse mode: {parse_mode}")
+
+    with recorder.stage("overlap_remove", page_id):
+        '''删除重叠spans中较小的那些'''
+        spans, dropped_spans_by_span_overlap = remove_overlaps_min_spans(spans)
+
+    with recorder.stage("cut_image", page_id):
+        '''对image和table截图'''
+        spans = ocr_cut_image_and_table(spans, pdf_docs[page_id], page_id, pdf_bytes_md5, imageWriter, recorder)
+
+    with recorder.stage("fill_blocks", page_id):
+        '''将span填入排好序的blocks中'''
+        block_with_spans = fill_spans_in_blocks(sorted_blocks, spans)
+
+        '''对block进行fix操作'''
+        fix_blocks = fix_block_spans(block_with_spans, img_blocks, table_blocks)
+
+        '''获取QA需要外置的list'''
+        images, tables, interline_equations = get_qa_need_list_v2(fix_blocks)
+
+        '''构造pdf_info_dict'''
+        page_info = ocr_construct_page_component_v2(fix_blocks, layout_bboxes, page_id, page_w, page_h, layout_tree,
+                                                    images, tables, interline_equations, discarded_blocks)
+    if parse_mode == PARSE_MODE_UNION and page_parse_mode == PARSE_MODE_OCR:
+        page_info["_parse_type"] = PARSE_MODE_OCR
+        recorder.add_count("ocr_fallback_page", page_id=page_id)
+    return page_info
+
+
+'''按页并行时，每个子进程各自持有的文档对象'''
+_page_worker_env = {}
+
+
+def _init_page_worker(pdf_bytes, pdf_bytes_md5, model_list, imageWriter, parse_mode, debug_mode, profile):
+    doc_context = PdfDocContext(pdf_bytes, pdf_bytes_md5)
+    _page_worker_env.update(
+        pdf_docs=doc_context.pdf_docs,
+        magic_model=MagicModel(model_list, doc_context.pdf_docs),
+        pdf_bytes_md5=doc_context.pdf_bytes_md5,
+        text_cache=doc_context.text_cache,
+        imageWriter=imageWriter,
+        parse_mode=parse_mode,
+        debug_mode=debug_mode,
+        profile=profile,
+    )
+
+
+def _parse_page_in_worker(page_id):
+    """
+    返回(page_info, 这一页的耗时记录)，不需要记录时耗时记录为None
+    """
+    env = _page_worker_env
+    recorder = PerfRecorder() if env["profile"] else NULL_PERF_RECORDER
+    env["magic_model"].recorder = recorder
+    start_time = time.time()
+    with recorder.stage("parse_page", page_id):
+        page_info = parse_page_core(env["pdf_docs"], env["magic_model"], page_id, env["pdf_bytes_md5"],
+                                    env["imageWriter"], env["parse_mode"], env["text_cache"], recorder)
+    with recorder.stage("image_flush", page_id):
+        # 子进程里的异步上传要在返回这一页之前完成
+        env["imageWriter"].flush()
+    if env["debug_mode"]:
+        logger.info(f"page_id: {page_id}, page_cost_time: {get_delta_time(start_time)}")
+    return page_info, recorder.to_dict() if env["profile"] else None
+
+
+def _iter_parse_pages(doc_context, model_list, imageWriter, parse_mode, page_ids, debug_mode, workers,
+                      recorder=NULL_PERF_RECORDER):
+    """
+    按页序产出未分段的page_info
+    workers > 1 时，按页拆分到进程池中并行解析，每个子进程用pdf_bytes重新打开文档，各自使用自己的文本缓存，md5直接传过去
+    子进程里记录的各页耗时随page_info一起返回，合并到recorder中
+    """
+    pdf_docs = doc_context.pdf_docs
+    pdf_bytes_md5 = doc_context.pdf_bytes_md5
+
+    if workers > 1 and len(page_ids) > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(page_ids)),
+            initializer=_init_page_worker,
+            initargs=(doc_context.pdf_bytes, pdf_bytes_md5, model_list, imageWriter, parse_mode, debug_mode,
+                      recorder.enabled),
+        )
+        try:
+            for page_info, page_perf in executor.map(_parse_page_in_worker, page_ids):
+                recorder.merge(page_perf)
+                yield page_info
+        finally:
+            # 调用方提前停止迭代时，不再解析剩下的页面
+            executor.shutdown(cancel_futures=True)
+        return
+
+    '''用model_list和docs对象初始化magic_model，每页的坐标修正和配对在用到时才做，耗时记在model_fix_page和model_tie_up中'''
+    magic_model = MagicModel(model_list, pdf_docs, recorder)
+
+    '''初始化启动时间'''
+    start_time = time.time()
+
+    for page_id in page_ids:
+
+        '''debug时输出每页解析的耗时'''
+        if debug_mode:
+            time_now = time.time()
+            logger.info(
+                f"page_id: {page_id}, last_page_cost_time: {get_delta_time(start_time)}"
+            )
+            start_time = time_now
+
+        with recorder.stage("parse_page", page_id):
+            page_info = parse_page_core(pdf_docs, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode,
+                                        doc_context.text_cache, recorder)
+        yield page_info
+
+
+def pdf_parse_union_iter(pdf_bytes,
+                         model_list,
+                         imageWriter,
+                         parse_mode,
+                         start_page_id=0,
+                         end_page_id=None,
+                         debug_mode=False,
+                         workers=1,
+                         doc_context=None,
+                         recorder=None,
+                         ):
+    """
+    txt和ocr两种解析方式的公共流程，逐页产出已经分好段的page_info
+    一页只有在和下一页的跨页段落连接完成后才会产出，产出后不会再被修改
+    imageWriter异步写入时，产出的page_info中引用的截图不一定已经写好，迭代结束(或者生成器被关闭)时才flush，
+    flush完成后截图才保证都已写入，上传的错误也在这时抛出
+    doc_context: pdf_bytes的PdfDocContext(例如分类时用过的)，传入时复用其中打开的文档、md5和文本抽取结果
+    recorder: PerfRecorder，传入时记录各阶段(按页和整个文档)的耗时和调用次数
+    """
+    if doc_context is None:
+        doc_context = PdfDocContext(pdf_bytes)
+    if recorder is None:
+        recorder = NULL_PERF_RECORDER
+    pdf_docs = doc_context.pdf_docs
+
+    '''根据输入的起始范围解析pdf'''
+    end_page_id = end_page_id if end_page_id else len(pdf_docs) - 1
+    page_ids = range(start_page_id, end_page_id + 1)
+
+    """分段"""
+    pages = _iter_parse_pages(doc_context, model_list, imageWriter, parse_mode, page_ids, debug_mode, workers, recorder)
+    try:
+        yield from para_split_iter(pages, debug_mode=debug_mode, recorder=recorder)
+    except Exception as e:
+        logger.exception(e)
+        raise e
+    finally:
+        '''等待imageWriter异步上传的截图全部完成，上传出错时抛出；调用方提前停止迭代或者解析出错时也要等待'''
+        with recorder.stage("image_flush"):
+            imageWriter.flush()
+
+
+def pdf_parse_union(pdf_bytes,
+                    model_list,
+                    imageWriter,
+                    parse_mode,
+                    start_page_id=0,
+                    end_page_id=None,
+                    debug_mode=False,
+                    workers=1,
+                    doc_context=None,
+                    recorder=None,
+                    ):
+    """
+    txt和ocr两种解析方式的公共流程
+    workers > 1 时，按页拆分到进程池中并行解析；分段(para_split)仍在主进程对整本文档进行
+    """
+    pdf_info_list = list(pdf_parse_union_iter(pdf_bytes,
+                                              model_list,
+                                              imageWriter,
+                                              parse_mode,
+                                              start_page_id=start_page_id,
+                                              end_page_id=end_page_id,
+                                              debug_mode=debug_mode,
+                                              workers=workers,
+                                              doc_context=doc_context,
+                                              recorder=recorder,
+                                              ))
+    new_pdf_info_dict = {
+        "pdf_info": pdf_info_list,
+    }
+
+    return new_pdf_info_dict
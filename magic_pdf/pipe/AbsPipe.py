@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
 
+from loguru import logger
+
 from magic_pdf.dict2md.mkcontent import mk_universal_format, mk_mm_markdown
-from magic_pdf.dict2md.ocr_mkcontent import make_standard_format_with_para, ocr_mk_mm_markdown_with_para
-from magic_pdf.filter.pdf_classify_by_type import classify
-from magic_pdf.filter.pdf_meta_scan import pdf_meta_scan
+from magic_pdf.dict2md.ocr_mkcontent import make_standard_format_with_para, ocr_mk_mm_markdown_with_para, \
+    ocr_mk_mm_markdown_with_para_iter
+from magic_pdf.filter.classify_cache import ClassifyCache
+from magic_pdf.filter.pdf_classify_by_type import classify_incrementally
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
+from magic_pdf.libs.perf_recorder import PerfRecorder, NULL_PERF_RECORDER
 from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
 from magic_pdf.libs.drop_reason import DropReason
 from magic_pdf.libs.json_compressor import JsonCompressor
@@ -16,12 +21,19 @@ class AbsPipe(ABC):
     PIP_OCR = "ocr"
     PIP_TXT = "txt"
 
-    def __init__(self, pdf_bytes: bytes, model_list: list, image_writer: AbsReaderWriter, is_debug: bool = False):
+    def __init__(self, pdf_bytes: bytes, model_list: list, image_writer: AbsReaderWriter, is_debug: bool = False,
+                 recorder: PerfRecorder = None, classify_cache: ClassifyCache = None):
         self.pdf_bytes = pdf_bytes
         self.model_list = model_list
         self.image_writer = image_writer
         self.pdf_mid_data = None  # 未压缩
         self.is_debug = is_debug
+        # 分类、解析和降级重试共用同一个文档上下文，文档在第一次用到时才打开且只打开一次，md5只算一次，每页的文本只抽取一次
+        self.doc_context = PdfDocContext(pdf_bytes)
+        # 传入PerfRecorder时记录分类、解析、分段、生成markdown等各阶段的耗时，用recorder.to_json()导出
+        self.recorder = recorder if recorder is not None else NULL_PERF_RECORDER
+        # 传入ClassifyCache时先按pdf的md5查分类结论，重跑时不用再分类
+        self.classify_cache = classify_cache
     
     def get_compress_pdf_mid_data(self):
         return JsonCompressor.compress_json(self.pdf_mid_data)
@@ -40,6 +52,21 @@ class AbsPipe(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def pipe_iter_pages(self):
+        """
+        有状态的逐页解析，产出分好段的page_info，不会填充pdf_mid_data
+        page_info中引用的截图在迭代结束(或者生成器被关闭)之后才保证已经写入image_writer
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def pipe_iter_markdown(self):
+        """
+        有状态的逐页组装markdown
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def pipe_mk_uni_format(self):
         """
@@ -55,62 +82,115 @@ class AbsPipe(ABC):
         raise NotImplementedError
 
     @staticmethod
-    def classify(pdf_bytes: bytes) -> str:
+    def classify(pdf_bytes: bytes, doc_context: PdfDocContext = None, recorder: PerfRecorder = None,
+                 classify_cache: ClassifyCache = None) -> str:
         """
         根据pdf的元数据，判断是否是文本pdf，还是ocr pdf
+        边扫描边判断，结论确定后就不再抽取剩下页面的文本，实际抽取了文本的页数记到recorder的classify_text_pages上
+        传入classify_cache时先按pdf的md5查缓存，命中时分类不会打开文档(doc_context是按需打开的)，需要丢弃的文档同样会被缓存
         """
-        pdf_meta = pdf_meta_scan(pdf_bytes)
-        if pdf_meta.get("_need_drop", False):  # 如果返回了需要丢弃的标志，则抛出异常
-            raise Exception(f"pdf meta_scan need_drop,reason is {pdf_meta['_drop_reason']}")
-        else:
-            is_encrypted = pdf_meta["is_encrypted"]
-            is_needs_password = pdf_meta["is_needs_password"]
-            if is_encrypted or is_needs_password:  # 加密的，需要密码的，没有页面的，都不处理
-                raise Exception(f"pdf meta_scan need_drop,reason is {DropReason.ENCRYPTED}")
-            else:
-                is_text_pdf, results = classify(
-                    pdf_meta["total_page"],
-                    pdf_meta["page_width_pts"],
-                    pdf_meta["page_height_pts"],
-                    pdf_meta["image_info_per_page"],
-                    pdf_meta["text_len_per_page"],
-                    pdf_meta["imgs_per_page"],
-                    pdf_meta["text_layout_per_page"],
-                )
-                if is_text_pdf:
-                    return AbsPipe.PIP_TXT
-                else:
-                    return AbsPipe.PIP_OCR
+        if doc_context is None:
+            doc_context = PdfDocContext(pdf_bytes)
+        if recorder is None:
+            recorder = NULL_PERF_RECORDER
+        classify_result = None
+        if classify_cache is not None:
+            pdf_md5 = doc_context.pdf_bytes_md5
+            classify_result = classify_cache.get_classify(pdf_md5)
+            recorder.add_count("classify_cache_hit" if classify_result is not None else "classify_cache_miss")
+        if classify_result is None:
+            classify_result = AbsPipe.__classify_doc(doc_context, recorder)
+            if classify_cache is not None:
+                classify_cache.put_classify(pdf_md5, classify_result)
+
+        if "drop_reason" in classify_result:
+            raise Exception(f"pdf meta_scan need_drop,reason is {classify_result['drop_reason']}")
+        return classify_result["pdf_type"]
+
+    @staticmethod
+    def __classify_doc(doc_context: PdfDocContext, recorder: PerfRecorder) -> dict:
+        """
+        返回可以写入ClassifyCache的分类结论，需要丢弃的文档返回{"drop_reason": ...}
+        """
+        doc = doc_context.pdf_docs
+        if len(doc) == 0:
+            return {"drop_reason": DropReason.EMPTY_PDF}
+        if doc.is_encrypted or doc.needs_pass:  # 加密的，需要密码的，没有页面的，都不处理
+            return {"drop_reason": DropReason.ENCRYPTED}
+
+        is_text_pdf, results, text_scanned_page_cnt = classify_incrementally(doc_context)
+        recorder.add_count("classify_text_pages", text_scanned_page_cnt)
+        logger.info(f"classify by {text_scanned_page_cnt}/{len(doc)} pages, is_text_pdf: {is_text_pdf}, results: {results}")
+        return {
+            "pdf_type": AbsPipe.PIP_TXT if is_text_pdf else AbsPipe.PIP_OCR,
+            "results": results,
+            "text_scanned_page_cnt": text_scanned_page_cnt,
+            "total_page": len(doc),
+        }
 
     @staticmethod
     def mk_uni_format(compressed_pdf_mid_data: str, img_buket_path: str) -> list:
         """
         根据pdf类型，生成统一格式content_list
+        入参是压缩后的pdf_mid_data，供spark等需要跨进程传递中间结果的调用方使用
         """
         pdf_mid_data = JsonCompressor.decompress_json(compressed_pdf_mid_data)
+        return AbsPipe.mk_uni_format_by_mid_data(pdf_mid_data, img_buket_path)
+
+    @staticmethod
+    def mk_uni_format_by_mid_data(pdf_mid_data: dict, img_buket_path: str, recorder: PerfRecorder = None) -> list:
+        """
+        根据pdf类型，生成统一格式content_list
+        直接使用内存中未压缩的pdf_mid_data，省去一次压缩和解压
+        """
+        recorder = recorder if recorder is not None else NULL_PERF_RECORDER
         parse_type = pdf_mid_data["_parse_type"]
         pdf_info_list = pdf_mid_data["pdf_info"]
-        if parse_type == AbsPipe.PIP_TXT:
-            # content_list = mk_universal_format(pdf_info_list, img_buket_path)
-            content_list = make_standard_format_with_para(pdf_info_list, img_buket_path)
-        elif parse_type == AbsPipe.PIP_OCR:
-            content_list = make_standard_format_with_para(pdf_info_list, img_buket_path)
+        with recorder.stage("mk_uni_format"):
+            if parse_type == AbsPipe.PIP_TXT:
+                # content_list = mk_universal_format(pdf_info_list, img_buket_path)
+                content_list = make_standard_format_with_para(pdf_info_list, img_buket_path)
+            elif parse_type == AbsPipe.PIP_OCR:
+                content_list = make_standard_format_with_para(pdf_info_list, img_buket_path)
         return content_list
 
     @staticmethod
     def mk_markdown(compressed_pdf_mid_data: str, img_buket_path: str) -> list:
         """
         根据pdf类型，markdown
+        入参是压缩后的pdf_mid_data，供spark等需要跨进程传递中间结果的调用方使用
         """
         pdf_mid_data = JsonCompressor.decompress_json(compressed_pdf_mid_data)
+        return AbsPipe.mk_markdown_by_mid_data(pdf_mid_data, img_buket_path)
+
+    @staticmethod
+    def mk_markdown_by_mid_data(pdf_mid_data: dict, img_buket_path: str, recorder: PerfRecorder = None) -> list:
+        """
+        根据pdf类型，markdown
+        直接使用内存中未压缩的pdf_mid_data，省去一次压缩和解压
+        """
+        recorder = recorder if recorder is not None else NULL_PERF_RECORDER
         parse_type = pdf_mid_data["_parse_type"]
         pdf_info_list = pdf_mid_data["pdf_info"]
-        if parse_type == AbsPipe.PIP_TXT:
-            # content_list = mk_universal_format(pdf_info_list, img_buket_path)
-            # md_content = mk_mm_markdown(content_list)
-            md_content = ocr_mk_mm_markdown_with_para(pdf_info_list, img_buket_path)
-        elif parse_type == AbsPipe.PIP_OCR:
-            md_content = ocr_mk_mm_markdown_with_para(pdf_info_list, img_buket_path)
+        with recorder.stage("mk_markdown"):
+            if parse_type == AbsPipe.PIP_TXT:
+                # content_list = mk_universal_format(pdf_info_list, img_buket_path)
+                # md_content = mk_mm_markdown(content_list)
+                md_content = ocr_mk_mm_markdown_with_para(pdf_info_list, img_buket_path)
+            elif parse_type == AbsPipe.PIP_OCR:
+                md_content = ocr_mk_mm_markdown_with_para(pdf_info_list, img_buket_path)
         return md_content
 
+    @staticmethod
+    def iter_markdown(pdf_info_iter, img_buket_path: str):
+        """
+        逐页产出markdown，用'\n\n'把产出的内容连接起来就是整个文档的markdown
+        """
+        try:
+            yield from ocr_mk_mm_markdown_with_para_iter(pdf_info_iter, img_buket_path)
+        finally:
+            # pdf_info_iter是逐页解析的生成器时，提前停止迭代也要关闭它，让它flush imageWriter
+            if hasattr(pdf_info_iter, "close"):
+                pdf_info_iter.close()
+
 
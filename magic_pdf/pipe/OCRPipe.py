@@ -1,24 +1,35 @@
+from magic_pdf.libs.perf_recorder import PerfRecorder
 from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
-from magic_pdf.libs.json_compressor import JsonCompressor
 from magic_pdf.pipe.AbsPipe import AbsPipe
-from magic_pdf.user_api import parse_ocr_pdf
+from magic_pdf.user_api import parse_ocr_pdf, iter_parse_ocr_pdf
 
 
 class OCRPipe(AbsPipe):
 
-    def __init__(self, pdf_bytes: bytes, model_list: list, image_writer: AbsReaderWriter, is_debug: bool=False):
-        super().__init__(pdf_bytes, model_list, image_writer, is_debug)
+    def __init__(self, pdf_bytes: bytes, model_list: list, image_writer: AbsReaderWriter, is_debug: bool=False,
+                 recorder: PerfRecorder = None):
+        super().__init__(pdf_bytes, model_list, image_writer, is_debug, recorder)
 
     def pipe_classify(self):
         pass
 
     def pipe_parse(self):
-        self.pdf_mid_data = parse_ocr_pdf(self.pdf_bytes, self.model_list, self.image_writer, is_debug=self.is_debug)
+        with self.recorder.stage("parse"):
+            self.pdf_mid_data = parse_ocr_pdf(self.pdf_bytes, self.model_list, self.image_writer,
+                                              is_debug=self.is_debug, doc_context=self.doc_context,
+                                              recorder=self.recorder)
+
+    def pipe_iter_pages(self):
+        yield from iter_parse_ocr_pdf(self.pdf_bytes, self.model_list, self.image_writer, is_debug=self.is_debug,
+                                          doc_context=self.doc_context, recorder=self.recorder)
+
+    def pipe_iter_markdown(self, img_parent_path: str):
+        yield from AbsPipe.iter_markdown(self.pipe_iter_pages(), img_parent_path)
 
     def pipe_mk_uni_format(self, img_parent_path: str):
-        content_list = AbsPipe.mk_uni_format(self.get_compress_pdf_mid_data(), img_parent_path)
+        content_list = AbsPipe.mk_uni_format_by_mid_data(self.pdf_mid_data, img_parent_path, self.recorder)
         return content_list
 
     def pipe_mk_markdown(self, img_parent_path: str):
-        md_content = AbsPipe.mk_markdown(self.get_compress_pdf_mid_data(), img_parent_path)
+        md_content = AbsPipe.mk_markdown_by_mid_data(self.pdf_mid_data, img_parent_path, self.recorder)
         return md_content
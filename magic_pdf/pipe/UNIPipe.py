@@ -3,33 +3,54 @@ import json
 from loguru import logger
 from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
 from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+from magic_pdf.filter.classify_cache import ClassifyCache
 from magic_pdf.libs.commons import join_path
+from magic_pdf.libs.perf_recorder import PerfRecorder
 from magic_pdf.pipe.AbsPipe import AbsPipe
-from magic_pdf.user_api import parse_union_pdf, parse_ocr_pdf
+from magic_pdf.user_api import parse_union_pdf, parse_ocr_pdf, iter_parse_union_pdf, iter_parse_ocr_pdf
 
 
 class UNIPipe(AbsPipe):
 
-    def __init__(self, pdf_bytes: bytes, model_list: list, image_writer: AbsReaderWriter, is_debug: bool = False):
-        super().__init__(pdf_bytes, model_list, image_writer, is_debug)
+    def __init__(self, pdf_bytes: bytes, model_list: list, image_writer: AbsReaderWriter, is_debug: bool = False,
+                 recorder: PerfRecorder = None, classify_cache: ClassifyCache = None):
+        super().__init__(pdf_bytes, model_list, image_writer, is_debug, recorder, classify_cache)
 
     def pipe_classify(self):
-        self.pdf_type = UNIPipe.classify(self.pdf_bytes)
+        with self.recorder.stage("classify"):
+            self.pdf_type = UNIPipe.classify(self.pdf_bytes, self.doc_context, self.recorder,
+                                            self.classify_cache)
 
     def pipe_parse(self):
+        with self.recorder.stage("parse"):
+            if self.pdf_type == self.PIP_TXT:
+                self.pdf_mid_data = parse_union_pdf(self.pdf_bytes, self.model_list, self.image_writer,
+                                                    is_debug=self.is_debug, doc_context=self.doc_context,
+                                                    recorder=self.recorder)
+            elif self.pdf_type == self.PIP_OCR:
+                self.pdf_mid_data = parse_ocr_pdf(self.pdf_bytes, self.model_list, self.image_writer,
+                                                  is_debug=self.is_debug, doc_context=self.doc_context,
+                                                  recorder=self.recorder)
+
+    def pipe_iter_pages(self):
         if self.pdf_type == self.PIP_TXT:
-            self.pdf_mid_data = parse_union_pdf(self.pdf_bytes, self.model_list, self.image_writer,
-                                                is_debug=self.is_debug)
+            yield from iter_parse_union_pdf(self.pdf_bytes, self.model_list, self.image_writer,
+                                            is_debug=self.is_debug, doc_context=self.doc_context,
+                                            recorder=self.recorder)
         elif self.pdf_type == self.PIP_OCR:
-            self.pdf_mid_data = parse_ocr_pdf(self.pdf_bytes, self.model_list, self.image_writer,
-                                              is_debug=self.is_debug)
+            yield from iter_parse_ocr_pdf(self.pdf_bytes, self.model_list, self.image_writer,
+                                          is_debug=self.is_debug, doc_context=self.doc_context,
+                                          recorder=self.recorder)
+
+    def pipe_iter_markdown(self, img_parent_path: str):
+        yield from AbsPipe.iter_markdown(self.pipe_iter_pages(), img_parent_path)
 
     def pipe_mk_uni_format(self, img_parent_path: str):
-        content_list = AbsPipe.mk_uni_format(self.get_compress_pdf_mid_data(), img_parent_path)
+        content_list = AbsPipe.mk_uni_format_by_mid_data(self.pdf_mid_data, img_parent_path, self.recorder)
         return content_list
 
     def pipe_mk_markdown(self, img_parent_path: str):
-        markdown_content = AbsPipe.mk_markdown(self.get_compress_pdf_mid_data(), img_parent_path)
+        markdown_content = AbsPipe.mk_markdown_by_mid_data(self.pdf_mid_data, img_parent_path, self.recorder)
         return markdown_content
 
 
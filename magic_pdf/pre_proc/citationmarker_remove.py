@@ -3,10 +3,52 @@
 https://aicarrier.feishu.cn/wiki/YLOPwo1PGiwFRdkwmyhcZmr0n3d
 """
 import re
+import threading
+from collections import OrderedDict
+
 from magic_pdf.libs.nlp_utils import NLPModels
 
 
-__NLP_MODEL = NLPModels()
+__NLP_MODEL = NLPModels() # spacy模型在第一次做实体识别时才加载
+
+ENTITY_CATGRS = ["PERSON", "GPE", "ORG"]
+ABBR_NAME_PATTERN = r'\b[A-Z]\.\s[A-Z][a-z]*\b' # 形如A. Bcde, L. Bcde, 人名的缩写
+
+'''
+span文本 -> 实体类别的LRU缓存，参考文献多的论文里同样的作者名、机构名会在很多页反复出现
+'''
+ENTITY_CACHE_SIZE = 65536
+__entity_cache = OrderedDict()
+__entity_cache_lock = threading.Lock()
+
+
+def detect_entity_catgr_with_cache(texts):
+    """
+    批量做实体识别，结果和逐条调用detect_entity_catgr_using_nlp相同
+    命中缓存的直接返回，剩下的文本去重后用一次nlp.pipe批量识别
+    """
+    results = [None] * len(texts)
+    missing_texts = OrderedDict() # 文本 -> 在texts中的下标
+    with __entity_cache_lock:
+        for i, text in enumerate(texts):
+            if text in __entity_cache:
+                __entity_cache.move_to_end(text)
+                results[i] = __entity_cache[text]
+            else:
+                missing_texts.setdefault(text, []).append(i)
+    if len(missing_texts) == 0:
+        return results
+
+    entities = __NLP_MODEL.detect_entity_catgr_using_nlp_batch(list(missing_texts))
+    with __entity_cache_lock:
+        for (text, indices), entity in zip(missing_texts.items(), entities):
+            for i in indices:
+                results[i] = entity
+            __entity_cache[text] = entity
+        while len(__entity_cache) > ENTITY_CACHE_SIZE:
+            __entity_cache.popitem(last=False)
+    return results
+
 
 def check_1(spans, cur_span_i):
     """寻找前一个char,如果是句号，逗号，那么就是角标"""
@@ -16,41 +58,30 @@ def check_1(spans, cur_span_i):
     pre_char = pre_span['chars'][-1]['c']
     if pre_char in ['。', '，', '.', ',']:
         return True
-    
+
     return False
 
 
-def check_2(spans, cur_span_i):
-    """检查前面一个span的最后一个单词，如果长度大于5，全都是字母，并且不含大写，就是角标"""
-    pattern = r'\b[A-Z]\.\s[A-Z][a-z]*\b' # 形如A. Bcde, L. Bcde, 人名的缩写
-    
+def check_2_without_nlp(spans, cur_span_i):
+    """
+    check_2里不需要实体识别的部分
+    返回(是否已经判定为角标, 还需要做实体识别的文本)，这段文本是人名、地名、机构名时也是角标
+    已经判定为角标、或者不需要实体识别时，文本为None
+    """
     if cur_span_i==0 and len(spans)>1:
         next_span = spans[cur_span_i+1]
         next_txt = "".join([c['c'] for c in next_span['chars']])
-        result = __NLP_MODEL.detect_entity_catgr_using_nlp(next_txt)
-        if result in ["PERSON", "GPE", "ORG"]:
-            return True
+        if re.findall(ABBR_NAME_PATTERN, next_txt):
+            return True, None
 
-        if re.findall(pattern, next_txt):
-            return True
-        
-        return False # 不是角标
+        return False, next_txt # 不是角标
     elif cur_span_i==0 and len(spans)==1: # 角标占用了整行？谨慎删除
-        return False
-    
+        return False, None
+
     # 如果这个span是最后一个span,
     if cur_span_i==len(spans)-1:
         pre_span = spans[cur_span_i-1]
-        pre_txt = "".join([c['c'] for c in pre_span['chars']])
-        pre_word = pre_txt.split(' ')[-1]
-        result = __NLP_MODEL.detect_entity_catgr_using_nlp(pre_txt)
-        if result in ["PERSON", "GPE", "ORG"]:
-            return True
-        
-        if re.findall(pattern, pre_txt):
-            return True
-        
-        return len(pre_word) > 5 and pre_word.isalpha() and pre_word.islower()
+        txt = "".join([c['c'] for c in pre_span['chars']])
     else: # 既不是第一个span，也不是最后一个span，那么此时检查一下这个角标距离前后哪个单词更近就属于谁的角标
         pre_span = spans[cur_span_i-1]
         next_span = spans[cur_span_i+1]
@@ -66,27 +97,35 @@ def check_2(spans, cur_span_i):
             if c['c'].isalpha():
                 next_distance = c['bbox'][0] - cur_span['bbox'][2]
                 break
-        
+
         if pre_distance<next_distance:
             belong_to_span = pre_span
         else:
             belong_to_span = next_span
-            
+
         txt = "".join([c['c'] for c in belong_to_span['chars']])
-        pre_word = txt.split(' ')[-1]
-        result = __NLP_MODEL.detect_entity_catgr_using_nlp(txt)
-        if result in ["PERSON", "GPE", "ORG"]:
-            return True
-        
-        if re.findall(pattern, txt):
-            return True
-    
-        return len(pre_word) > 5 and pre_word.isalpha() and pre_word.islower()
+
+    pre_word = txt.split(' ')[-1]
+    if re.findall(ABBR_NAME_PATTERN, txt):
+        return True, None
+
+    if len(pre_word) > 5 and pre_word.isalpha() and pre_word.islower():
+        return True, None
+
+    return False, txt
+
+
+def check_2(spans, cur_span_i):
+    """检查前面一个span的最后一个单词，如果长度大于5，全都是字母，并且不含大写，就是角标"""
+    is_marker, nlp_txt = check_2_without_nlp(spans, cur_span_i)
+    if is_marker or nlp_txt is None:
+        return is_marker
+    return detect_entity_catgr_with_cache([nlp_txt])[0] in ENTITY_CATGRS
 
 
 def check_3(spans, cur_span_i):
     """上标里有[], 有*， 有-， 有逗号"""
-    # 如[2-3],[22]  
+    # 如[2-3],[22]
     # 如 2,3,4
     cur_span_txt = ''.join(c['c'] for c in spans[cur_span_i]['chars']).strip()
     bad_char = ['[', ']', '*', ',']
@@ -96,7 +135,7 @@ def check_3(spans, cur_span_i):
 
     # 如2-3, a-b
     patterns = [r'\d+-\d+', r'[a-zA-Z]-[a-zA-Z]', r'[a-zA-Z],[a-zA-Z]']
-    for pattern in patterns:  
+    for pattern in patterns:
         match = re.match(pattern, cur_span_txt)
         if match is not None:
             return True
@@ -105,6 +144,12 @@ def check_3(spans, cur_span_i):
 
 
 def remove_citation_marker(with_char_text_blcoks):
+    """
+    分两遍处理：第一遍只用不需要NLP的规则判断，还要靠实体识别判断的候选角标先记下文本；
+    第二遍把整页的候选文本一次批量做实体识别(带缓存)，再统一删除角标
+    """
+    line_candidates = [] # [(line, [(候选角标span, 还需要做实体识别的文本或None)])]
+    nlp_txts = []
     for blk in with_char_text_blcoks:
         for line in blk['lines']:
             # 如果span里的个数少于2个，那只能忽略，角标不可能自己独占一行
@@ -115,7 +160,7 @@ def remove_citation_marker(with_char_text_blcoks):
             max_hi_span = line['spans'][0]['bbox']
             min_font_sz = 10000 # line里最小的字体
             max_font_sz = 0   # line里最大的字体
-                
+
             for s in line['spans']:
                 if max_hi_span[3]-max_hi_span[1]<s['bbox'][3]-s['bbox'][1]:
                     max_hi_span = s['bbox']
@@ -123,19 +168,19 @@ def remove_citation_marker(with_char_text_blcoks):
                     min_font_sz = s['size']
                 if max_font_sz<s['size']:
                     max_font_sz = s['size']
-                        
+
             base_span_mid_y = (max_hi_span[3]+max_hi_span[1])/2
-            
-            
-            span_to_del = []
+
+
+            candidates = []
             for i, span in enumerate(line['spans']):
                 span_hi = span['bbox'][3]-span['bbox'][1]
                 span_mid_y = (span['bbox'][3]+span['bbox'][1])/2
                 span_font_sz = span['size']
-                
+
                 if max_font_sz-span_font_sz<1: # 先以字体过滤正文，如果是正文就不再继续判断了
                     continue
-                
+
                 if (base_span_mid_y-span_mid_y)/span_hi>0.2 or (base_span_mid_y-span_mid_y>0 and abs(span_font_sz-min_font_sz)/min_font_sz<0.1):
                     """
                     1. 它的前一个char如果是句号或者逗号的话，那么肯定是角标而不是公式
@@ -143,12 +188,26 @@ def remove_citation_marker(with_char_text_blcoks):
                     3. 上标里有数字和逗号或者数字+星号的组合，方括号，一般肯定就是角标了
                     4. 这个角标属于前文还是后文要根据距离来判断，如果距离前面的文本太近，那么就是前面的角标，否则就是后面的角标
                     """
-                    if check_1(line['spans'], i) or check_2(line['spans'], i) or check_3(line['spans'], i):
-                        """删除掉这个角标：删除这个span, 同时还要更新line的text"""
-                        span_to_del.append(span)
-            if len(span_to_del)>0:
-                for span in span_to_del:
-                    line['spans'].remove(span)
-                line['text'] = ''.join([c['c'] for s in line['spans'] for c in s['chars']])
-    
+                    if check_1(line['spans'], i) or check_3(line['spans'], i):
+                        candidates.append((span, None))
+                        continue
+                    is_marker, nlp_txt = check_2_without_nlp(line['spans'], i)
+                    if is_marker:
+                        candidates.append((span, None))
+                    elif nlp_txt is not None:
+                        candidates.append((span, nlp_txt))
+                        nlp_txts.append(nlp_txt)
+            if len(candidates)>0:
+                line_candidates.append((line, candidates))
+
+    '''整页的候选文本一次做完实体识别'''
+    entities = dict(zip(nlp_txts, detect_entity_catgr_with_cache(nlp_txts)))
+    for line, candidates in line_candidates:
+        span_to_del = [span for span, nlp_txt in candidates if nlp_txt is None or entities[nlp_txt] in ENTITY_CATGRS]
+        if len(span_to_del)>0:
+            """删除掉这个角标：删除这个span, 同时还要更新line的text"""
+            for span in span_to_del:
+                line['spans'].remove(span)
+            line['text'] = ''.join([c['c'] for s in line['spans'] for c in s['chars']])
+
     return with_char_text_blcoks
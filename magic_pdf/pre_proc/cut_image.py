@@ -3,9 +3,10 @@ from loguru import logger
 from magic_pdf.libs.commons import join_path
 from magic_pdf.libs.ocr_content_type import ContentType
 from magic_pdf.libs.pdf_image_tools import cut_image
+from magic_pdf.libs.perf_recorder import NULL_PERF_RECORDER
 
 
-def ocr_cut_image_and_table(spans, page, page_id, pdf_bytes_md5, imageWriter):
+def ocr_cut_image_and_table(spans, page, page_id, pdf_bytes_md5, imageWriter, recorder=NULL_PERF_RECORDER):
     def return_path(type):
         return join_path(pdf_bytes_md5, type)
 
@@ -15,12 +16,12 @@ def ocr_cut_image_and_table(spans, page, page_id, pdf_bytes_md5, imageWriter):
             if not check_img_bbox(span['bbox']):
                 continue
             span['image_path'] = cut_image(span['bbox'], page_id, page, return_path=return_path('images'),
-                                           imageWriter=imageWriter)
+                                           imageWriter=imageWriter, recorder=recorder)
         elif span_type == ContentType.Table:
             if not check_img_bbox(span['bbox']):
                 continue
             span['image_path'] = cut_image(span['bbox'], page_id, page, return_path=return_path('tables'),
-                                           imageWriter=imageWriter)
+                                           imageWriter=imageWriter, recorder=recorder)
 
     return spans
 
@@ -2,6 +2,8 @@
 对pymupdf返回的结构里的公式进行替换，替换为模型识别的公式结果
 """
 
+from bisect import bisect_left, bisect_right
+
 from magic_pdf.libs.commons import fitz
 import json
 import os
@@ -119,12 +121,31 @@ def remove_text_block_overlap_interline_equation_bbox(
         for line in text_block["lines"]:
             deleted_span = []
             for span in line["spans"]:
+                if len(span["chars"]) == 0:  # 删除这个span
+                    deleted_span.append(span)
+                    continue
+                # 先用span里所有char的范围筛出可能重叠的行间公式，大部分span和哪个行间公式都不重叠，不用逐个char比较
+                chars_bbox = (
+                    min([b["bbox"][0] for b in span["chars"]]),
+                    min([b["bbox"][1] for b in span["chars"]]),
+                    max([b["bbox"][2] for b in span["chars"]]),
+                    max([b["bbox"][3] for b in span["chars"]]),
+                )
+                overlap_eq_bboxes = [
+                    eq_bbox["bbox"]
+                    for eq_bbox in interline_eq_bboxes
+                    if _is_in_or_part_overlap(chars_bbox, eq_bbox["bbox"])
+                ]
+                if len(overlap_eq_bboxes) == 0:
+                    span["bbox"] = chars_bbox
+                    continue
+
                 deleted_chars = []
                 for char in span["chars"]:
                     if any(
                         [
-                            _is_in_or_part_overlap(char["bbox"], eq_bbox["bbox"])
-                            for eq_bbox in interline_eq_bboxes
+                            _is_in_or_part_overlap(char["bbox"], eq_bbox)
+                            for eq_bbox in overlap_eq_bboxes
                         ]
                     ):
                         deleted_chars.append(char)
@@ -248,36 +269,81 @@ def __y_overlap_ratio(box1, box2):
     return overlap_ratio
 
 
-def replace_line_v2(eqinfo, line):
+class SpanCharIndex:
+    """
+    一个span里的char按x0排好序的索引，用二分查找取出和公式框在x方向重叠的char，不用逐个char比较
+    """
+
+    def __init__(self, chars):
+        self.chars = chars
+        self.char_cnt = len(chars)
+        bboxes = [char["bbox"] for char in chars]
+        # 坐标里有nan时排序和二分查找都不可靠，退回到逐个char比较
+        self.has_nan = any([bbox[0] != bbox[0] or bbox[2] != bbox[2] for bbox in bboxes])
+        if self.has_nan or self.char_cnt == 0:
+            return
+        self.sorted_char_idx = sorted(range(self.char_cnt), key=lambda i: bboxes[i][0])
+        self.x0s = [bboxes[i][0] for i in self.sorted_char_idx]
+        self.x1s = [bboxes[i][2] for i in self.sorted_char_idx]
+        self.min_x0 = self.x0s[0]
+        self.max_x1 = max(self.x1s)
+        self.max_width = max(max([bbox[2] - bbox[0] for bbox in bboxes]), 0)
+
+    def find_x_overlap_chars(self, x0, x1):
+        """
+        返回和[x0, x1]在x方向重叠的char，顺序与chars中相同，结果与逐个char用__is_x_dir_overlap判断相同
+        """
+        if self.char_cnt == 0:
+            return []
+        if self.has_nan or x0 != x0 or x1 != x1:
+            return [char for char in self.chars if not (x1 < char["bbox"][0] or x0 > char["bbox"][2])]
+        if self.max_x1 < x0 or self.min_x0 > x1:
+            return []
+        # 和[x0, x1]重叠的char满足 char.x0 <= x1 且 char.x1 >= x0，后者意味着 char.x0 >= x0 - max_width，多留1的余量防止浮点误差
+        lo = bisect_left(self.x0s, x0 - self.max_width - 1)
+        hi = bisect_right(self.x0s, x1)
+        overlap_char_idx = [self.sorted_char_idx[k] for k in range(lo, hi) if self.x1s[k] >= x0]
+        overlap_char_idx.sort()
+        return [self.chars[i] for i in overlap_char_idx]
+
+
+def get_span_char_index(span, char_indexes: dict) -> SpanCharIndex:
+    """
+    char_indexes是一页内共用的缓存，以span的chars这个list为key
+    公式替换修改span时总是给chars赋一个新的list，不会原地修改，所以没有被修改过的span的索引可以一直复用
+    """
+    chars = span["chars"]
+    char_index = char_indexes.get(id(chars))
+    if char_index is None or char_index.chars is not chars or char_index.char_cnt != len(chars):
+        char_index = SpanCharIndex(chars)
+        char_indexes[id(chars)] = char_index  # 索引持有chars的引用，id不会被别的list复用
+    return char_index
+
+
+def replace_line_v2(eqinfo, line, char_indexes: dict = None):
     """
     扫描这一行所有的和公式框X方向重叠的char,然后计算char的左、右x0, x1,位于这个区间内的span删除掉。
     最后与这个x0,x1有相交的span0, span1内部进行分割。
+    char_indexes: 一页内共用的SpanCharIndex缓存，每个span用二分查找取出重叠的char
     """
+    if char_indexes is None:
+        char_indexes = {}
     first_overlap_span = -1
     first_overlap_span_idx = -1
     last_overlap_span = -1
     delete_chars = []
+    eq_x0, eq_x1 = eqinfo["bbox"][0], eqinfo["bbox"][2]
     for i in range(0, len(line["spans"])):
         if line["spans"][i].get("_type", None) is not None:
             continue  # 忽略，因为已经是插入的伪造span公式了
 
-        for char in line["spans"][i]["chars"]:
-            if __is_x_dir_overlap(eqinfo["bbox"], char["bbox"]):
-                line_txt = ""
-                for span in line["spans"]:
-                    span_txt = "<span>"
-                    for ch in span["chars"]:
-                        span_txt = span_txt + ch["c"]
-
-                    span_txt = span_txt + "</span>"
-
-                    line_txt = line_txt + span_txt
-
-                if first_overlap_span_idx == -1:
-                    first_overlap_span = line["spans"][i]
-                    first_overlap_span_idx = i
-                last_overlap_span = line["spans"][i]
-                delete_chars.append(char)
+        overlap_chars = get_span_char_index(line["spans"][i], char_indexes).find_x_overlap_chars(eq_x0, eq_x1)
+        if len(overlap_chars) > 0:
+            if first_overlap_span_idx == -1:
+                first_overlap_span = line["spans"][i]
+                first_overlap_span_idx = i
+            last_overlap_span = line["spans"][i]
+            delete_chars.extend(overlap_chars)
 
     # 第一个和最后一个char要进行检查，到底属于公式多还是属于正常span多
     if len(delete_chars) > 0:
@@ -333,8 +399,6 @@ def replace_line_v2(eqinfo, line):
     equation_span["_eq_bbox"] = eqinfo["bbox"]
     line["spans"].insert(first_overlap_span_idx + 1, equation_span)  # 放入公式
 
-    # logger.info(f"==>text is 【{line_txt}】, equation is 【{eqinfo['latex_text']}】")
-
     # 第一个、和最后一个有overlap的span进行分割,然后插入对应的位置
     first_span_chars = [
         char
@@ -396,30 +460,21 @@ def replace_line_v2(eqinfo, line):
         ):
             line["spans"].remove(last_overlap_span)
 
-    remain_txt = ""
-    for span in line["spans"]:
-        span_txt = "<span>"
-        for char in span["chars"]:
-            span_txt = span_txt + char["c"]
-
-        span_txt = span_txt + "</span>"
-
-        remain_txt = remain_txt + span_txt
-
-    # logger.info(f"<== succ replace, text is 【{remain_txt}】, equation is 【{eqinfo['latex_text']}】")
-
     return True
 
 
-def replace_eq_blk(eqinfo, text_block):
+def replace_eq_blk(eqinfo, text_block, char_indexes: dict = None):
     """替换行内公式"""
     for line in text_block["lines"]:
         line_bbox = line["bbox"]
+        # 下面两个条件都要求公式和行在y方向有重叠，先排除y方向不相交的行
+        if eqinfo["bbox"][3] < line_bbox[1] or line_bbox[3] < eqinfo["bbox"][1]:
+            continue
         if (
             _is_xin(eqinfo["bbox"], line_bbox)
             or __y_overlap_ratio(eqinfo["bbox"], line_bbox) > 0.6
         ):  # 定位到行, 使用y方向重合率是因为有的时候，一个行的宽度会小于公式位置宽度：行很高，公式很窄，
-            replace_succ = replace_line_v2(eqinfo, line)
+            replace_succ = replace_line_v2(eqinfo, line, char_indexes)
             if (
                 not replace_succ
             ):  # 有的时候，一个pdf的line高度从API里会计算的有问题，因此在行内span级别会替换不成功，这就需要继续重试下一行
@@ -433,11 +488,15 @@ def replace_eq_blk(eqinfo, text_block):
 
 def replace_inline_equations(inline_equation_bboxes, raw_text_blocks):
     """替换行内公式"""
+    char_indexes = {}  # 整页共用的SpanCharIndex缓存
     for eqinfo in inline_equation_bboxes:
         eqbox = eqinfo["bbox"]
         for blk in raw_text_blocks:
+            # _is_xin要求两个框有重叠，先排除完全不相交的block
+            if not _is_in_or_part_overlap(eqbox, blk["bbox"]):
+                continue
             if _is_xin(eqbox, blk["bbox"]):
-                if not replace_eq_blk(eqinfo, blk):
+                if not replace_eq_blk(eqinfo, blk, char_indexes):
                     logger.error(f"行内公式没有替换成功：{eqinfo} ")
                 else:
                     break
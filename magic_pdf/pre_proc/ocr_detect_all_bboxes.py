@@ -1,5 +1,5 @@
-from magic_pdf.libs.boxbase import get_minbox_if_overlap_by_ratio, calculate_overlap_area_in_bbox1_area_ratio, \
-    calculate_iou
+from magic_pdf.libs.boxbase import calculate_iou_batch, calculate_overlap_area_in_bbox1_area_ratio_batch, \
+    get_minbox_if_overlap_by_ratio_batch, MINBOX_NONE, MINBOX_BBOX1
 from magic_pdf.libs.drop_tag import DropTag
 from magic_pdf.libs.ocr_content_type import BlockType
 
@@ -55,11 +55,11 @@ def fix_text_overlap_title_blocks(all_bboxes):
         if block[7] == BlockType.Title:
             title_blocks.append(block)
 
-    for text_block in text_blocks:
-        for title_block in title_blocks:
-            text_block_bbox = text_block[:4]
-            title_block_bbox = title_block[:4]
-            if calculate_iou(text_block_bbox, title_block_bbox) > 0.8:
+    # 一次算出所有text和title两两之间的iou
+    iou_matrix = calculate_iou_batch(text_blocks, title_blocks)
+    for i, text_block in enumerate(text_blocks):
+        for j, title_block in enumerate(title_blocks):
+            if iou_matrix[i, j] > 0.8:
                 all_bboxes.remove(title_block)
 
     return all_bboxes
@@ -67,13 +67,12 @@ def fix_text_overlap_title_blocks(all_bboxes):
 
 def remove_need_drop_blocks(all_bboxes, discarded_blocks):
     need_remove = []
-    for block in all_bboxes:
-        for discarded_block in discarded_blocks:
-            block_bbox = block[:4]
-            if calculate_overlap_area_in_bbox1_area_ratio(block_bbox, discarded_block['bbox']) > 0.6:
-                if block not in need_remove:
-                    need_remove.append(block)
-                    break
+    overlap_ratio_matrix = calculate_overlap_area_in_bbox1_area_ratio_batch(
+        all_bboxes, [discarded_block['bbox'] for discarded_block in discarded_blocks])
+    for block, overlap_ratios in zip(all_bboxes, overlap_ratio_matrix):
+        if (overlap_ratios > 0.6).any():
+            if block not in need_remove:
+                need_remove.append(block)
 
     if len(need_remove) > 0:
         for block in need_remove:
@@ -84,19 +83,22 @@ def remove_need_drop_blocks(all_bboxes, discarded_blocks):
 def remove_overlaps_min_blocks(all_bboxes):
     #  删除重叠blocks中较小的那些
     need_remove = []
-    for block1 in all_bboxes:
-        for block2 in all_bboxes:
-            if block1 != block2:
-                block1_bbox = block1[:4]
-                block2_bbox = block2[:4]
-                overlap_box = get_minbox_if_overlap_by_ratio(block1_bbox, block2_bbox, 0.8)
-                if overlap_box is not None:
-                    bbox_to_remove = next((block for block in all_bboxes if block[:4] == overlap_box), None)
-                    if bbox_to_remove is not None and bbox_to_remove not in need_remove:
-                        need_remove.append(bbox_to_remove)
+    need_remove_ids = set()
+    '''bbox对应的第一个block，重叠时删除的是这个block'''
+    first_block_id_of_bbox = {}
+    for i, block in enumerate(all_bboxes):
+        first_block_id_of_bbox.setdefault(tuple(block[:4]), i)
+    minbox_matrix = get_minbox_if_overlap_by_ratio_batch(all_bboxes, all_bboxes, 0.8)
+    for i, j in zip(*(minbox_matrix != MINBOX_NONE).nonzero()):
+        block1, block2 = all_bboxes[i], all_bboxes[j]
+        if block1 != block2:
+            overlap_box = block1[:4] if minbox_matrix[i, j] == MINBOX_BBOX1 else block2[:4]
+            bbox_to_remove_id = first_block_id_of_bbox[tuple(overlap_box)]
+            if bbox_to_remove_id not in need_remove_ids:
+                need_remove_ids.add(bbox_to_remove_id)
+                need_remove.append(all_bboxes[bbox_to_remove_id])
 
     if len(need_remove) > 0:
-        for block in need_remove:
-            all_bboxes.remove(block)
+        all_bboxes[:] = [block for i, block in enumerate(all_bboxes) if i not in need_remove_ids]
 
     return all_bboxes
@@ -1,5 +1,6 @@
 from loguru import logger
 
+from magic_pdf.libs.bbox_index import BboxIndex
 from magic_pdf.libs.boxbase import __is_overlaps_y_exceeds_threshold, get_minbox_if_overlap_by_ratio, \
     calculate_overlap_area_in_bbox1_area_ratio
 from magic_pdf.libs.drop_tag import DropTag
@@ -146,6 +147,9 @@ def fill_spans_in_blocks(blocks, spans):
     将allspans中的span按位置关系，放入blocks中
     '''
     block_with_spans = []
+    '''只有还没放入block、且和block在空间索引中相交的span才需要计算重叠比例'''
+    span_index = BboxIndex([span['bbox'] for span in spans])
+    span_used = [False] * len(spans)
     for block in blocks:
         block_type = block[7]
         block_bbox = block[0:4]
@@ -154,10 +158,13 @@ def fill_spans_in_blocks(blocks, spans):
             'bbox': block_bbox,
         }
         block_spans = []
-        for span in spans:
-            span_bbox = span['bbox']
+        for i in span_index.query_overlap(block_bbox):
+            if span_used[i]:
+                continue
+            span_bbox = spans[i]['bbox']
             if calculate_overlap_area_in_bbox1_area_ratio(span_bbox, block_bbox) > 0.7:
-                block_spans.append(span)
+                span_used[i] = True
+                block_spans.append(spans[i])
 
         '''行内公式调整, 高度调整至与同行文字高度一致(优先左侧, 其次右侧)'''
         displayed_list = []
@@ -173,10 +180,8 @@ def fill_spans_in_blocks(blocks, spans):
         block_dict['spans'] = block_spans
         block_with_spans.append(block_dict)
 
-        # 从spans删除已经放入block_spans中的span
-        if len(block_spans) > 0:
-            for span in block_spans:
-                spans.remove(span)
+    # 从spans删除已经放入block_spans中的span
+    spans[:] = [span for i, span in enumerate(spans) if not span_used[i]]
 
     return block_with_spans
 
@@ -1,6 +1,7 @@
 from loguru import logger
 
-from magic_pdf.libs.boxbase import calculate_overlap_area_in_bbox1_area_ratio, get_minbox_if_overlap_by_ratio, \
+from magic_pdf.libs.bbox_index import BboxIndex
+from magic_pdf.libs.boxbase import calculate_overlap_area_in_bbox1_area_ratio_batch, get_minbox_if_overlap_by_ratio, \
     __is_overlaps_y_exceeds_threshold
 from magic_pdf.libs.drop_tag import DropTag
 from magic_pdf.libs.ocr_content_type import ContentType, BlockType
@@ -8,19 +9,27 @@ from magic_pdf.libs.ocr_content_type import ContentType, BlockType
 
 def remove_overlaps_min_spans(spans):
     dropped_spans = []
-    #  删除重叠spans中较小的那些
-    for span1 in spans:
-        for span2 in spans:
+    dropped_ids = set()
+    '''bbox对应的第一个span，重叠时删除的是这个span'''
+    first_span_id_of_bbox = {}
+    for i, span in enumerate(spans):
+        first_span_id_of_bbox.setdefault(tuple(span['bbox']), i)
+    #  删除重叠spans中较小的那些，只和空间索引给出的候选span比较
+    span_index = BboxIndex([span['bbox'] for span in spans])
+    for i, span1 in enumerate(spans):
+        for j in span_index.query_overlap(span1['bbox']):
+            span2 = spans[j]
             if span1 != span2:
                 overlap_box = get_minbox_if_overlap_by_ratio(span1['bbox'], span2['bbox'], 0.65)
                 if overlap_box is not None:
-                    span_need_remove = next((span for span in spans if span['bbox'] == overlap_box), None)
-                    if span_need_remove is not None and span_need_remove not in dropped_spans:
-                        dropped_spans.append(span_need_remove)
+                    span_need_remove_id = first_span_id_of_bbox[tuple(overlap_box)]
+                    if span_need_remove_id not in dropped_ids:
+                        dropped_ids.add(span_need_remove_id)
+                        dropped_spans.append(spans[span_need_remove_id])
 
     if len(dropped_spans) > 0:
+        spans[:] = [span for i, span in enumerate(spans) if i not in dropped_ids]
         for span_need_remove in dropped_spans:
-            spans.remove(span_need_remove)
             span_need_remove['tag'] = DropTag.SPAN_OVERLAP
 
     return spans, dropped_spans
@@ -30,12 +39,12 @@ def remove_spans_by_bboxes(spans, need_remove_spans_bboxes):
     # 遍历spans, 判断是否在removed_span_block_bboxes中
     # 如果是, 则删除该span 否则, 保留该span
     need_remove_spans = []
-    for span in spans:
-        for removed_bbox in need_remove_spans_bboxes:
-            if calculate_overlap_area_in_bbox1_area_ratio(span['bbox'], removed_bbox) > 0.5:
-                if span not in need_remove_spans:
-                    need_remove_spans.append(span)
-                    break
+    overlap_ratio_matrix = calculate_overlap_area_in_bbox1_area_ratio_batch(
+        [span['bbox'] for span in spans], need_remove_spans_bboxes)
+    for span, overlap_ratios in zip(spans, overlap_ratio_matrix):
+        if (overlap_ratios > 0.5).any():
+            if span not in need_remove_spans:
+                need_remove_spans.append(span)
 
     if len(need_remove_spans) > 0:
         for span in need_remove_spans:
@@ -49,17 +58,18 @@ def remove_spans_by_bboxes_dict(spans, need_remove_spans_bboxes_dict):
     for drop_tag, removed_bboxes in need_remove_spans_bboxes_dict.items():
         # logger.info(f"remove spans by bbox dict, drop_tag: {drop_tag}, removed_bboxes: {removed_bboxes}")
         need_remove_spans = []
-        for span in spans:
+        overlap_ratio_matrix = calculate_overlap_area_in_bbox1_area_ratio_batch(
+            [span['bbox'] for span in spans], removed_bboxes)
+        for span, overlap_ratios in zip(spans, overlap_ratio_matrix):
             # 通过判断span的bbox是否在removed_bboxes中, 判断是否需要删除该span
-            for removed_bbox in removed_bboxes:
-                if calculate_overlap_area_in_bbox1_area_ratio(span['bbox'], removed_bbox) > 0.5:
-                    need_remove_spans.append(span)
-                    break
-                # 当drop_tag为DropTag.FOOTNOTE时, 判断span是否在removed_bboxes中任意一个的下方，如果是,则删除该span
-                elif drop_tag == DropTag.FOOTNOTE and (span['bbox'][1] + span['bbox'][3]) / 2 > removed_bbox[3] and \
-                        removed_bbox[0] < (span['bbox'][0] + span['bbox'][2]) / 2 < removed_bbox[2]:
-                    need_remove_spans.append(span)
-                    break
+            if (overlap_ratios > 0.5).any():
+                need_remove_spans.append(span)
+            # 当drop_tag为DropTag.FOOTNOTE时, 判断span是否在removed_bboxes中任意一个的下方，如果是,则删除该span
+            elif drop_tag == DropTag.FOOTNOTE and any(
+                    (span['bbox'][1] + span['bbox'][3]) / 2 > removed_bbox[3] and
+                    removed_bbox[0] < (span['bbox'][0] + span['bbox'][2]) / 2 < removed_bbox[2]
+                    for removed_bbox in removed_bboxes):
+                need_remove_spans.append(span)
 
         for span in need_remove_spans:
             spans.remove(span)
@@ -26,6 +26,24 @@ class AbsReaderWriter(ABC):
         """
         raise NotImplementedError
 
+    def exists(self, path: str) -> bool:
+        """
+        path是否已经存在，路径规则和read/write相同；没有实现检查的子类一律返回False，调用方会照常写入
+        """
+        return False
+
+    def flush(self):
+        """
+        等待所有已经提交的写入真正完成，写入失败时抛出异常；同步写入的子类不需要实现
+        """
+        pass
+
+    def close(self):
+        """
+        完成所有写入并释放资源，之后不应再使用；同步写入的子类不需要实现
+        """
+        self.flush()
+
     @abstractmethod
     def read_jsonl(self, path: str, byte_start=0, byte_end=None, encoding='utf-8'):
         """
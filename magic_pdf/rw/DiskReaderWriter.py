@@ -1,4 +1,5 @@
 import os
+import uuid
 from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
 from loguru import logger
 
@@ -31,22 +32,40 @@ class DiskReaderWriter(AbsReaderWriter):
             raise ValueError("Invalid mode. Use 'text' or 'binary'.")
 
     def write(self, content, path, mode=MODE_TXT):
+        """
+        先写到同一目录下的临时文件，写完再用os.replace换到目标路径
+        进程在写入途中被杀掉时目标路径上不会留下不完整的文件，exists只会看到写完的文件
+        """
         if os.path.isabs(path):
             abspath = path
         else:
             abspath = os.path.join(self.path, path)
         directory_path = os.path.dirname(abspath)
         if not os.path.exists(directory_path):
-            os.makedirs(directory_path)
+            os.makedirs(directory_path, exist_ok=True)
         if mode == MODE_TXT:
-            with open(abspath, "w", encoding=self.encoding) as f:
-                f.write(content)
-
+            open_kwargs = {"mode": "x", "encoding": self.encoding}
         elif mode == MODE_BIN:
-            with open(abspath, "wb") as f:
-                f.write(content)
+            open_kwargs = {"mode": "xb"}
         else:
             raise ValueError("Invalid mode. Use 'text' or 'binary'.")
+        # 临时文件名每次不同，多个线程、进程同时写同一个路径时互不影响
+        tmp_path = os.path.join(directory_path, f".{os.path.basename(abspath)}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, **open_kwargs) as f:
+                f.write(content)
+            os.replace(tmp_path, abspath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def exists(self, path):
+        if os.path.isabs(path):
+            abspath = path
+        else:
+            abspath = os.path.join(self.path, path)
+        return os.path.exists(abspath)
 
     def read_jsonl(self, path: str, byte_start=0, byte_end=None, encoding="utf-8"):
         return self.read(path)
@@ -1,39 +1,211 @@
 from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
 from magic_pdf.libs.commons import parse_aws_param, parse_bucket_key
-import boto3
 from loguru import logger
-from boto3.s3.transfer import TransferConfig
-from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
 
 MODE_TXT = "text"
 MODE_BIN = "binary"
 
+'''
+大对象的range读取：第一块读回来后根据Content-Range得到对象大小，剩下的部分按块并行读取
+'''
+RANGE_READ_CHUNK_SIZE = 8 * 1024 * 1024
+RANGE_READ_WORKERS = 8
+
+'''
+超过阈值的内容用分片上传，分片并行上传
+'''
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 16 * 1024 * 1024
+MULTIPART_WORKERS = 8
+
+'''
+异步上传时，每个上传线程最多对应多少个排队中的写入，队列满时write阻塞，限制内存中待上传的数据量
+'''
+UPLOAD_QUEUE_SIZE_PER_WORKER = 4
+
+'''
+client连接池的大小，要能容纳并行的range读取、分片上传和异步上传
+'''
+S3_MAX_POOL_CONNECTIONS = 32
+
+'''
+同一个进程里，相同(ak, sk, endpoint, addressing_style)的S3ReaderWriter共用一个client，boto3的client是线程安全的
+fork出来的子进程不能复用父进程的client(连接会被共享)，所以key里带上pid
+'''
+__s3_clients = {}
+__s3_clients_lock = threading.Lock()
+
+
+def get_s3_client(ak: str, sk: str, endpoint_url: str, addressing_style: str = 'auto'):
+    client_key = (os.getpid(), ak, sk, endpoint_url, addressing_style)
+    s3_client = __s3_clients.get(client_key)
+    if s3_client is not None:
+        return s3_client
+    with __s3_clients_lock:
+        s3_client = __s3_clients.get(client_key)
+        if s3_client is None:
+            # boto3导入很慢，只处理本地文件时不需要，到创建client时再导入
+            import boto3
+            from botocore.config import Config
+            s3_client = boto3.client(
+                service_name="s3",
+                aws_access_key_id=ak,
+                aws_secret_access_key=sk,
+                endpoint_url=endpoint_url,
+                config=Config(s3={"addressing_style": addressing_style},
+                              retries={'max_attempts': 5, 'mode': 'standard'},
+                              max_pool_connections=S3_MAX_POOL_CONNECTIONS),
+            )
+            __s3_clients[client_key] = s3_client
+    return s3_client
+
 
 class S3ReaderWriter(AbsReaderWriter):
-    def __init__(self, ak: str, sk: str, endpoint_url: str, addressing_style: str = 'auto', parent_path: str = ''):
+    def __init__(self, ak: str, sk: str, endpoint_url: str, addressing_style: str = 'auto', parent_path: str = '',
+                 upload_workers: int = 0):
+        """
+        upload_workers: 大于0时write在后台线程中上传，最多同时上传upload_workers个对象，
+                        调用flush()等待全部上传完成(上传出错时由flush抛出)，close()之后不能再写；
+                        为0时write同步上传
+        """
         self.client = self._get_client(ak, sk, endpoint_url, addressing_style)
         self.path = parent_path
+        self._client_args = (ak, sk, endpoint_url, addressing_style)
+        self.upload_workers = upload_workers
+        self._init_upload_queue()
+
+    def __getstate__(self):
+        # boto3 client 不能被pickle，传给子进程时只保留构造参数，到子进程里再重建client；上传队列也在子进程里重建
+        state = self.__dict__.copy()
+        for name in ("client", "_upload_executor", "_pending_uploads", "_upload_slots", "_upload_lock"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.client = self._get_client(*self._client_args)
+        self._init_upload_queue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
 
     def _get_client(self, ak: str, sk: str, endpoint_url: str, addressing_style: str):
-        s3_client = boto3.client(
-            service_name="s3",
-            aws_access_key_id=ak,
-            aws_secret_access_key=sk,
-            endpoint_url=endpoint_url,
-            config=Config(s3={"addressing_style": addressing_style},
-                          retries={'max_attempts': 5, 'mode': 'standard'}),
-        )
-        return s3_client
+        return get_s3_client(ak, sk, endpoint_url, addressing_style)
 
-    def read(self, s3_relative_path, mode=MODE_TXT, encoding="utf-8"):
+    def _init_upload_queue(self):
+        self._upload_executor = None
+        self._pending_uploads = {}  # s3_path -> 上传的future
+        self._upload_slots = threading.BoundedSemaphore(max(1, self.upload_workers * UPLOAD_QUEUE_SIZE_PER_WORKER))
+        self._upload_lock = threading.Lock()
+
+    def _get_s3_path(self, s3_relative_path):
         if s3_relative_path.startswith("s3://"):
-            s3_path = s3_relative_path
+            return s3_relative_path
+        return os.path.join(self.path, s3_relative_path)
+
+    def _get_object_bytes(self, bucket_name, key, byte_start=0, byte_end=None):
+        """
+        读取[byte_start, byte_end]范围内的内容，byte_end为None时读到结尾
+        先读第一块，小对象一次请求就读完；大对象根据Content-Range得到的大小把剩下的部分按块并行读取，
+        后面的块带上第一块的ETag，对象中途被改写时直接报错，不会拼出新旧混合的内容
+        """
+        first_end = byte_start + RANGE_READ_CHUNK_SIZE - 1
+        if byte_end is not None:
+            first_end = min(first_end, byte_end)
+        res = self.client.get_object(Bucket=bucket_name, Key=key, Range=f"bytes={byte_start}-{first_end}")
+        first_chunk = res["Body"].read()
+        content_range = res.get("ContentRange")
+        if not content_range or "/" not in content_range or content_range.endswith("/*"):
+            # 服务端不支持range时会返回整个对象
+            return first_chunk
+        total_size = int(content_range.rsplit("/", 1)[1])
+        end = total_size - 1 if byte_end is None else min(byte_end, total_size - 1)
+        if first_end >= end:
+            return first_chunk
+
+        chunk_ranges = [(chunk_start, min(chunk_start + RANGE_READ_CHUNK_SIZE - 1, end))
+                        for chunk_start in range(first_end + 1, end + 1, RANGE_READ_CHUNK_SIZE)]
+        extra_args = {"IfMatch": res["ETag"]} if res.get("ETag") else {}
+
+        def read_chunk(chunk_range):
+            chunk_res = self.client.get_object(Bucket=bucket_name, Key=key,
+                                               Range=f"bytes={chunk_range[0]}-{chunk_range[1]}", **extra_args)
+            return chunk_res["Body"].read()
+
+        with ThreadPoolExecutor(max_workers=min(RANGE_READ_WORKERS, len(chunk_ranges))) as executor:
+            chunks = list(executor.map(read_chunk, chunk_ranges))
+        return b"".join([first_chunk] + chunks)
+
+    def _put_object(self, bucket_name, key, body):
+        if len(body) >= MULTIPART_THRESHOLD:
+            self._multipart_upload(bucket_name, key, body)
         else:
-            s3_path = os.path.join(self.path, s3_relative_path)
+            self.client.put_object(Body=body, Bucket=bucket_name, Key=key)
+        logger.debug(f"内容已写入 s3://{bucket_name}/{key} ")
+
+    def _multipart_upload(self, bucket_name, key, body):
+        """
+        分片并行上传，任何一片失败都会放弃整个上传，不留下未完成的分片
+        """
+        upload_id = self.client.create_multipart_upload(Bucket=bucket_name, Key=key)["UploadId"]
+        try:
+            part_offsets = list(enumerate(range(0, len(body), MULTIPART_CHUNK_SIZE), start=1))
+
+            def upload_part(part_offset):
+                part_number, offset = part_offset
+                res = self.client.upload_part(Bucket=bucket_name, Key=key, UploadId=upload_id, PartNumber=part_number,
+                                              Body=body[offset:offset + MULTIPART_CHUNK_SIZE])
+                return {"ETag": res["ETag"], "PartNumber": part_number}
+
+            with ThreadPoolExecutor(max_workers=min(MULTIPART_WORKERS, len(part_offsets))) as executor:
+                parts = list(executor.map(upload_part, part_offsets))
+            self.client.complete_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id,
+                                                  MultipartUpload={"Parts": parts})
+        except Exception as e:
+            self.client.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+            raise e
+
+    def _wait_pending_upload(self, s3_path):
+        with self._upload_lock:
+            future = self._pending_uploads.get(s3_path)
+        if future is not None:
+            future.result()
+
+    def _submit_upload(self, s3_path, bucket_name, key, body):
+        # 同一路径还有没传完的上一次写入时，先等它完成，保证最后写入的内容生效
+        self._wait_pending_upload(s3_path)
+        self._upload_slots.acquire()
+        try:
+            with self._upload_lock:
+                if self._upload_executor is None:
+                    self._upload_executor = ThreadPoolExecutor(max_workers=self.upload_workers,
+                                                               thread_name_prefix="s3_upload")
+                future = self._upload_executor.submit(self._put_object, bucket_name, key, body)
+                self._pending_uploads[s3_path] = future
+        except Exception as e:
+            self._upload_slots.release()
+            raise e
+        future.add_done_callback(lambda _: self._upload_slots.release())
+
+    def read(self, s3_relative_path, mode=MODE_TXT, encoding="utf-8"):
+        s3_path = self._get_s3_path(s3_relative_path)
+        self._wait_pending_upload(s3_path)
         bucket_name, key = parse_bucket_key(s3_path)
-        res = self.client.get_object(Bucket=bucket_name, Key=key)
-        body = res["Body"].read()
+        from botocore.exceptions import ClientError
+        try:
+            body = self._get_object_bytes(bucket_name, key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "InvalidRange":
+                raise e
+            # 空对象不支持range读取
+            body = self.client.get_object(Bucket=bucket_name, Key=key)["Body"].read()
         if mode == MODE_TXT:
             data = body.decode(encoding)  # Decode bytes to text
         elif mode == MODE_BIN:
@@ -43,10 +215,7 @@ class S3ReaderWriter(AbsReaderWriter):
         return data
 
     def write(self, content, s3_relative_path, mode=MODE_TXT, encoding="utf-8"):
-        if s3_relative_path.startswith("s3://"):
-            s3_path = s3_relative_path
-        else:
-            s3_path = os.path.join(self.path, s3_relative_path)
+        s3_path = self._get_s3_path(s3_relative_path)
         if mode == MODE_TXT:
             body = content.encode(encoding)  # Encode text data as bytes
         elif mode == MODE_BIN:
@@ -54,19 +223,60 @@ class S3ReaderWriter(AbsReaderWriter):
         else:
             raise ValueError("Invalid mode. Use 'text' or 'binary'.")
         bucket_name, key = parse_bucket_key(s3_path)
-        self.client.put_object(Body=body, Bucket=bucket_name, Key=key)
-        logger.info(f"内容已写入 {s3_path} ")
+        if self.upload_workers > 0:
+            self._submit_upload(s3_path, bucket_name, key, body)
+        else:
+            self._put_object(bucket_name, key, body)
+
+    def flush(self):
+        """
+        等待所有已经提交的异步上传完成，有上传失败时抛出第一个错误
+        """
+        with self._upload_lock:
+            pending_uploads = self._pending_uploads
+            self._pending_uploads = {}
+        first_error = None
+        for s3_path, future in pending_uploads.items():
+            error = future.exception()
+            if error is not None:
+                logger.error(f"上传 {s3_path} 失败: {error}")
+                first_error = first_error or error
+        if first_error is not None:
+            raise first_error
+
+    def close(self):
+        """
+        等待异步上传完成并释放上传线程
+        """
+        try:
+            self.flush()
+        finally:
+            with self._upload_lock:
+                executor, self._upload_executor = self._upload_executor, None
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    def exists(self, s3_relative_path):
+        s3_path = self._get_s3_path(s3_relative_path)
+        with self._upload_lock:
+            if s3_path in self._pending_uploads:
+                return True
+        bucket_name, key = parse_bucket_key(s3_path)
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=bucket_name, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise e
+        return True
 
     def read_jsonl(self, path: str, byte_start=0, byte_end=None, mode=MODE_TXT, encoding='utf-8'):
-        if path.startswith("s3://"):
-            s3_path = path
-        else:
-            s3_path = os.path.join(self.path, path)
+        s3_path = self._get_s3_path(path)
+        self._wait_pending_upload(s3_path)
         bucket_name, key = parse_bucket_key(s3_path)
 
-        range_header = f'bytes={byte_start}-{byte_end}' if byte_end else f'bytes={byte_start}-'
-        res = self.client.get_object(Bucket=bucket_name, Key=key, Range=range_header)
-        body = res["Body"].read()
+        body = self._get_object_bytes(bucket_name, key, byte_start, byte_end if byte_end else None)
         if mode == MODE_TXT:
             data = body.decode(encoding)  # Decode bytes to text
         elif mode == MODE_BIN:
@@ -14,18 +14,22 @@
 """
 from loguru import logger
 
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
 from magic_pdf.rw import AbsReaderWriter
 from magic_pdf.pdf_parse_by_ocr_v2 import parse_pdf_by_ocr
 from magic_pdf.pdf_parse_by_txt_v2 import parse_pdf_by_txt
+from magic_pdf.pdf_parse_union_core import pdf_parse_union, pdf_parse_union_iter, PARSE_MODE_UNION, PARSE_MODE_OCR
 
 
 PARSE_TYPE_TXT = "txt"
 PARSE_TYPE_OCR = "ocr"
 
 def parse_txt_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWriter, is_debug=False, start_page=0, *args,
-                  **kwargs):
+                  workers=1, doc_context=None, recorder=None, **kwargs):
     """
     解析文本类pdf
+    doc_context: pdf_bytes的PdfDocContext，传入时复用已经打开的文档、md5和抽取过的文本
+    recorder: PerfRecorder，传入时记录解析各阶段的耗时和调用次数
     """
     pdf_info_dict = parse_pdf_by_txt(
         pdf_bytes,
@@ -33,6 +37,9 @@ def parse_txt_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWrit
         imageWriter,
         start_page_id=start_page,
         debug_mode=is_debug,
+        workers=workers,
+        doc_context=doc_context,
+        recorder=recorder,
     )
 
     pdf_info_dict["_parse_type"] = PARSE_TYPE_TXT
@@ -41,7 +48,7 @@ def parse_txt_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWrit
 
 
 def parse_ocr_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWriter, is_debug=False, start_page=0, *args,
-                  **kwargs):
+                  workers=1, doc_context=None, recorder=None, **kwargs):
     """
     解析ocr类pdf
     """
@@ -51,6 +58,9 @@ def parse_ocr_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWrit
         imageWriter,
         start_page_id=start_page,
         debug_mode=is_debug,
+        workers=workers,
+        doc_context=doc_context,
+        recorder=recorder,
     )
 
     pdf_info_dict["_parse_type"] = PARSE_TYPE_OCR
@@ -59,29 +69,37 @@ def parse_ocr_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWrit
 
 
 def parse_union_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWriter, is_debug=False, start_page=0,
-                    *args, **kwargs):
+                    *args, workers=1, doc_context=None, recorder=None, **kwargs):
     """
     ocr和文本混合的pdf，全部解析出来
+    按页选择txt或ocr的文本span，扫描页或txt抽取出错的页单独改用ocr，其余步骤不重做
+    整体解析仍然出错时再对整本文档用ocr方式重新解析，两次解析共用同一个doc_context，文档只打开一次
     """
+    if doc_context is None:
+        doc_context = PdfDocContext(pdf_bytes)
 
-    def parse_pdf(method):
+    def parse_pdf(parse_mode):
         try:
-            return method(
+            return pdf_parse_union(
                 pdf_bytes,
                 pdf_models,
                 imageWriter,
+                parse_mode,
                 start_page_id=start_page,
                 debug_mode=is_debug,
+                workers=workers,
+                doc_context=doc_context,
+                recorder=recorder,
             )
         except Exception as e:
             logger.exception(e)
             return None
 
-    pdf_info_dict = parse_pdf(parse_pdf_by_txt)
+    pdf_info_dict = parse_pdf(PARSE_MODE_UNION)
 
     if pdf_info_dict is None or pdf_info_dict.get("_need_drop", False):
         logger.warning(f"parse_pdf_by_txt drop or error, switch to parse_pdf_by_ocr")
-        pdf_info_dict = parse_pdf(parse_pdf_by_ocr)
+        pdf_info_dict = parse_pdf(PARSE_MODE_OCR)
         if pdf_info_dict is None:
             raise Exception("Both parse_pdf_by_txt and parse_pdf_by_ocr failed.")
         else:
@@ -90,3 +108,69 @@ def parse_union_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWr
         pdf_info_dict["_parse_type"] = PARSE_TYPE_TXT
 
     return pdf_info_dict
+
+
+def iter_parse_txt_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWriter, is_debug=False, start_page=0,
+                       *args, workers=1, doc_context=None, recorder=None, **kwargs):
+    """
+    逐页解析文本类pdf，产出的每一页分段都已经确定
+    """
+    yield from pdf_parse_union_iter(
+        pdf_bytes,
+        pdf_models,
+        imageWriter,
+        PARSE_TYPE_TXT,
+        start_page_id=start_page,
+        debug_mode=is_debug,
+        workers=workers,
+        doc_context=doc_context,
+        recorder=recorder,
+    )
+
+
+def iter_parse_ocr_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWriter, is_debug=False, start_page=0,
+                       *args, workers=1, doc_context=None, recorder=None, **kwargs):
+    """
+    逐页解析ocr类pdf，产出的每一页分段都已经确定
+    """
+    yield from pdf_parse_union_iter(
+        pdf_bytes,
+        pdf_models,
+        imageWriter,
+        PARSE_TYPE_OCR,
+        start_page_id=start_page,
+        debug_mode=is_debug,
+        workers=workers,
+        doc_context=doc_context,
+        recorder=recorder,
+    )
+
+
+def iter_parse_union_pdf(pdf_bytes: bytes, pdf_models: list, imageWriter: AbsReaderWriter, is_debug=False, start_page=0,
+                         *args, workers=1, doc_context=None, recorder=None, **kwargs):
+    """
+    逐页解析ocr和文本混合的pdf，和parse_union_pdf一样按页选择txt或ocr的文本span
+    在产出第一页之前出错时切换到ocr方式；已经产出页面之后再出错就无法切换了，直接抛出异常
+    """
+    if doc_context is None:
+        doc_context = PdfDocContext(pdf_bytes)
+    page_yielded = False
+    pages = pdf_parse_union_iter(pdf_bytes, pdf_models, imageWriter, PARSE_MODE_UNION, start_page_id=start_page,
+                                 debug_mode=is_debug, workers=workers, doc_context=doc_context, recorder=recorder)
+    try:
+        for page_info in pages:
+            page_yielded = True
+            yield page_info
+        return
+    except Exception as e:
+        if page_yielded:
+            raise e
+        logger.exception(e)
+    finally:
+        # 调用方提前停止迭代时，for循环不会关闭内层的生成器，要显式关闭，让它flush imageWriter
+        pages.close()
+
+    logger.warning(f"parse_pdf_by_txt drop or error, switch to parse_pdf_by_ocr")
+    yield from iter_parse_ocr_pdf(pdf_bytes, pdf_models, imageWriter, is_debug=is_debug,
+                                  start_page=start_page, workers=workers, doc_context=doc_context,
+                                  recorder=recorder)
@@ -0,0 +1,35 @@
+import glob
+import json
+import os
+
+import pytest
+
+'''tests/test_cli/pdf_dev下的样例pdf，每个pdf旁边有同名的模型结果json'''
+PDF_DEV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_cli", "pdf_dev")
+
+
+def pytest_generate_tests(metafunc):
+    '''参数里有pdf_dev_pdf_path的测试，对每个样例pdf各跑一次'''
+    if "pdf_dev_pdf_path" in metafunc.fixturenames:
+        pdf_paths = sorted(glob.glob(os.path.join(PDF_DEV_PATH, "*.pdf")))
+        metafunc.parametrize("pdf_dev_pdf_path", pdf_paths, ids=os.path.basename)
+
+
+@pytest.fixture
+def pdf_dev_path():
+    return PDF_DEV_PATH
+
+
+@pytest.fixture
+def read_pdf_and_model():
+    """
+    返回一个函数，按样例名(不带.pdf/.json后缀)读出(pdf_bytes, model_list)，每次调用都重新读，model_list互不影响
+    """
+    def read(name):
+        with open(os.path.join(PDF_DEV_PATH, f"{name}.pdf"), "rb") as f:
+            pdf_bytes = f.read()
+        with open(os.path.join(PDF_DEV_PATH, f"{name}.json"), "r", encoding="utf-8") as f:
+            model_list = json.load(f)
+        return pdf_bytes, model_list
+
+    return read
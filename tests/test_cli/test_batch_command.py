@@ -0,0 +1,144 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+from click.testing import CliRunner
+
+import magic_pdf.cli.magicpdf as magicpdf
+
+
+def fake_parse_one(task, method, classify_cache_path=None):
+    """
+    代替_batch_parse_one在子进程中运行，每次运行往attempts_file里追加一个字符，按behavior决定退出方式
+    """
+    with open(task["attempts_file"], "a") as f:
+        f.write(method[0])
+    with open(task["attempts_file"]) as f:
+        attempt = len(f.read())
+    if task["behavior"] == "hang":
+        time.sleep(60)
+    if task["behavior"] == "fail" or (task["behavior"] == "flaky" and attempt == 1):
+        sys.exit(1)
+
+
+def make_task(tmp_path, name, behavior):
+    return {"key": str(tmp_path / f"{name}.pdf"), "attempts_file": str(tmp_path / f"{name}.attempts"),
+            "behavior": behavior}
+
+
+def read_attempts(task):
+    with open(task["attempts_file"]) as f:
+        return len(f.read())
+
+
+def read_ledger(ledger_path):
+    with open(ledger_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def fake_batch_worker(monkeypatch):
+    monkeypatch.setattr(magicpdf, "_batch_parse_one", fake_parse_one)
+    monkeypatch.setattr(magicpdf, "_warm_up_batch_worker", lambda tasks: None)
+
+
+def test_collect_batch_tasks(tmp_path):
+    for name in ["a", "b", "c"]:
+        (tmp_path / f"{name}.pdf").write_bytes(b"%PDF")
+        if name != "c":  # c没有模型json，会被跳过
+            (tmp_path / f"{name}.json").write_text("[]")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.pdf").write_bytes(b"%PDF")
+    (tmp_path / "sub" / "a.json").write_text("[]")
+
+    tasks = magicpdf._collect_batch_tasks(str(tmp_path))
+    assert [task["key"] for task in tasks] == [str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")]
+    assert tasks[0]["model"] == str(tmp_path / "a.json")
+
+    tasks = magicpdf._collect_batch_tasks(os.path.join(str(tmp_path), "*", "a.pdf"))
+    assert [task["key"] for task in tasks] == [str(tmp_path / "sub" / "a.pdf")]
+
+    manifest = tmp_path / "manifest.jsonl"
+    records = [{"file_location": "s3://a/x.pdf", "doc_layout_result": []},
+               {"file_location": "s3://b/x.pdf", "doc_layout_result": []}]
+    manifest.write_text("\n".join(json.dumps(record) for record in records) + "\n\n")
+    tasks = magicpdf._collect_batch_tasks(str(manifest))
+    assert [task["key"] for task in tasks] == ["s3://a/x.pdf", "s3://b/x.pdf"]
+    assert tasks[1]["record"] == records[1]
+
+    '''同名的pdf输出到不同的目录'''
+    output_names = [magicpdf._get_batch_output_name(task) for task in tasks]
+    assert output_names[0] != output_names[1]
+    assert all(name.startswith("x_") for name in output_names)
+
+
+def test_load_batch_ledger(tmp_path):
+    ledger_path = tmp_path / "ledger.jsonl"
+    assert magicpdf._load_batch_ledger(str(ledger_path), "auto") == set()
+
+    lines = [
+        json.dumps({"key": "a", "method": "auto", "status": "success"}),
+        json.dumps({"key": "b", "method": "auto", "status": "failed"}),
+        json.dumps({"key": "c", "method": "ocr", "status": "success"}),
+        "",
+        '{"key": "d", "method": "auto", "sta',  # 上次被中断时留下的不完整的行
+    ]
+    ledger_path.write_text("\n".join(lines))
+    assert magicpdf._load_batch_ledger(str(ledger_path), "auto") == {"a"}
+    assert magicpdf._load_batch_ledger(str(ledger_path), "ocr") == {"c"}
+
+
+def test_run_batch_retry_and_ledger(tmp_path, fake_batch_worker):
+    tasks = [make_task(tmp_path, "ok", "ok"), make_task(tmp_path, "flaky", "flaky"),
+             make_task(tmp_path, "fail", "fail")]
+    ledger_path = str(tmp_path / "ledger.jsonl")
+    stats = magicpdf._run_batch(tasks, "auto", workers=2, timeout=None, retry=1, ledger_path=ledger_path)
+
+    assert stats == {"success": 2, "failed": 1, "timeout": 0}
+    assert [read_attempts(task) for task in tasks] == [1, 2, 2]
+    records = {record["key"]: record for record in read_ledger(ledger_path)}
+    assert set(records) == {task["key"] for task in tasks}
+    assert records[tasks[0]["key"]]["status"] == "success"
+    assert records[tasks[1]["key"]]["status"] == "success"
+    assert records[tasks[1]["key"]]["attempts"] == 2
+    assert records[tasks[2]["key"]]["status"] == "failed"
+    assert all(record["method"] == "auto" and record["cost_time"] >= 0 for record in records.values())
+
+
+def test_run_batch_kill_hung_worker(tmp_path, fake_batch_worker):
+    tasks = [make_task(tmp_path, "hang", "hang"), make_task(tmp_path, "ok", "ok")]
+    ledger_path = str(tmp_path / "ledger.jsonl")
+    start = time.time()
+    stats = magicpdf._run_batch(tasks, "auto", workers=2, timeout=1, retry=0, ledger_path=ledger_path)
+
+    assert time.time() - start < 30
+    assert stats == {"success": 1, "failed": 0, "timeout": 1}
+    records = {record["key"]: record for record in read_ledger(ledger_path)}
+    assert records[tasks[0]["key"]]["status"] == "timeout"
+    assert records[tasks[0]["key"]]["attempts"] == 1
+
+
+'''
+再次运行时跳过用同一种方法已经成功的文档，换一种方法时全部重新处理
+'''
+def test_batch_command_resume(tmp_path, monkeypatch, fake_batch_worker):
+    tasks = [make_task(tmp_path, "a", "ok"), make_task(tmp_path, "b", "ok")]
+    monkeypatch.setattr(magicpdf, "_collect_batch_tasks", lambda input_path: tasks)
+    ledger_path = str(tmp_path / "ledger.jsonl")
+    args = ["batch-command", "--input", str(tmp_path), "--ledger", ledger_path, "--workers", "2"]
+
+    assert CliRunner().invoke(magicpdf.cli, args + ["--method", "auto"]).exit_code == 0
+    assert CliRunner().invoke(magicpdf.cli, args + ["--method", "auto"]).exit_code == 0
+    assert [read_attempts(task) for task in tasks] == [1, 1]
+
+    assert CliRunner().invoke(magicpdf.cli, args + ["--method", "ocr"]).exit_code == 0
+    assert [read_attempts(task) for task in tasks] == [2, 2]
+    assert [record["method"] for record in read_ledger(ledger_path)] == ["auto", "auto", "ocr", "ocr"]
+
+    tasks[1]["behavior"] = "fail"
+    with open(tasks[1]["attempts_file"], "w"):
+        pass
+    result = CliRunner().invoke(magicpdf.cli, args + ["--method", "txt", "--retry", "0"])
+    assert result.exit_code == 1
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+code_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+'''
+只在用到时才导入的重依赖：s3相关只在读写s3时用到，sklearn只在行对齐时用到，wordninja只在切分英文长词时用到，spacy只在NLP判断时用到
+'''
+HEAVY_MODULES = ["boto3", "botocore", "s3pathlib", "sklearn", "scipy", "pandas", "wordninja", "spacy"]
+
+
+def imported_heavy_modules(module):
+    code = f"import sys, {module}; print('heavy:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [code_path, os.environ.get("PYTHONPATH")]))}
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, env=env).stdout
+    '''导入fitz时会往stdout打印弃用提示，只看带前缀的那一行'''
+    line = [line for line in output.splitlines() if line.startswith("heavy:")][0]
+    return [m for m in line[len("heavy:"):].split(",") if m]
+
+
+def test_cli_import_does_not_load_heavy_modules():
+    assert imported_heavy_modules("magic_pdf.cli.magicpdf") == []
+
+
+def test_pipe_import_does_not_load_heavy_modules():
+    assert imported_heavy_modules("magic_pdf.pipe.UNIPipe") == []
+    assert imported_heavy_modules("magic_pdf.rw.S3ReaderWriter") == []
@@ -0,0 +1,57 @@
+import random
+import re
+
+import wordninja
+
+import magic_pdf.dict2md.ocr_mkcontent as ocr_mkcontent
+from magic_pdf.dict2md.ocr_mkcontent import merge_para_with_text, split_long_words
+from magic_pdf.libs.ocr_content_type import ContentType
+
+
+def split_long_words_reference(text):
+    segments = text.split(' ')
+    for i in range(len(segments)):
+        words = re.findall(r'\w+|[^\w\s]', segments[i], re.UNICODE)
+        for j in range(len(words)):
+            if len(words[j]) > 15:
+                words[j] = ' '.join(wordninja.split(words[j]))
+        segments[i] = ''.join(words)
+    return ' '.join(segments)
+
+
+'''
+跳过不需要切分的文本后，结果和原来的实现相同
+'''
+def test_split_long_words_same_as_reference():
+    random.seed(0)
+    alphabet = "abcdefghij ,.\t\n中文-"
+    texts = ["thequickbrownfoxjumps over", "short words only.", "tab\tinside", "a\xa0b", ""]
+    texts += ["".join(random.choice(alphabet) for _ in range(random.randint(0, 40))) for _ in range(500)]
+    for text in texts:
+        assert split_long_words(text) == split_long_words_reference(text)
+
+
+'''
+同一个文本只做一次语言检测
+'''
+def test_detect_lang_once_per_text(monkeypatch):
+    detected = []
+    detect_lang = ocr_mkcontent.detect_lang
+
+    def detect_lang_and_record(text):
+        detected.append(text)
+        return detect_lang(text)
+
+    monkeypatch.setattr(ocr_mkcontent, "detect_lang", detect_lang_and_record)
+    ocr_mkcontent.text_span_content_and_language.cache_clear()
+    para_block = {
+        "lines": [
+            {"spans": [{"type": ContentType.Text, "content": "This is a test sentence"},
+                       {"type": ContentType.InlineEquation, "content": "x^2"}]},
+            {"spans": [{"type": ContentType.Text, "content": "This is a test sentence"}]},
+        ]
+    }
+    assert merge_para_with_text(para_block) == "This is a test sentence $x^2$This is a test sentence "
+    assert merge_para_with_text(para_block) == "This is a test sentence $x^2$This is a test sentence "
+    assert detected == ["This is a test sentence"]
+    ocr_mkcontent.text_span_content_and_language.cache_clear()
@@ -0,0 +1,116 @@
+import copy
+import random
+
+import pytest
+
+from magic_pdf.layout.layout_det_utils import find_all_left_bbox_direct, find_all_right_bbox_direct, \
+    find_all_top_bbox_direct, find_all_bottom_bbox_direct
+from magic_pdf.libs.bbox_index import BboxIndex
+from magic_pdf.libs.boxbase import _is_in, get_minbox_if_overlap_by_ratio, calculate_overlap_area_in_bbox1_area_ratio
+from magic_pdf.libs.drop_tag import DropTag
+from magic_pdf.pre_proc.ocr_dict_merge import fill_spans_in_blocks
+from magic_pdf.pre_proc.ocr_span_list_modify import remove_overlaps_min_spans, modify_y_axis, \
+    modify_inline_equation
+from magic_pdf.pre_proc.remove_bbox_overlap import remove_overlap_between_bbox
+
+
+def random_bboxes(n, seed):
+    """
+    随机生成一页的bbox，包含重复、退化(宽或高为0)和坐标颠倒的bbox
+    """
+    rnd = random.Random(seed)
+    bboxes = []
+    for _ in range(n):
+        r = rnd.random()
+        if r < 0.1 and bboxes:
+            bboxes.append(list(rnd.choice(bboxes)))
+            continue
+        x0, y0 = rnd.randint(0, 300), rnd.randint(0, 400)
+        w, h = rnd.randint(0, 80), rnd.randint(0, 30)
+        if r < 0.15:
+            bboxes.append([x0 + w, y0 + h, x0, y0])
+        else:
+            bboxes.append([x0, y0, x0 + w, y0 + h])
+    return bboxes
+
+
+def random_spans(n, seed):
+    types = ["text", "inline_equation", "interline_equation", "image", "table"]
+    rnd = random.Random(seed)
+    return [{"bbox": bbox, "type": rnd.choice(types), "content": str(i % 7)}
+            for i, bbox in enumerate(random_bboxes(n, seed))]
+
+
+'''以下是改用空间索引之前的全量扫描实现，作为对照'''
+def remove_overlaps_min_spans_by_scan(spans):
+    dropped_spans = []
+    for span1 in spans:
+        for span2 in spans:
+            if span1 != span2:
+                overlap_box = get_minbox_if_overlap_by_ratio(span1['bbox'], span2['bbox'], 0.65)
+                if overlap_box is not None:
+                    span_need_remove = next((span for span in spans if span['bbox'] == overlap_box), None)
+                    if span_need_remove is not None and span_need_remove not in dropped_spans:
+                        dropped_spans.append(span_need_remove)
+    for span_need_remove in dropped_spans:
+        spans.remove(span_need_remove)
+        span_need_remove['tag'] = DropTag.SPAN_OVERLAP
+    return spans, dropped_spans
+
+
+def fill_spans_in_blocks_by_scan(blocks, spans):
+    block_with_spans = []
+    for block in blocks:
+        block_bbox = block[0:4]
+        block_spans = [span for span in spans
+                       if calculate_overlap_area_in_bbox1_area_ratio(span['bbox'], block_bbox) > 0.7]
+        displayed_list = []
+        text_inline_lines = []
+        modify_y_axis(block_spans, displayed_list, text_inline_lines)
+        block_spans = modify_inline_equation(block_spans, displayed_list, text_inline_lines)
+        block_spans = remove_overlap_between_bbox(block_spans)
+        block_with_spans.append({'type': block[7], 'bbox': block_bbox, 'spans': block_spans})
+        for span in block_spans:
+            spans.remove(span)
+    return block_with_spans
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_query_overlap_is_superset(seed):
+    bboxes = random_bboxes(300, seed)
+    bbox_index = BboxIndex(bboxes)
+    for bbox in random_bboxes(50, seed + 100):
+        candidates = set(bbox_index.query_overlap(bbox))
+        for i, other in enumerate(bboxes):
+            if calculate_overlap_area_in_bbox1_area_ratio(other, bbox) > 0 or _is_in(other, bbox) or _is_in(bbox, other):
+                assert i in candidates
+        assert bbox_index.query_containing(bbox) == [i for i, other in enumerate(bboxes) if _is_in(bbox, other)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_find_bbox_direct_with_index(seed):
+    bboxes = [bbox + [None] * 8 for bbox in random_bboxes(200, seed)]
+    bbox_index = BboxIndex(bboxes)
+    for find_func in [find_all_left_bbox_direct, find_all_right_bbox_direct,
+                      find_all_top_bbox_direct, find_all_bottom_bbox_direct]:
+        for bbox in bboxes:
+            assert find_func(bbox, bboxes, bbox_index) is find_func(bbox, bboxes)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_remove_overlaps_min_spans(seed):
+    spans = random_spans(300, seed)
+    expected_spans, expected_dropped = remove_overlaps_min_spans_by_scan(copy.deepcopy(spans))
+    result_spans, result_dropped = remove_overlaps_min_spans(spans)
+    assert result_spans == expected_spans
+    assert result_dropped == expected_dropped
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fill_spans_in_blocks(seed):
+    spans = random_spans(300, seed)
+    blocks = [bbox + [None, None, None, "text"] for bbox in random_bboxes(40, seed + 100)]
+    expected_spans = copy.deepcopy(spans)
+    expected = fill_spans_in_blocks_by_scan(copy.deepcopy(blocks), expected_spans)
+    assert fill_spans_in_blocks(blocks, spans) == expected
+    assert spans == expected_spans
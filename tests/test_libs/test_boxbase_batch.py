@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+import pytest
+
+from magic_pdf.libs.boxbase import calculate_iou, calculate_overlap_area_2_minbox_area_ratio, \
+    calculate_overlap_area_in_bbox1_area_ratio, get_minbox_if_overlap_by_ratio, _is_in, bbox_relative_pos, \
+    bbox_distance, calculate_iou_batch, calculate_overlap_area_2_minbox_area_ratio_batch, \
+    calculate_overlap_area_in_bbox1_area_ratio_batch, get_minbox_if_overlap_by_ratio_batch, _is_in_batch, \
+    bbox_relative_pos_batch, bbox_distance_batch, MINBOX_NONE, MINBOX_BBOX1, MINBOX_BBOX2
+
+
+def random_bboxes(n, seed, use_float):
+    """
+    随机生成bbox，包含重复、退化(宽或高为0)和坐标颠倒的bbox
+    """
+    rnd = random.Random(seed)
+    bboxes = []
+    for _ in range(n):
+        r = rnd.random()
+        if r < 0.1 and bboxes:
+            bboxes.append(list(rnd.choice(bboxes)))
+            continue
+        if use_float:
+            x0, y0, w, h = rnd.uniform(0, 300), rnd.uniform(0, 400), rnd.uniform(0, 80), rnd.uniform(0, 30)
+        else:
+            x0, y0, w, h = rnd.randint(0, 300), rnd.randint(0, 400), rnd.randint(0, 80), rnd.randint(0, 30)
+        if r < 0.15:
+            bboxes.append([x0 + w, y0 + h, x0, y0])
+        elif r < 0.2:
+            bboxes.append([x0, y0, x0 + w, y0])
+        else:
+            bboxes.append([x0, y0, x0 + w, y0 + h])
+    return bboxes
+
+
+def scalar_matrix(func, bboxes1, bboxes2):
+    return [[func(b1, b2) for b2 in bboxes2] for b1 in bboxes1]
+
+
+@pytest.mark.parametrize("use_float", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_equals_scalar(seed, use_float):
+    bboxes1 = random_bboxes(120, seed, use_float)
+    bboxes2 = random_bboxes(80, seed + 100, use_float) + bboxes1[:20]
+
+    for scalar_func, batch_func in [
+        (calculate_overlap_area_2_minbox_area_ratio, calculate_overlap_area_2_minbox_area_ratio_batch),
+        (calculate_overlap_area_in_bbox1_area_ratio, calculate_overlap_area_in_bbox1_area_ratio_batch),
+        (_is_in, _is_in_batch),
+        (bbox_distance, bbox_distance_batch),
+    ]:
+        assert batch_func(bboxes1, bboxes2).tolist() == scalar_matrix(scalar_func, bboxes1, bboxes2)
+
+    relative_pos = [m.tolist() for m in bbox_relative_pos_batch(bboxes1, bboxes2)]
+    for i, b1 in enumerate(bboxes1):
+        for j, b2 in enumerate(bboxes2):
+            assert tuple(m[i][j] for m in relative_pos) == bbox_relative_pos(b1, b2)
+
+    minbox = get_minbox_if_overlap_by_ratio_batch(bboxes1, bboxes2, 0.65)
+    for i, b1 in enumerate(bboxes1):
+        for j, b2 in enumerate(bboxes2):
+            expected = get_minbox_if_overlap_by_ratio(b1, b2, 0.65)
+            assert {MINBOX_NONE: None, MINBOX_BBOX1: b1, MINBOX_BBOX2: b2}[minbox[i][j]] is expected
+
+    '''不含除0情况的bbox才能和标量版本的calculate_iou比较'''
+    bboxes1 = [b for b in bboxes1 if b[0] < b[2] and b[1] < b[3]]
+    bboxes2 = [b for b in bboxes2 if b[0] < b[2] and b[1] < b[3]]
+    assert calculate_iou_batch(bboxes1, bboxes2).tolist() == scalar_matrix(calculate_iou, bboxes1, bboxes2)
+
+
+def test_batch_edge_cases():
+    '''和标量版本一样，面积为0的bbox在相交时会除0'''
+    with pytest.raises(ZeroDivisionError):
+        calculate_iou([1, 1, 1, 1], [1, 1, 1, 1])
+    with pytest.raises(ZeroDivisionError):
+        calculate_iou_batch([[1, 1, 1, 1]], [[0, 0, 5, 5], [1, 1, 1, 1]])
+
+    '''空输入返回形状正确的空矩阵，只使用每个bbox的前4个值'''
+    assert calculate_overlap_area_in_bbox1_area_ratio_batch([], [[0, 0, 1, 1]]).shape == (0, 1)
+    assert _is_in_batch([[1, 1, 2, 2, None, "text"]], np.array([[0, 0, 3, 3]])).tolist() == [[True]]
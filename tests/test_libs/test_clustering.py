@@ -0,0 +1,50 @@
+import random
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+import magic_pdf.para.para_split_v2 as para_split_v2
+from magic_pdf.libs.clustering import dbscan_1d
+from magic_pdf.pdf_parse_by_txt_v2 import parse_pdf_by_txt
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+
+def dbscan_labels(values, eps, min_samples):
+    return DBSCAN(eps=eps, min_samples=min_samples).fit(np.array([[v, 0] for v in values])).labels_
+
+
+'''
+随机数据上与DBSCAN的标签完全相同，包括整数坐标恰好相距eps、以及非核心点同时挨着两个类的情况
+'''
+def test_dbscan_1d_same_as_sklearn():
+    random.seed(0)
+    for i in range(1000):
+        n = random.randint(1, 40)
+        if i % 3 == 0:
+            values = [random.randint(0, 60) for _ in range(n)]
+        elif i % 3 == 1:
+            values = [round(random.uniform(0, 60), 2) for _ in range(n)]
+        else:
+            values = [random.choice([0, 1.5, 3, 4.5, 6, 7.5, 30, 33]) for _ in range(n)]
+        eps = random.choice([1.5, 2.5, 3])
+        min_samples = random.randint(1, 5)
+        assert np.array_equal(dbscan_1d(values, eps, min_samples), dbscan_labels(values, eps, min_samples))
+    assert len(dbscan_1d([], 3, 2)) == 0
+
+
+'''
+在样例pdf的行对齐中，每一次聚类的结果都与DBSCAN相同
+'''
+def test_dbscan_1d_same_as_sklearn_on_samples(tmp_path, monkeypatch, read_pdf_and_model):
+    calls = []
+
+    def dbscan_1d_and_compare(values, eps, min_samples):
+        labels = dbscan_1d(values, eps, min_samples)
+        assert np.array_equal(labels, dbscan_labels(values, eps, min_samples))
+        calls.append(len(values))
+        return labels
+
+    monkeypatch.setattr(para_split_v2, "dbscan_1d", dbscan_1d_and_compare)
+    for name in ["p3_图文混排84", "b80cbc13-6655-42a8-a3a1-fe2db6eff883.html"]:
+        parse_pdf_by_txt(*read_pdf_and_model(name), DiskReaderWriter(str(tmp_path)))
+    assert len(calls) > 0
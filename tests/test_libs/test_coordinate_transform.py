@@ -0,0 +1,62 @@
+import copy
+import json
+import random
+
+import magic_pdf.model.magic_model as magic_model_module
+from magic_pdf.libs.commons import fitz
+from magic_pdf.libs.coordinate_transform import get_page_pixel_size
+from magic_pdf.model.magic_model import MagicModel
+
+
+def get_scale_ratio_by_pixmap(model_page_info, page):
+    '''改为读取页面几何信息之前，渲染整页得到宽高的实现，作为对照'''
+    pix = page.get_pixmap(dpi=72)
+    horizontal_scale_ratio = model_page_info['page_info']['width'] / int(pix.w)
+    vertical_scale_ratio = model_page_info['page_info']['height'] / int(pix.h)
+    return horizontal_scale_ratio, vertical_scale_ratio
+
+
+def test_page_pixel_size_equals_pixmap():
+    '''各种小数宽高、旋转、cropbox的页面'''
+    rnd = random.Random(0)
+    doc = fitz.open()
+    for _ in range(200):
+        width = rnd.choice([rnd.uniform(50, 1500), 595.2756, 612.001, 611.999, 100.0005, 99.9995])
+        height = rnd.choice([rnd.uniform(50, 1500), 841.8898, 792.0004, 791.9996])
+        page = doc.new_page(width=width, height=height)
+        if rnd.random() < 0.3:
+            page.set_rotation(rnd.choice([90, 180, 270]))
+        if rnd.random() < 0.3:
+            x0, y0 = rnd.uniform(0, width / 3), rnd.uniform(0, height / 3)
+            page.set_cropbox(fitz.Rect(x0, y0, rnd.uniform(x0 + 10, width), rnd.uniform(y0 + 10, height)))
+    for page in fitz.open("pdf", doc.tobytes()):
+        pix = page.get_pixmap(dpi=72)
+        assert get_page_pixel_size(page) == (pix.w, pix.h)
+
+
+MAGIC_MODEL_GETTERS = ["get_imgs", "get_tables", "get_equations", "get_discarded", "get_text_blocks",
+                       "get_title_blocks", "get_all_spans"]
+
+
+def get_all_pages(magic_model, page_cnt):
+    return [[getattr(magic_model, getter)(page_id) for getter in MAGIC_MODEL_GETTERS] for page_id in range(page_cnt)]
+
+
+def test_magic_model_bboxes_unchanged(pdf_dev_pdf_path, monkeypatch):
+    pdf_docs = fitz.open(pdf_dev_pdf_path)
+    with open(pdf_dev_pdf_path[:-len(".pdf")] + ".json", "r", encoding="utf-8") as f:
+        model_list = json.load(f)
+
+    # MagicModel在第一次访问某一页时才修正坐标，对照结果必须在替换了get_scale_ratio的上下文里取出来
+    reference_calls = []
+
+    def counted_get_scale_ratio_by_pixmap(model_page_info, page):
+        reference_calls.append(page.number)
+        return get_scale_ratio_by_pixmap(model_page_info, page)
+
+    with monkeypatch.context() as m:
+        m.setattr(magic_model_module, "get_scale_ratio", counted_get_scale_ratio_by_pixmap)
+        expected = get_all_pages(MagicModel(copy.deepcopy(model_list), pdf_docs), len(pdf_docs))
+    assert sorted(reference_calls) == list(range(len(pdf_docs)))
+
+    assert get_all_pages(MagicModel(model_list, pdf_docs), len(pdf_docs)) == expected
@@ -0,0 +1,56 @@
+import glob
+import os
+
+from magic_pdf.libs.commons import fitz
+from magic_pdf.libs.pdf_image_tools import cut_image, skip_existing_images
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+
+class CountingDiskReaderWriter(DiskReaderWriter):
+    def __init__(self, parent_path):
+        super().__init__(parent_path)
+        self.write_count = 0
+        self.exists_count = 0
+
+    def exists(self, path):
+        self.exists_count += 1
+        return super().exists(path)
+
+    def write(self, content, path, mode="text"):
+        self.write_count += 1
+        super().write(content, path, mode)
+
+
+'''
+同一张截图只写一次：同一进程内重复截图直接跳过，调用过skip_existing_images时已经存在的文件(例如重跑时)也不再写
+'''
+def test_cut_image_skip_existing(tmp_path, pdf_dev_path):
+    pdf_path = sorted(glob.glob(os.path.join(pdf_dev_path, "*.pdf")))[0]
+    page = fitz.open(pdf_path)[0]
+    bbox = [10, 20, 200, 150]
+
+    image_writer = CountingDiskReaderWriter(str(tmp_path))
+    img_path = cut_image(bbox, 0, page, "md5/images", image_writer)
+    assert cut_image(bbox, 0, page, "md5/images", image_writer) == img_path
+    assert image_writer.write_count == 1
+    '''默认不查询imageWriter中是否已经存在'''
+    assert image_writer.exists_count == 0
+    with open(tmp_path / img_path, "rb") as f:
+        img_bytes = f.read()
+
+    '''新的writer写到同一个目录，默认重新截图写入，调用skip_existing_images之后跳过已经存在的文件'''
+    image_writer = CountingDiskReaderWriter(str(tmp_path))
+    assert cut_image(bbox, 0, page, "md5/images", image_writer) == img_path
+    assert (image_writer.write_count, image_writer.exists_count) == (1, 0)
+    image_writer = CountingDiskReaderWriter(str(tmp_path))
+    skip_existing_images(image_writer)
+    assert cut_image(bbox, 0, page, "md5/images", image_writer) == img_path
+    assert (image_writer.write_count, image_writer.exists_count) == (0, 1)
+
+    '''不同的路径、不同的缩放倍数都会产生新的图片'''
+    assert cut_image(bbox, 0, page, "md5/tables", image_writer) != img_path
+    zoom_img_path = cut_image(bbox, 0, page, "md5/images", image_writer, zoom=1)
+    assert zoom_img_path != img_path
+    assert image_writer.write_count == 2
+    with open(tmp_path / zoom_img_path, "rb") as f:
+        assert len(f.read()) < len(img_bytes)
@@ -0,0 +1,65 @@
+import sys
+
+import spacy
+
+import magic_pdf.libs.nlp_utils as nlp_utils
+from magic_pdf.libs.nlp_utils import NLPModels
+
+
+class FakeSpacyModelPackage:
+    def __init__(self, lang, loaded):
+        self.lang = lang
+        self.loaded = loaded
+
+    def load(self):
+        self.loaded.append(self.lang)
+        nlp = spacy.blank(self.lang)
+        ruler = nlp.add_pipe("entity_ruler")
+        ruler.add_patterns([
+            {"label": "PERSON", "pattern": [{"LOWER": "john"}, {"LOWER": "doe"}]},
+            {"label": "PERSON", "pattern": [{"LOWER": "jane"}, {"LOWER": "smith"}]},
+            {"label": "GPE", "pattern": [{"LOWER": "changchun"}]},
+        ])
+        return nlp
+
+
+'''
+模型在第一次用到时才加载，按语言只加载需要的模型，多个NLPModels共享同一个模型
+'''
+def test_spacy_models_loaded_lazily_once(monkeypatch):
+    loaded = []
+    packages = {
+        "en_core_web_sm": FakeSpacyModelPackage("en", loaded),
+        "zh_core_web_sm": FakeSpacyModelPackage("zh", loaded),
+    }
+    monkeypatch.setattr(nlp_utils, "__spacy_models", {})
+    for name, package in packages.items():
+        monkeypatch.setitem(sys.modules, name, package)
+
+    nlp_model = NLPModels()
+    assert loaded == []
+    assert nlp_model.detect_entity_catgr_using_nlp("John Doe, Jane Smith") == "PERSON"
+    assert NLPModels().detect_entity_catgr_using_nlp("Changchun") == "GPE"
+    assert loaded == ["en"]
+    assert nlp_model.en_core_web_sm_model is NLPModels().en_core_web_sm_model
+
+
+'''
+批量检测的结果和逐条检测相同
+'''
+def test_detect_entity_catgr_batch(monkeypatch):
+    loaded = []
+    packages = {
+        "en_core_web_sm": FakeSpacyModelPackage("en", loaded),
+        "zh_core_web_sm": FakeSpacyModelPackage("zh", loaded),
+    }
+    monkeypatch.setattr(nlp_utils, "__spacy_models", {})
+    for name, package in packages.items():
+        monkeypatch.setitem(sys.modules, name, package)
+
+    texts = ["John Doe, Jane Smith", "", "张三, 李四，王五; 赵六", "Changchun", "Intumescent Flame-Retardants", "John Doe and many other words"]
+    nlp_model = NLPModels()
+    expected = [nlp_model.detect_entity_catgr_using_nlp(text) for text in texts]
+    assert expected == ["PERSON", {}, None, "GPE", None, None]
+    assert nlp_model.detect_entity_catgr_using_nlp_batch(texts) == expected
+    assert sorted(loaded) == ["en", "zh"]
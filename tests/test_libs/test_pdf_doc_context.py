@@ -0,0 +1,30 @@
+import glob
+import os
+
+from magic_pdf.filter.pdf_meta_scan import pdf_meta_scan
+from magic_pdf.libs.commons import fitz
+from magic_pdf.libs.hash_utils import compute_md5
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
+
+
+def test_doc_context(pdf_dev_path):
+    pdf_path = sorted(glob.glob(os.path.join(pdf_dev_path, "*.pdf")))[0]
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    doc = fitz.open("pdf", pdf_bytes)
+
+    doc_context = PdfDocContext(pdf_bytes)
+    '''只算md5时不打开文档'''
+    assert doc_context.pdf_bytes_md5 == compute_md5(pdf_bytes)
+    assert not doc_context.is_opened
+    assert doc_context.page_count == len(doc)
+    assert doc_context.is_opened
+    assert doc_context.pdf_bytes_md5 == compute_md5(pdf_bytes)
+    for page_id, page in enumerate(doc):
+        assert doc_context.get_page_size(page_id) == (page.rect.width, page.rect.height)
+
+    '''传入已经算好的md5时直接使用'''
+    assert PdfDocContext(pdf_bytes, "precomputed").pdf_bytes_md5 == "precomputed"
+
+    '''传入doc_context的meta_scan结果和自己打开文档时相同'''
+    assert pdf_meta_scan(pdf_bytes, doc_context) == pdf_meta_scan(pdf_bytes)
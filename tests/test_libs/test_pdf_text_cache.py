@@ -0,0 +1,32 @@
+import glob
+import os
+
+from magic_pdf.libs.commons import fitz
+from magic_pdf.libs.pdf_text_cache import PdfTextCache, extract_dict_and_rawdict_blocks
+
+
+'''
+缓存给出的text/dict/rawdict要和直接调用page.get_text的结果完全一致
+'''
+def test_text_cache_equals_get_text(pdf_dev_pdf_path):
+    doc = fitz.open(pdf_dev_pdf_path)
+    '''缓存页数小于总页数，覆盖TextPage被淘汰后重新构建的情况'''
+    text_cache = PdfTextCache(fitz.open(pdf_dev_pdf_path), max_cached_pages=2)
+    for _ in range(2):
+        for page_id, page in enumerate(doc):
+            dict_blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]
+            rawdict_blocks = page.get_text("rawdict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]
+            assert text_cache.get_text(page_id) == page.get_text("text")
+            assert text_cache.get_dict_blocks(page_id) == dict_blocks
+            assert text_cache.get_rawdict_blocks(page_id) == rawdict_blocks
+            assert text_cache.get_dict_and_rawdict_blocks(page_id) == (dict_blocks, rawdict_blocks)
+            assert extract_dict_and_rawdict_blocks(page) == (dict_blocks, rawdict_blocks)
+
+
+def test_text_cache_returns_new_objects(pdf_dev_path):
+    pdf_path = sorted(glob.glob(os.path.join(pdf_dev_path, "*.pdf")))[0]
+    text_cache = PdfTextCache(fitz.open(pdf_path))
+    dict_blocks, rawdict_blocks = text_cache.get_dict_and_rawdict_blocks(0)
+    dict_blocks.clear()
+    rawdict_blocks[0]["lines"].clear()
+    assert text_cache.get_dict_and_rawdict_blocks(0) == extract_dict_and_rawdict_blocks(text_cache.pdf_docs[0])
@@ -0,0 +1,111 @@
+import pytest
+
+import magic_pdf.pipe.AbsPipe as abs_pipe_module
+from magic_pdf.filter.classify_cache import ClassifyCache
+from magic_pdf.libs.commons import fitz
+from magic_pdf.libs.hash_utils import compute_md5
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
+from magic_pdf.libs.perf_recorder import PerfRecorder
+from magic_pdf.pipe.AbsPipe import AbsPipe
+from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+
+def make_pdf_bytes(page_cnt, text=True):
+    doc = fitz.open()
+    for i in range(page_cnt):
+        page = doc.new_page()
+        if text:
+            for j in range(30):
+                page.insert_text((72, 72 + j * 20), f"line {j} of page {i}, " + "some words " * 5)
+    return doc.tobytes()
+
+
+def must_not_call(*args, **kwargs):
+    raise AssertionError("缓存命中时不应该再分类")
+
+
+'''
+第一次分类写入缓存，之后同一个pdf直接读缓存，不再打开文档抽取文本
+'''
+@pytest.mark.parametrize("text", [True, False])
+def test_classify_with_cache(tmp_path, monkeypatch, text):
+    pdf_bytes = make_pdf_bytes(5, text)
+    classify_cache = ClassifyCache(str(tmp_path))
+
+    recorder = PerfRecorder()
+    pdf_type = AbsPipe.classify(pdf_bytes, PdfDocContext(pdf_bytes), recorder, classify_cache)
+    assert pdf_type == AbsPipe.classify(pdf_bytes)
+    assert pdf_type == (AbsPipe.PIP_TXT if text else AbsPipe.PIP_OCR)
+    assert recorder.to_dict()["stages"]["classify_cache_miss"]["count"] == 1
+    cached = classify_cache.get_classify(compute_md5(pdf_bytes))
+    assert cached["pdf_type"] == pdf_type
+    assert cached["total_page"] == 5
+
+    monkeypatch.setattr(abs_pipe_module, "classify_incrementally", must_not_call)
+    recorder = PerfRecorder()
+    doc_context = PdfDocContext(pdf_bytes)
+    assert AbsPipe.classify(pdf_bytes, doc_context, recorder, ClassifyCache(str(tmp_path))) == pdf_type
+    assert not doc_context.is_opened
+    assert recorder.to_dict()["stages"]["classify_cache_hit"]["count"] == 1
+    assert "classify_text_pages" not in recorder.to_dict()["stages"]
+
+
+'''
+需要丢弃的文档也缓存，命中时同样抛出异常
+'''
+def test_classify_cache_drop(tmp_path):
+    pdf_bytes = make_pdf_bytes(1)
+    classify_cache = ClassifyCache(str(tmp_path))
+    classify_cache.put_classify(compute_md5(pdf_bytes), {"drop_reason": "encrypted"})
+    with pytest.raises(Exception, match="encrypted"):
+        AbsPipe.classify(pdf_bytes, classify_cache=classify_cache)
+
+
+'''
+版本不一致或者内容损坏的缓存当作未命中，重新分类后覆盖
+'''
+def test_classify_cache_invalid_entry(tmp_path):
+    pdf_bytes = make_pdf_bytes(3)
+    pdf_md5 = compute_md5(pdf_bytes)
+    ClassifyCache(str(tmp_path), version=0).put_classify(pdf_md5, {"pdf_type": AbsPipe.PIP_OCR})
+    classify_cache = ClassifyCache(str(tmp_path))
+    assert classify_cache.get(pdf_md5) is None
+    assert AbsPipe.classify(pdf_bytes, classify_cache=classify_cache) == AbsPipe.PIP_TXT
+    assert classify_cache.get_classify(pdf_md5)["pdf_type"] == AbsPipe.PIP_TXT
+
+    (tmp_path / ClassifyCache.get_cache_path(pdf_md5)).write_text("{not json")
+    assert classify_cache.get(pdf_md5) is None
+
+
+class CountingDiskReaderWriter(DiskReaderWriter):
+    def __init__(self, parent_path):
+        super().__init__(parent_path)
+        self.calls = []
+
+    def exists(self, path):
+        self.calls.append("exists")
+        return super().exists(path)
+
+    def read(self, path, mode=AbsReaderWriter.MODE_TXT):
+        self.calls.append("read")
+        return super().read(path, mode)
+
+    def write(self, content, path, mode=AbsReaderWriter.MODE_TXT):
+        self.calls.append("write")
+        return super().write(content, path, mode)
+
+
+'''
+未命中时只查一次是否存在再写入，命中时查一次再读一次
+'''
+def test_classify_cache_requests(tmp_path):
+    pdf_bytes = make_pdf_bytes(2)
+    reader_writer = CountingDiskReaderWriter(str(tmp_path))
+    classify_cache = ClassifyCache(reader_writer)
+    AbsPipe.classify(pdf_bytes, classify_cache=classify_cache)
+    assert reader_writer.calls == ["exists", "write"]
+
+    reader_writer.calls.clear()
+    AbsPipe.classify(pdf_bytes, classify_cache=classify_cache)
+    assert reader_writer.calls == ["exists", "read"]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from magic_pdf.filter.pdf_classify_by_type import classify, classify_incrementally
+from magic_pdf.filter.pdf_meta_scan import pdf_meta_scan
+from magic_pdf.libs.commons import fitz
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
+
+
+def make_pdf_bytes(page_kinds):
+    """
+    text: 一整页横排文字；short: 只有一行字；scan: 整页大图，没有文字；blank: 空白页
+    """
+    doc = fitz.open()
+    for i, kind in enumerate(page_kinds):
+        page = doc.new_page()
+        if kind == "text":
+            for j in range(30):
+                page.insert_text((72, 72 + j * 20), f"line {j} of page {i}, " + "some words " * 5)
+        elif kind == "short":
+            page.insert_text((72, 72), f"page {i}")
+        elif kind == "scan":
+            # 每页的扫描图都不同，否则会被当成重复出现的垃圾图片
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 20, 20), 0)
+            pix.set_pixel(0, 0, (i % 256, i // 256, 0))
+            page.insert_image(page.rect, stream=pix.tobytes("png"))
+    return doc.tobytes()
+
+
+def classify_by_meta_scan(pdf_bytes):
+    pdf_meta = pdf_meta_scan(pdf_bytes)
+    return classify(pdf_meta["total_page"], pdf_meta["page_width_pts"], pdf_meta["page_height_pts"],
+                    pdf_meta["image_info_per_page"], pdf_meta["text_len_per_page"], pdf_meta["imgs_per_page"],
+                    pdf_meta["text_layout_per_page"])
+
+
+'''
+边扫描边分类的结论与完整meta_scan后分类的结论相同，已经确定的规则结果也相同
+'''
+@pytest.mark.parametrize("seed", range(12))
+def test_classify_incrementally_same_as_classify(seed):
+    rng = np.random.RandomState(seed)
+    page_cnt = int(rng.randint(1, 80))
+    # 各种页面的占比也随机，文字版和扫描版都能覆盖到
+    page_kind_ratio = rng.dirichlet([1, 1, 1, 0.5])
+    page_kinds = list(rng.choice(["text", "short", "scan", "blank"], page_cnt, p=page_kind_ratio))
+    pdf_bytes = make_pdf_bytes(page_kinds)
+
+    np.random.seed(seed)
+    is_text_pdf, results = classify_by_meta_scan(pdf_bytes)
+    np.random.seed(seed)
+    is_text_pdf_incr, results_incr, text_scanned_page_cnt = classify_incrementally(PdfDocContext(pdf_bytes))
+    assert is_text_pdf_incr == is_text_pdf
+    assert 0 <= text_scanned_page_cnt <= page_cnt
+    for name, result in results_incr.items():
+        assert result is None or result == results[name]
+
+
+'''
+文字版在结论确定后就不再抽取后面页面的文本；扫描版只看图片信息就能确定
+'''
+def test_classify_incrementally_early_exit():
+    is_text_pdf, results, text_scanned_page_cnt = classify_incrementally(PdfDocContext(make_pdf_bytes(["text"] * 120)))
+    assert is_text_pdf
+    assert text_scanned_page_cnt < 60
+
+    is_text_pdf, results, text_scanned_page_cnt = classify_incrementally(PdfDocContext(make_pdf_bytes(["scan"] * 120)))
+    assert not is_text_pdf
+    assert results["by_image_area"] is False
+    assert text_scanned_page_cnt == 0
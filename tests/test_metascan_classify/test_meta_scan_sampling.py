@@ -0,0 +1,62 @@
+from magic_pdf.filter.pdf_classify_by_type import classify_by_text_len
+from magic_pdf.filter.pdf_meta_scan import get_scan_page_ids, pdf_meta_scan, get_pdf_textlen_per_page, \
+    get_imgs_per_page, scan_max_page
+from magic_pdf.libs.commons import fitz
+from magic_pdf.libs.pdf_doc_context import PdfDocContext
+from magic_pdf.libs.pdf_text_cache import PdfTextCache
+
+
+def make_pdf_bytes(page_cnt):
+    doc = fitz.open()
+    img_bytes = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 20, 20), 0).tobytes("png")
+    for i in range(page_cnt):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"page {i} " + "some text " * 20)
+        if i % 3 == 0:
+            page.insert_image(fitz.Rect(100, 100, 300, 300), stream=img_bytes)
+    return doc.tobytes()
+
+
+'''
+页数不多时扫描全部页面，页数很多时前scan_max_page页全部扫描，其余页面分段抽样
+'''
+def test_get_scan_page_ids():
+    assert get_scan_page_ids(120, full_scan_page_limit=300) == list(range(120))
+    page_ids = get_scan_page_ids(2000, full_scan_page_limit=300, sample_page_cnt=150)
+    assert page_ids[:scan_max_page] == list(range(scan_max_page))
+    assert len(page_ids) == scan_max_page + 150
+    assert page_ids == sorted(set(page_ids))
+    assert page_ids[-1] >= 1990
+    assert get_scan_page_ids(310, full_scan_page_limit=300, sample_page_cnt=1000) == list(range(310))
+
+
+'''
+抽样扫描时只抽取抽样页面的文本，前scan_max_page页的结果和全部扫描时相同
+'''
+def test_pdf_meta_scan_sampling(monkeypatch):
+    pdf_bytes = make_pdf_bytes(400)
+    full_meta = pdf_meta_scan(pdf_bytes, full_scan_page_limit=1000)
+    doc = fitz.open("pdf", pdf_bytes)
+    assert full_meta["scan_page_ids"] == list(range(400))
+    assert full_meta["text_len_per_page"] == get_pdf_textlen_per_page(doc)
+    assert full_meta["imgs_per_page"] == get_imgs_per_page(doc)
+
+    extracted_page_ids = set()
+    get_text = PdfTextCache.get_text
+
+    def get_text_and_record(self, page_id):
+        extracted_page_ids.add(page_id)
+        return get_text(self, page_id)
+
+    monkeypatch.setattr(PdfTextCache, "get_text", get_text_and_record)
+    sampled_meta = pdf_meta_scan(pdf_bytes, PdfDocContext(pdf_bytes), full_scan_page_limit=100, sample_page_cnt=20)
+    scan_page_ids = sampled_meta["scan_page_ids"]
+    assert len(scan_page_ids) == scan_max_page + 20
+    assert extracted_page_ids == set(scan_page_ids)
+    assert sampled_meta["text_len_per_page"] == [full_meta["text_len_per_page"][i] for i in scan_page_ids]
+    assert sampled_meta["imgs_per_page"] == [full_meta["imgs_per_page"][i] for i in scan_page_ids]
+    for key in ["image_info_per_page", "text_layout_per_page", "text_language", "page_width_pts", "page_height_pts"]:
+        assert sampled_meta[key] == full_meta[key]
+
+    '''按文字长度分类时在扫描过的页面里抽样'''
+    assert classify_by_text_len(sampled_meta["text_len_per_page"], sampled_meta["total_page"])
@@ -0,0 +1,42 @@
+import copy
+
+import magic_pdf.model.magic_model as magic_model_module
+from magic_pdf.libs.commons import fitz
+from magic_pdf.model.magic_model import MagicModel
+from magic_pdf.pdf_parse_by_txt_v2 import parse_pdf_by_txt
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+name = "300970fd-b34a-4656-a334-23059595b360.html"
+
+
+'''
+只修正用到的页，而且每页只修正一次
+'''
+def test_magic_model_fix_pages_lazily(monkeypatch, read_pdf_and_model):
+    pdf_bytes, model_list = read_pdf_and_model(name)
+    fixed_pages = []
+    get_scale_ratio = magic_model_module.get_scale_ratio
+
+    def get_scale_ratio_and_record(model_page_info, page):
+        fixed_pages.append(model_page_info["page_info"]["page_no"])
+        return get_scale_ratio(model_page_info, page)
+
+    monkeypatch.setattr(magic_model_module, "get_scale_ratio", get_scale_ratio_and_record)
+    magic_model = MagicModel(model_list, fitz.open("pdf", pdf_bytes))
+    assert fixed_pages == []
+    magic_model.get_imgs(2)
+    magic_model.get_tables(2)
+    magic_model.get_all_spans(2)
+    magic_model.get_text_blocks(3)
+    assert fixed_pages == [2, 3]
+
+
+'''
+解析不会修改传入的model_list，同一个model_list可以再解析一次，结果相同
+'''
+def test_parse_does_not_mutate_model_list(tmp_path, read_pdf_and_model):
+    pdf_bytes, model_list = read_pdf_and_model(name)
+    model_list_before = copy.deepcopy(model_list)
+    result = parse_pdf_by_txt(pdf_bytes, model_list, DiskReaderWriter(str(tmp_path)))
+    assert model_list == model_list_before
+    assert parse_pdf_by_txt(pdf_bytes, model_list, DiskReaderWriter(str(tmp_path))) == result
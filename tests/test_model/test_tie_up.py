@@ -0,0 +1,118 @@
+import glob
+import json
+import os
+
+import pytest
+
+from magic_pdf.libs.commons import fitz
+from magic_pdf.model.magic_model import MagicModel
+
+'''(subject, object)的category_id: 图和图注、表和表注、表和表格脚注'''
+TIE_UP_PAIRS = [(3, 4), (5, 6), (5, 7)]
+
+'''
+优化之前的实现在pdf_dev样例上的配对结果，按样例名、页码、"subject-object"记录
+pairs中每一项是[subject_body, object_body]，没有配上object时object_body为null；distance是返回的总距离
+'''
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tie_up_expected.json"), encoding="utf-8") as f:
+    EXPECTED_TIE_UP = json.load(f)
+
+
+def summarize_tie_up(tie_up_result):
+    ret, distance = tie_up_result
+    pairs = []
+    for result in ret:
+        subject_body, object_body = result["subject_body"], result.get("object_body")
+        '''all是subject和object合起来的范围'''
+        if object_body is None:
+            assert result["all"] == subject_body
+        else:
+            assert result["all"] == [min(subject_body[0], object_body[0]), min(subject_body[1], object_body[1]),
+                                     max(subject_body[2], object_body[2]), max(subject_body[3], object_body[3])]
+        pairs.append([list(subject_body), list(object_body) if object_body is not None else None])
+    return {"pairs": pairs, "distance": distance}
+
+
+def test_tie_up_same_as_before_on_samples(pdf_dev_path):
+    pdf_paths = sorted(glob.glob(os.path.join(pdf_dev_path, "*.pdf")))
+    results = {}
+    for pdf_path in pdf_paths:
+        with open(pdf_path[:-len(".pdf")] + ".json", "r", encoding="utf-8") as f:
+            model_list = json.load(f)
+        magic_model = MagicModel(model_list, fitz.open(pdf_path))
+        tie_up = magic_model._MagicModel__tie_up_category_by_distance
+        pages = {}
+        for page_no in range(len(model_list)):
+            layout_dets = magic_model._MagicModel__get_page(page_no)["layout_dets"]
+            category_ids = {layout_det["category_id"] for layout_det in layout_dets}
+            page = {f"{s}-{o}": summarize_tie_up(tie_up(page_no, s, o)) for s, o in TIE_UP_PAIRS
+                    if s in category_ids or o in category_ids}
+            if page:
+                pages[str(page_no)] = page
+        results[os.path.basename(pdf_path)[:-len(".pdf")]] = pages
+    assert results == EXPECTED_TIE_UP
+
+
+def make_magic_model(bboxes):
+    """
+    bboxes: [(category_id, bbox)]，页面大小和模型结果的宽高相同，坐标不缩放
+    """
+    pdf_docs = fitz.open()
+    pdf_docs.new_page(width=1700, height=2200)
+    layout_dets = [{"category_id": category_id, "poly": [x0, y0, x1, y0, x1, y1, x0, y1], "score": 0.9}
+                   for category_id, (x0, y0, x1, y1) in bboxes]
+    model_list = [{"layout_dets": layout_dets, "page_info": {"page_no": 0, "width": 1700, "height": 2200}}]
+    return MagicModel(model_list, pdf_docs)
+
+
+'''
+2x3的子图，每个子图下方有自己的图注，整组图下方还有一个总图注
+'''
+DENSE_SUB_FIGURES = (
+    [(3, (100 + 300 * i, 100 + 300 * j, 350 + 300 * i, 300 + 300 * j)) for j in range(2) for i in range(3)]
+    + [(4, (100 + 300 * i, 310 + 300 * j, 350 + 300 * i, 340 + 300 * j)) for j in range(2) for i in range(3)]
+    + [(4, (100, 660, 950, 700))],
+    [
+        [[100, 100, 350, 300], [100, 310, 350, 340]],
+        [[400, 100, 650, 300], [400, 310, 650, 340]],
+        [[100, 400, 350, 600], [100, 610, 350, 640]],
+        [[400, 400, 650, 600], [400, 610, 650, 640]],
+        [[700, 100, 950, 300], [700, 310, 950, 340]],
+        [[700, 400, 950, 600], [100, 610, 950, 700]],
+    ],
+    120,
+)
+
+'''
+距离相同: 一张图上下各有一个距离相同的图注，另一个图注在两张图的正中间
+'''
+TIES = (
+    [(3, (100, 100, 400, 300)), (4, (100, 60, 400, 90)), (4, (100, 310, 400, 340)),
+     (3, (600, 100, 900, 300)), (3, (600, 400, 900, 600)), (4, (600, 335, 900, 365))],
+    [
+        [[100, 100, 400, 300], [100, 60, 400, 90]],
+        [[600, 100, 900, 300], [100, 310, 900, 365]],
+        [[600, 400, 900, 600], None],
+    ],
+    245.24984394500785,
+)
+
+'''
+缺少图注: 两张图都没有正对着的图注，只有斜对角的和离得很远的图注
+'''
+MISSING_CAPTIONS = (
+    [(3, (100, 100, 400, 300)), (3, (100, 500, 400, 700)), (4, (450, 320, 700, 350)), (4, (800, 1000, 1000, 1030))],
+    [
+        [[100, 100, 400, 300], None],
+        [[100, 500, 400, 700], None],
+    ],
+    1,
+)
+
+
+@pytest.mark.parametrize("bboxes, expected_pairs, expected_distance", [DENSE_SUB_FIGURES, TIES, MISSING_CAPTIONS],
+                         ids=["dense_sub_figures", "ties", "missing_captions"])
+def test_tie_up_cases(bboxes, expected_pairs, expected_distance):
+    magic_model = make_magic_model(bboxes)
+    result = magic_model._MagicModel__tie_up_category_by_distance(0, 3, 4)
+    assert summarize_tie_up(result) == {"pairs": expected_pairs, "distance": expected_distance}
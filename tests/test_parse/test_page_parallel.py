@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from magic_pdf.pdf_parse_by_ocr_v2 import parse_pdf_by_ocr
+from magic_pdf.pdf_parse_by_txt_v2 import parse_pdf_by_txt
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+
+'''
+按页并行解析的结果要和逐页解析的结果完全一致
+'''
+@pytest.mark.parametrize("parse_method", [parse_pdf_by_ocr, parse_pdf_by_txt])
+@pytest.mark.parametrize("name", ["14a75ee1-b88a-4fe7-bb10-62cbfabbfdec.html", "b80cbc13-6655-42a8-a3a1-fe2db6eff883.html"])
+def test_parse_with_workers(tmp_path, read_pdf_and_model, parse_method, name):
+    pdf_bytes, model_list = read_pdf_and_model(name)
+    serial_result = parse_method(pdf_bytes, model_list, DiskReaderWriter(str(tmp_path / "serial")))
+    pdf_bytes, model_list = read_pdf_and_model(name)
+    parallel_result = parse_method(pdf_bytes, model_list, DiskReaderWriter(str(tmp_path / "parallel")), workers=2)
+    assert parallel_result == serial_result
+    assert sorted(os.listdir(tmp_path / "parallel")) == sorted(os.listdir(tmp_path / "serial"))
@@ -0,0 +1,107 @@
+import json
+import os
+
+import pytest
+
+from magic_pdf.pipe.OCRPipe import OCRPipe
+from magic_pdf.pipe.UNIPipe import UNIPipe
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+'''
+改成逐页产出之前，一次对整本文档分段(para_split)得到的para_blocks，每个block记为[type, lines_deleted, 行数, 文本]
+两个样例都有跨页连接的段落(下一页第一个block的lines_deleted为True)
+用ocr方式生成，不依赖spacy模型
+'''
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "page_stream_expected.json"), encoding="utf-8") as f:
+    EXPECTED_PARA_BLOCKS = json.load(f)
+
+
+def summarize_para_blocks(page_info):
+    summary = []
+    for block in page_info["para_blocks"]:
+        text = "".join(span.get("content", span.get("image_path", ""))
+                       for line in block.get("lines", []) for span in line["spans"])
+        summary.append([block["type"], bool(block.get("lines_deleted")), len(block.get("lines", [])), text])
+    return summary
+
+
+def make_pipe(pdf_bytes, model_list, image_dir):
+    pipe = UNIPipe(pdf_bytes, model_list, DiskReaderWriter(image_dir))
+    pipe.pipe_classify()
+    return pipe
+
+
+'''
+逐页产出的分段结果要和原来对整本文档分段的结果完全一致，包括跨页连接的段落
+'''
+@pytest.mark.parametrize("name", sorted(EXPECTED_PARA_BLOCKS))
+def test_iter_pages_same_as_whole_document_para_split(tmp_path, read_pdf_and_model, name):
+    expected = EXPECTED_PARA_BLOCKS[name]
+    assert any(page[0][1] for page in expected[1:])
+
+    pipe = OCRPipe(*read_pdf_and_model(name), DiskReaderWriter(str(tmp_path)))
+    pipe.pipe_classify()
+    assert [summarize_para_blocks(page_info) for page_info in pipe.pipe_iter_pages()] == expected
+    assert pipe.pdf_mid_data is None
+
+
+'''
+逐页产出的markdown连接起来和整个文档一次生成的markdown相同
+'''
+@pytest.mark.parametrize("name", ["14a75ee1-b88a-4fe7-bb10-62cbfabbfdec.html", "300970fd-b34a-4656-a334-23059595b360.html"])
+def test_iter_markdown(tmp_path, read_pdf_and_model, name):
+    pipe = make_pipe(*read_pdf_and_model(name), str(tmp_path))
+    pipe.pipe_parse()
+    md_content = pipe.pipe_mk_markdown("images")
+
+    pipe = make_pipe(*read_pdf_and_model(name), str(tmp_path))
+    assert '\n\n'.join(pipe.pipe_iter_markdown("images")) == md_content
+
+
+class FailingFlushDiskReaderWriter(DiskReaderWriter):
+    """
+    模拟异步上传失败的imageWriter，flush时抛出异常
+    """
+
+    def __init__(self, parent_path):
+        super().__init__(parent_path)
+        self.flush_count = 0
+
+    def flush(self):
+        self.flush_count += 1
+        raise IOError("upload failed")
+
+
+'''
+调用方提前停止迭代时也会flush，后台上传的错误不会被吞掉
+'''
+def test_iter_pages_flush_on_close(tmp_path, read_pdf_and_model):
+    image_writer = FailingFlushDiskReaderWriter(str(tmp_path))
+    pipe = UNIPipe(*read_pdf_and_model("14a75ee1-b88a-4fe7-bb10-62cbfabbfdec.html"), image_writer)
+    pipe.pipe_classify()
+    pages = pipe.pipe_iter_pages()
+    next(pages)
+    assert image_writer.flush_count == 0
+    with pytest.raises(IOError, match="upload failed"):
+        pages.close()
+    assert image_writer.flush_count == 1
+
+    image_writer = FailingFlushDiskReaderWriter(str(tmp_path))
+    pipe = UNIPipe(*read_pdf_and_model("14a75ee1-b88a-4fe7-bb10-62cbfabbfdec.html"), image_writer)
+    pipe.pipe_classify()
+    md_iter = pipe.pipe_iter_markdown("images")
+    next(md_iter)
+    with pytest.raises(IOError, match="upload failed"):
+        md_iter.close()
+    assert image_writer.flush_count == 1
+
+    '''迭代完时flush一次，错误在最后一页之后抛出'''
+    image_writer = FailingFlushDiskReaderWriter(str(tmp_path))
+    pipe = UNIPipe(*read_pdf_and_model("14a75ee1-b88a-4fe7-bb10-62cbfabbfdec.html"), image_writer)
+    pipe.pipe_classify()
+    pages = []
+    with pytest.raises(IOError, match="upload failed"):
+        for page_info in pipe.pipe_iter_pages():
+            pages.append(page_info)
+    assert len(pages) == 3
+    assert image_writer.flush_count == 1
@@ -0,0 +1,69 @@
+import json
+
+from magic_pdf.libs.perf_recorder import PerfRecorder
+from magic_pdf.pdf_parse_by_txt_v2 import parse_pdf_by_txt
+from magic_pdf.pipe.UNIPipe import UNIPipe
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+name = "b80cbc13-6655-42a8-a3a1-fe2db6eff883.html"
+
+PAGE_STAGES = ["parse_page", "model_blocks", "model_fix_page", "layout_sort", "span_extract", "overlap_remove",
+               "cut_image", "fill_blocks", "para_split"]
+
+
+'''
+pipe的每个阶段都有记录，每页的阶段各记一次，导出的json可以直接解析，记录不影响解析结果
+'''
+def test_pipe_records_stages(tmp_path, read_pdf_and_model):
+    pdf_bytes, model_list = read_pdf_and_model(name)
+    pipe = UNIPipe(pdf_bytes, model_list, DiskReaderWriter(str(tmp_path)))
+    pipe.pipe_classify()
+    pipe.pipe_parse()
+    md_content = pipe.pipe_mk_markdown("images")
+
+    recorder = PerfRecorder()
+    pdf_bytes, model_list = read_pdf_and_model(name)
+    pipe = UNIPipe(pdf_bytes, model_list, DiskReaderWriter(str(tmp_path)), recorder=recorder)
+    pipe.pipe_classify()
+    pipe.pipe_parse()
+    assert pipe.pipe_mk_markdown("images") == md_content
+    pipe.pipe_mk_uni_format("images")
+
+    perf = json.loads(recorder.to_json())
+    page_count = len(pipe.pdf_mid_data["pdf_info"])
+    for stage in ["classify", "parse", "mk_markdown", "mk_uni_format"]:
+        assert perf["stages"][stage]["count"] == 1
+    for stage in PAGE_STAGES[:-1]:
+        assert perf["stages"][stage]["count"] == page_count
+    assert len(perf["pages"]) == page_count
+    for page_perf in perf["pages"].values():
+        assert page_perf["parse_page"]["count"] == 1
+        assert page_perf["parse_page"]["time"] >= page_perf["layout_sort"]["time"]
+        '''magic_model每页只修正一次，修正和配对的耗时算在取区块信息的阶段里'''
+        assert page_perf["model_fix_page"]["count"] == 1
+        assert page_perf["model_blocks"]["time"] >= page_perf["model_fix_page"]["time"] + page_perf["model_tie_up"]["time"]
+    assert perf["stages"]["parse"]["time"] >= perf["stages"]["parse_page"]["time"]
+
+
+'''
+按页并行时，子进程里记录的每页耗时合并回来
+'''
+def test_recorder_with_workers(tmp_path, read_pdf_and_model):
+    recorder = PerfRecorder()
+    pdf_bytes, model_list = read_pdf_and_model(name)
+    pdf_info = parse_pdf_by_txt(pdf_bytes, model_list, DiskReaderWriter(str(tmp_path)), workers=2,
+                                recorder=recorder)["pdf_info"]
+    perf = recorder.to_dict()
+    assert sorted(perf["pages"]) == [page_info["page_idx"] for page_info in pdf_info]
+    for page_perf in perf["pages"].values():
+        for stage in PAGE_STAGES:
+            assert stage in page_perf
+    assert perf["stages"]["parse_page"]["count"] == len(pdf_info)
+
+
+def test_disabled_recorder_records_nothing():
+    recorder = PerfRecorder(enabled=False)
+    with recorder.stage("parse_page", 0):
+        pass
+    recorder.add_count("image_skipped", page_id=0)
+    assert recorder.to_dict() == {"stages": {}, "pages": {}}
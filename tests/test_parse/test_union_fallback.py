@@ -0,0 +1,36 @@
+import magic_pdf.pdf_parse_union_core as pdf_parse_union_core
+from magic_pdf.pdf_parse_by_ocr_v2 import parse_pdf_by_ocr
+from magic_pdf.pdf_parse_by_txt_v2 import parse_pdf_by_txt
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+from magic_pdf.user_api import parse_union_pdf
+
+
+'''
+txt方式只在出错的那一页改用ocr的span，其余页面和txt方式的结果相同
+'''
+def test_union_fallback_per_page(tmp_path, monkeypatch, read_pdf_and_model):
+    name = "b80cbc13-6655-42a8-a3a1-fe2db6eff883.html"
+    image_writer = DiskReaderWriter(str(tmp_path))
+    txt_pages = parse_pdf_by_txt(*read_pdf_and_model(name), image_writer)["pdf_info"]
+    ocr_pages = parse_pdf_by_ocr(*read_pdf_and_model(name), image_writer)["pdf_info"]
+
+    txt_spans_extract = pdf_parse_union_core.txt_spans_extract
+
+    def txt_spans_extract_fail_on_page_1(pdf_page, *args):
+        if pdf_page.number == 1:
+            raise ValueError("broken text layer")
+        return txt_spans_extract(pdf_page, *args)
+
+    monkeypatch.setattr(pdf_parse_union_core, "txt_spans_extract", txt_spans_extract_fail_on_page_1)
+    pdf_info_dict = parse_union_pdf(*read_pdf_and_model(name), image_writer)
+    union_pages = pdf_info_dict["pdf_info"]
+
+    assert pdf_info_dict["_parse_type"] == "txt"
+    assert len(union_pages) == len(txt_pages)
+    for page_id, page_info in enumerate(union_pages):
+        if page_id == 1:
+            assert page_info.pop("_parse_type") == "ocr"
+            assert page_info["preproc_blocks"] == ocr_pages[page_id]["preproc_blocks"]
+        else:
+            assert "_parse_type" not in page_info
+            assert page_info["preproc_blocks"] == txt_pages[page_id]["preproc_blocks"]
@@ -0,0 +1,54 @@
+import copy
+from collections import OrderedDict
+
+import magic_pdf.pre_proc.citationmarker_remove as citationmarker_remove_module
+from magic_pdf.pre_proc.citationmarker_remove import remove_citation_marker
+
+
+class FakeNLPModel:
+    def __init__(self, entities):
+        self.entities = entities
+        self.batches = []
+
+    def detect_entity_catgr_using_nlp_batch(self, texts, threshold=0.5):
+        self.batches.append(list(texts))
+        return [self.entities.get(text) for text in texts]
+
+
+def make_span(text, x0, size=10, raised=False):
+    y0, y1 = (0, 6) if raised else (2, 12)
+    width = 5 * len(text)
+    chars = [{"c": c, "bbox": [x0 + 5 * i, y0, x0 + 5 * (i + 1), y1]} for i, c in enumerate(text)]
+    return {"bbox": [x0, y0, x0 + width, y1], "size": size, "chars": chars}
+
+
+def make_line(pre_text, marker_text):
+    """
+    正文span后面紧跟一个字号更小、位置更高的上标span
+    """
+    pre_span = make_span(pre_text, 0)
+    marker_span = make_span(marker_text, pre_span["bbox"][2], size=6, raised=True)
+    return {"spans": [pre_span, marker_span], "text": pre_text + marker_text}
+
+
+'''
+不需要NLP的规则先判断，剩下的候选整页只做一次批量实体识别，识别结果有缓存
+'''
+def test_remove_citation_marker_batched(monkeypatch):
+    fake_nlp_model = FakeNLPModel({"Albert Einstein": "PERSON", "Some text": None})
+    monkeypatch.setattr(citationmarker_remove_module, "__NLP_MODEL", fake_nlp_model)
+    monkeypatch.setattr(citationmarker_remove_module, "__entity_cache", OrderedDict())
+
+    blocks = [
+        {"lines": [make_line("Albert Einstein", "1"), make_line("Some text", "2")]},
+        {"lines": [make_line("end of sentence.", "3"), make_line("Albert Einstein", "4"),
+                   make_line("Some text", "[5]"), make_line("lowercase", "6")]},
+    ]
+    result = remove_citation_marker(copy.deepcopy(blocks))
+    assert [line["text"] for blk in result for line in blk["lines"]] == [
+        "Albert Einstein", "Some text2", "end of sentence.", "Albert Einstein", "Some text", "lowercase"]
+    assert fake_nlp_model.batches == [["Albert Einstein", "Some text"]]
+
+    '''同样的文本再出现时直接用缓存'''
+    assert remove_citation_marker(copy.deepcopy(blocks)) == result
+    assert len(fake_nlp_model.batches) == 1
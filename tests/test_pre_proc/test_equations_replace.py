@@ -0,0 +1,48 @@
+import random
+
+from magic_pdf.pre_proc.equations_replace import SpanCharIndex, TYPE_INLINE_EQUATION, replace_inline_equations
+
+
+def make_span(text, x0, y0=0):
+    chars = [{"c": c, "bbox": (x0 + 5 * i, y0, x0 + 5 * (i + 1), y0 + 10)} for i, c in enumerate(text)]
+    return {"bbox": (x0, y0, x0 + 5 * len(text), y0 + 10), "size": 10, "text": text, "chars": chars}
+
+
+'''
+二分查找的结果和逐个char比较的结果相同，顺序也与chars中相同，char的宽度为负、乱序、重叠时也一样
+'''
+def test_span_char_index_same_as_scan():
+    rng = random.Random(0)
+    for _ in range(200):
+        chars = []
+        for i in range(rng.randint(0, 30)):
+            x0 = rng.uniform(0, 100)
+            chars.append({"c": str(i), "bbox": (x0, 0, x0 + rng.uniform(-2, 10), 10)})
+        char_index = SpanCharIndex(chars)
+        for _ in range(20):
+            x0 = rng.uniform(-10, 110)
+            x1 = x0 + rng.uniform(-5, 30)
+            expected = [char for char in chars if not (x1 < char["bbox"][0] or x0 > char["bbox"][2])]
+            assert char_index.find_x_overlap_chars(x0, x1) == expected
+
+    chars = [{"c": "a", "bbox": (float("nan"), 0, 7, 10)}, {"c": "b", "bbox": (5, 0, 10, 10)}]
+    assert SpanCharIndex(chars).find_x_overlap_chars(6, 8) == chars
+    assert SpanCharIndex(chars).find_x_overlap_chars(8, 9) == chars[1:]
+
+
+'''
+同一行的多个行内公式依次替换，被拆开的span重新建立索引
+'''
+def test_replace_inline_equations_in_one_line():
+    line = {"bbox": (0, 0, 200, 10), "spans": [make_span("let xx and yy be", 0), make_span(" given", 80)]}
+    blocks = [{"bbox": (0, 0, 200, 10), "lines": [line]}]
+    inline_equations = [
+        {"bbox": [20, 1, 30, 9], "latex": "x^2"},
+        {"bbox": [55, 1, 65, 9], "latex": "y^2"},
+        {"bbox": [300, 1, 310, 9], "latex": "z"},  # 没有重叠的行，不替换
+    ]
+    replace_inline_equations(inline_equations, blocks)
+
+    texts = [span["text"] if span.get("_type") != TYPE_INLINE_EQUATION else span["text"].strip()
+             for span in line["spans"]]
+    assert texts == ["let ", "$x^2$", " and ", "$y^2$", " be", " given"]
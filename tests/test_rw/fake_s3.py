@@ -0,0 +1,187 @@
+"""
+进程内的s3替身，tests/test_rw下的单元测试使用；tools/benchmark/bench_s3_io.py也用它在没有网络、没有bucket的机器上测量S3ReaderWriter和list_dir的吞吐
+只实现了magic_pdf用到的接口: get_object(支持Range/IfMatch)、put_object、head_object、list_objects(分页)和分片上传
+每个请求先等待latency秒，再按单连接带宽bandwidth(字节/秒)等待传输的字节数，请求之间互不阻塞，
+所以并发的请求可以重叠等待，和真实的对象存储一样
+
+用法:
+    fake = FakeS3Client(latency=0.02, bandwidth=50 * 1024 * 1024)
+    with use_fake_s3_client(fake):
+        S3ReaderWriter("ak", "sk", "http://fake").read(...)
+        list_dir("s3://bucket/prefix/", {"ak": "ak", "sk": "sk", "endpoint": "http://fake"})
+"""
+import hashlib
+import io
+import threading
+import time
+from contextlib import contextmanager
+
+from botocore.exceptions import ClientError
+
+import magic_pdf.rw.S3ReaderWriter as s3_reader_writer_module
+
+
+def client_error(code, operation_name):
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation_name)
+
+
+class FakeS3Client:
+    def __init__(self, latency=0.0, bandwidth=None, max_keys=1000):
+        """
+        latency: 每个请求的往返延迟(秒)
+        bandwidth: 单个请求的传输速度(字节/秒)，None表示不限速
+        max_keys: list_objects每页最多返回的key数，和服务端的上限一样
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.max_keys = max_keys
+        self.__objects = {}  # (bucket, key) -> (bytes, etag)，etag在写入时算好，避免大对象每次读都重新算md5
+        self.__multipart_uploads = {}  # upload_id -> {part_number: bytes}
+        self.__lock = threading.Lock()
+        self.__stats = {}
+        '''写入这些key的put_object和upload_part都返回InternalError，用来测试上传失败'''
+        self.fail_keys = set()
+
+    def __request(self, operation_name, transfer_bytes=0):
+        with self.__lock:
+            stats = self.__stats.setdefault(operation_name, {"count": 0, "bytes": 0})
+            stats["count"] += 1
+            stats["bytes"] += transfer_bytes
+        cost = self.latency
+        if self.bandwidth:
+            cost += transfer_bytes / self.bandwidth
+        if cost > 0:
+            time.sleep(cost)
+
+    @staticmethod
+    def __etag(body):
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def stats(self):
+        """
+        每种请求的次数和传输的字节数
+        """
+        with self.__lock:
+            return {name: dict(stats) for name, stats in self.__stats.items()}
+
+    def reset_stats(self):
+        with self.__lock:
+            self.__stats = {}
+
+    def __store(self, bucket, key, body):
+        etag = self.__etag(body)
+        with self.__lock:
+            self.__objects[(bucket, key)] = (body, etag)
+        return etag
+
+    def put_object_directly(self, bucket, key, body):
+        """
+        不计延迟和统计地放入一个对象，用来准备测试数据
+        """
+        self.__store(bucket, key, bytes(body))
+
+    def get_object_directly(self, bucket, key):
+        """
+        不计延迟和统计地取出一个对象的内容，不存在时返回None，用来检查写入的结果
+        """
+        with self.__lock:
+            return self.__objects.get((bucket, key), (None, None))[0]
+
+    def list_multipart_uploads(self):
+        """
+        还没有完成或者放弃的分片上传的upload_id
+        """
+        with self.__lock:
+            return sorted(self.__multipart_uploads)
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        with self.__lock:
+            body, etag = self.__objects.get((Bucket, Key), (None, None))
+        if body is None:
+            self.__request("get_object")
+            raise client_error("NoSuchKey", "GetObject")
+        if IfMatch is not None and IfMatch != etag:
+            self.__request("get_object")
+            raise client_error("PreconditionFailed", "GetObject")
+        res = {"ETag": etag}
+        if Range is not None:
+            start, end = Range[len("bytes="):].split("-")
+            start = int(start)
+            end = len(body) - 1 if end == "" else min(int(end), len(body) - 1)
+            if start >= len(body):
+                self.__request("get_object")
+                raise client_error("InvalidRange", "GetObject")
+            res["ContentRange"] = f"bytes {start}-{end}/{len(body)}"
+            body = body[start:end + 1]
+        self.__request("get_object", len(body))
+        res["ContentLength"] = len(body)
+        res["Body"] = io.BytesIO(body)
+        return res
+
+    def put_object(self, Body, Bucket, Key):
+        body = bytes(Body)
+        self.__request("put_object", len(body))
+        if Key in self.fail_keys:
+            raise client_error("InternalError", "PutObject")
+        return {"ETag": self.__store(Bucket, Key, body)}
+
+    def head_object(self, Bucket, Key):
+        self.__request("head_object")
+        with self.__lock:
+            body, etag = self.__objects.get((Bucket, Key), (None, None))
+        if body is None:
+            raise client_error("404", "HeadObject")
+        return {"ContentLength": len(body), "ETag": etag}
+
+    def list_objects(self, Bucket, Prefix="", Marker="", MaxKeys=1000):
+        self.__request("list_objects")
+        with self.__lock:
+            keys = sorted(key for bucket, key in self.__objects if bucket == Bucket and key.startswith(Prefix) and key > Marker)
+            sizes = {key: len(self.__objects[(Bucket, key)][0]) for key in keys}
+        page_size = min(MaxKeys, self.max_keys)
+        return {
+            "IsTruncated": len(keys) > page_size,
+            "Contents": [{"Key": key, "Size": sizes[key]} for key in keys[:page_size]],
+        }
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.__request("create_multipart_upload")
+        with self.__lock:
+            upload_id = f"upload-{len(self.__multipart_uploads)}-{time.monotonic_ns()}"
+            self.__multipart_uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        body = bytes(Body)
+        self.__request("upload_part", len(body))
+        if Key in self.fail_keys:
+            raise client_error("InternalError", "UploadPart")
+        with self.__lock:
+            self.__multipart_uploads[UploadId][PartNumber] = body
+        return {"ETag": self.__etag(body)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.__request("complete_multipart_upload")
+        with self.__lock:
+            parts = self.__multipart_uploads.pop(UploadId)
+        self.__store(Bucket, Key, b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"]))
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.__request("abort_multipart_upload")
+        with self.__lock:
+            self.__multipart_uploads.pop(UploadId, None)
+        return {}
+
+
+@contextmanager
+def use_fake_s3_client(fake_client):
+    """
+    with块内所有S3ReaderWriter和list_dir都使用fake_client，不论传入什么连接参数
+    """
+    get_s3_client = s3_reader_writer_module.get_s3_client
+    s3_reader_writer_module.get_s3_client = lambda *args, **kwargs: fake_client
+    try:
+        yield fake_client
+    finally:
+        s3_reader_writer_module.get_s3_client = get_s3_client
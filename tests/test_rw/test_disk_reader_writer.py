@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+
+'''
+写入成功后目录里只有目标文件，没有留下临时文件
+'''
+def test_write(tmp_path):
+    disk_rw = DiskReaderWriter(str(tmp_path))
+    disk_rw.write("中文内容", "md/a.md")
+    disk_rw.write(b"\xff\xd8jpg", "images/a.jpg", AbsReaderWriter.MODE_BIN)
+    disk_rw.write(b"\xff\xd8new", str(tmp_path / "images" / "a.jpg"), AbsReaderWriter.MODE_BIN)
+    assert disk_rw.read("md/a.md") == "中文内容"
+    assert disk_rw.read("images/a.jpg", AbsReaderWriter.MODE_BIN) == b"\xff\xd8new"
+    assert os.listdir(tmp_path / "images") == ["a.jpg"]
+    with pytest.raises(ValueError):
+        disk_rw.write("content", "a.txt", "unknown")
+    assert not disk_rw.exists("a.txt")
+
+
+'''
+写到一半失败时，目标路径上还是原来的内容(或者仍然不存在)，exists不会把写了一半的文件当作已经写好
+'''
+def test_write_failure_leaves_no_partial_file(tmp_path, monkeypatch):
+    disk_rw = DiskReaderWriter(str(tmp_path))
+    disk_rw.write(b"old", "images/a.jpg", AbsReaderWriter.MODE_BIN)
+
+    def replace_killed(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(os, "replace", replace_killed)
+    for path in ["images/a.jpg", "images/b.jpg"]:
+        with pytest.raises(KeyboardInterrupt):
+            disk_rw.write(b"new content", path, AbsReaderWriter.MODE_BIN)
+    monkeypatch.undo()
+
+    assert disk_rw.read("images/a.jpg", AbsReaderWriter.MODE_BIN) == b"old"
+    assert not disk_rw.exists("images/b.jpg")
+    assert os.listdir(tmp_path / "images") == ["a.jpg"]
@@ -0,0 +1,89 @@
+import pytest
+from botocore.exceptions import ClientError
+from fake_s3 import FakeS3Client, use_fake_s3_client
+
+from magic_pdf.libs.commons import list_dir
+from magic_pdf.rw.S3ReaderWriter import S3ReaderWriter
+
+
+def error_code(exc_info):
+    return exc_info.value.response["Error"]["Code"]
+
+
+'''
+Range读取的边界和真实的s3一致: 结尾超出对象长度时截断，开头超出时返回InvalidRange
+'''
+def test_get_object_range():
+    fake = FakeS3Client()
+    content = bytes(range(100))
+    fake.put_object_directly("bucket", "a.bin", content)
+
+    res = fake.get_object(Bucket="bucket", Key="a.bin", Range="bytes=10-19")
+    assert res["Body"].read() == content[10:20]
+    assert res["ContentRange"] == "bytes 10-19/100"
+    assert res["ContentLength"] == 10
+
+    res = fake.get_object(Bucket="bucket", Key="a.bin", Range="bytes=90-")
+    assert res["Body"].read() == content[90:]
+    assert res["ContentRange"] == "bytes 90-99/100"
+
+    res = fake.get_object(Bucket="bucket", Key="a.bin", Range="bytes=95-200")
+    assert res["Body"].read() == content[95:]
+    assert res["ContentRange"] == "bytes 95-99/100"
+
+    with pytest.raises(ClientError) as exc_info:
+        fake.get_object(Bucket="bucket", Key="a.bin", Range="bytes=100-")
+    assert error_code(exc_info) == "InvalidRange"
+
+    with pytest.raises(ClientError) as exc_info:
+        fake.get_object(Bucket="bucket", Key="missing.bin")
+    assert error_code(exc_info) == "NoSuchKey"
+    assert fake.stats()["get_object"] == {"count": 5, "bytes": 10 + 10 + 5}
+
+
+'''
+IfMatch和对象当前的ETag不一致时返回PreconditionFailed，覆盖写入后旧的ETag失效
+'''
+def test_get_object_if_match():
+    fake = FakeS3Client()
+    etag = fake.put_object(Body=b"v1", Bucket="bucket", Key="a.txt")["ETag"]
+    assert fake.head_object(Bucket="bucket", Key="a.txt") == {"ContentLength": 2, "ETag": etag}
+    assert fake.get_object(Bucket="bucket", Key="a.txt", IfMatch=etag)["Body"].read() == b"v1"
+    assert fake.get_object(Bucket="bucket", Key="a.txt", Range="bytes=1-", IfMatch=etag)["Body"].read() == b"1"
+
+    new_etag = fake.put_object(Body=b"v2", Bucket="bucket", Key="a.txt")["ETag"]
+    assert new_etag != etag
+    with pytest.raises(ClientError) as exc_info:
+        fake.get_object(Bucket="bucket", Key="a.txt", IfMatch=etag)
+    assert error_code(exc_info) == "PreconditionFailed"
+
+
+'''
+list_objects按key排序分页，每页不超过MaxKeys和服务端的上限，从Marker之后继续
+'''
+def test_list_objects_pagination():
+    fake = FakeS3Client(max_keys=3)
+    keys = [f"prefix/{i:02d}.json" for i in range(8)]
+    for key in reversed(keys):
+        fake.put_object_directly("bucket", key, b"{}")
+    fake.put_object_directly("bucket", "other/00.json", b"{}")
+    fake.put_object_directly("other-bucket", "prefix/99.json", b"{}")
+
+    res = fake.list_objects(Bucket="bucket", Prefix="prefix/", MaxKeys=1000)
+    assert res["IsTruncated"]
+    assert [item["Key"] for item in res["Contents"]] == keys[:3]
+    assert res["Contents"][0]["Size"] == 2
+
+    res = fake.list_objects(Bucket="bucket", Prefix="prefix/", Marker=keys[2], MaxKeys=2)
+    assert res["IsTruncated"]
+    assert [item["Key"] for item in res["Contents"]] == keys[3:5]
+
+    res = fake.list_objects(Bucket="bucket", Prefix="prefix/", Marker=keys[4])
+    assert not res["IsTruncated"]
+    assert [item["Key"] for item in res["Contents"]] == keys[5:]
+
+    '''list_dir按分页把所有的key都列出来'''
+    with use_fake_s3_client(fake):
+        assert list_dir("s3://bucket/prefix/", {"ak": "ak", "sk": "sk", "endpoint": "http://fake"}) == \
+               [f"s3://bucket/{key}" for key in keys]
+        assert S3ReaderWriter("ak", "sk", "http://fake").client is fake
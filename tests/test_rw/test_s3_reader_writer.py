@@ -0,0 +1,92 @@
+import pickle
+
+import pytest
+from botocore.exceptions import ClientError
+from fake_s3 import FakeS3Client
+
+import magic_pdf.rw.S3ReaderWriter as s3_reader_writer_module
+from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
+from magic_pdf.rw.S3ReaderWriter import S3ReaderWriter
+
+
+def make_writer(upload_workers=0):
+    s3_rw = S3ReaderWriter("ak", "sk", "http://127.0.0.1:9000", "auto", "s3://bucket/prefix/",
+                           upload_workers=upload_workers)
+    s3_rw.client = FakeS3Client()
+    return s3_rw
+
+
+'''
+相同的连接参数共用一个client，pickle到子进程后也从进程内的池中取
+'''
+def test_client_pool():
+    s3_rw = S3ReaderWriter("ak", "sk", "http://127.0.0.1:9000")
+    assert S3ReaderWriter("ak", "sk", "http://127.0.0.1:9000").client is s3_rw.client
+    assert S3ReaderWriter("ak2", "sk", "http://127.0.0.1:9000").client is not s3_rw.client
+    assert pickle.loads(pickle.dumps(s3_rw)).client is s3_rw.client
+
+
+'''
+大对象分块并行range读取，小对象和空对象一次读完
+'''
+def test_ranged_read(monkeypatch):
+    monkeypatch.setattr(s3_reader_writer_module, "RANGE_READ_CHUNK_SIZE", 10)
+    s3_rw = make_writer()
+    content = bytes(range(95))
+    s3_rw.write(content, "big.bin", AbsReaderWriter.MODE_BIN)
+    s3_rw.write(b"small", "small.bin", AbsReaderWriter.MODE_BIN)
+    s3_rw.write(b"", "empty.bin", AbsReaderWriter.MODE_BIN)
+
+    s3_rw.client.reset_stats()
+    assert s3_rw.read("big.bin", AbsReaderWriter.MODE_BIN) == content
+    assert s3_rw.client.stats() == {"get_object": {"count": 10, "bytes": len(content)}}
+    assert s3_rw.read_jsonl("big.bin", 5, 47, AbsReaderWriter.MODE_BIN) == content[5:48]
+    assert s3_rw.read_jsonl("s3://bucket/prefix/big.bin", 90, None, AbsReaderWriter.MODE_BIN) == content[90:]
+
+    s3_rw.client.reset_stats()
+    assert s3_rw.read("small.bin") == "small"
+    assert s3_rw.read("empty.bin") == ""
+    assert s3_rw.client.stats()["get_object"]["count"] == 3
+    assert set(s3_rw.client.stats()) == {"get_object"}
+
+
+'''
+超过阈值的内容分片上传，有分片失败时放弃上传
+'''
+def test_multipart_upload(monkeypatch):
+    monkeypatch.setattr(s3_reader_writer_module, "MULTIPART_THRESHOLD", 50)
+    monkeypatch.setattr(s3_reader_writer_module, "MULTIPART_CHUNK_SIZE", 20)
+    s3_rw = make_writer()
+    content = bytes(range(95))
+    s3_rw.write(content, "big.bin", AbsReaderWriter.MODE_BIN)
+    assert s3_rw.client.stats()["upload_part"]["count"] == 5
+    assert s3_rw.read("big.bin", AbsReaderWriter.MODE_BIN) == content
+
+    s3_rw.client.fail_keys.add("prefix/broken.bin")
+    with pytest.raises(ClientError):
+        s3_rw.write(content, "broken.bin", AbsReaderWriter.MODE_BIN)
+    assert s3_rw.client.stats()["abort_multipart_upload"]["count"] == 1
+    assert not s3_rw.exists("broken.bin")
+    assert s3_rw.client.list_multipart_uploads() == []
+
+
+'''
+后台上传：flush之后全部可见，没上传完的对象也能读到和判断存在，上传失败由flush抛出
+'''
+def test_async_upload():
+    with make_writer(upload_workers=4) as s3_rw:
+        for i in range(50):
+            s3_rw.write(f"content {i}", f"images/{i}.txt")
+        assert s3_rw.exists("images/49.txt")
+        assert s3_rw.read("images/49.txt") == "content 49"
+        s3_rw.flush()
+        for i in range(50):
+            assert s3_rw.client.get_object_directly("bucket", f"prefix/images/{i}.txt") == f"content {i}".encode()
+
+        s3_rw.client.fail_keys.add("prefix/images/broken.txt")
+        s3_rw.write("content", "images/broken.txt")
+        s3_rw.write("content", "images/ok.txt")
+        with pytest.raises(ClientError):
+            s3_rw.flush()
+        assert s3_rw.client.get_object_directly("bucket", "prefix/images/ok.txt") == b"content"
+        s3_rw.flush()
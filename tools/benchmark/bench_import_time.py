@@ -0,0 +1,54 @@
+"""
+测量冷启动时导入magic_pdf入口模块的耗时(python -X importtime)，列出最慢的依赖
+每次都在新的子进程里导入，给出--budget时超出预算返回非0，可以放进CI
+
+用法:
+    python tools/benchmark/bench_import_time.py --repeat 3
+    python tools/benchmark/bench_import_time.py --module magic_pdf.pipe.UNIPipe --budget 1.0
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+code_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def import_time_of(module):
+    """
+    返回(模块导入的总耗时(秒), 每个被导入模块的累计耗时{模块名: 秒})
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [code_path, os.environ.get("PYTHONPATH")]))}
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            check=True, capture_output=True, text=True, env=env).stderr
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us) / 1e6
+    return cumulative[module], cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="magic_pdf.cli.magicpdf", help="要测量的入口模块")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快一次")
+    parser.add_argument("--top", type=int, default=15, help="列出累计耗时最多的依赖个数")
+    parser.add_argument("--budget", type=float, default=None, help="导入耗时预算(秒)，超出时返回非0")
+    args = parser.parse_args()
+
+    runs = [import_time_of(args.module) for _ in range(args.repeat)]
+    total, cumulative = min(runs, key=lambda run: run[0])
+
+    print(f"import {args.module}: {total:.3f}s")
+    for name, cost in sorted(cumulative.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {cost:8.3f}s  {name}")
+
+    if args.budget is not None and total > args.budget:
+        print(f"over budget: {total:.3f}s > {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+对比pipe产出markdown/content_list时，压缩再解压pdf_mid_data的旧路径与直接使用内存中pdf_mid_data的新路径的耗时
+用一份样例pdf的解析结果按页重复拼成一本大书，模拟长文档
+
+用法:
+    python tools/benchmark/bench_mid_data.py --pages 1000 --repeat 3
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from magic_pdf.libs.json_compressor import JsonCompressor
+from magic_pdf.pipe.AbsPipe import AbsPipe
+from magic_pdf.pipe.UNIPipe import UNIPipe
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+
+pdf_dev_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                            "tests", "test_cli", "pdf_dev")
+
+
+def build_big_mid_data(sample_name, pages):
+    with open(os.path.join(pdf_dev_path, f"{sample_name}.pdf"), "rb") as f:
+        pdf_bytes = f.read()
+    with open(os.path.join(pdf_dev_path, f"{sample_name}.json"), "r", encoding="utf-8") as f:
+        model_list = json.load(f)
+    with tempfile.TemporaryDirectory() as image_dir:
+        pipe = UNIPipe(pdf_bytes, model_list, DiskReaderWriter(image_dir))
+        pipe.pipe_classify()
+        pipe.pipe_parse()
+    sample_pages = pipe.pdf_mid_data["pdf_info"]
+    '''按页重复样例，拼成一本指定页数的大书'''
+    pdf_info = [sample_pages[i % len(sample_pages)] for i in range(pages)]
+    return {**pipe.pdf_mid_data, "pdf_info": pdf_info}
+
+
+def timeit(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sample", default="p3_图文混排84", help="tests/test_cli/pdf_dev 下的样例名(不含扩展名)")
+    parser.add_argument("--pages", type=int, default=1000, help="拼出的大书页数")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最快一次")
+    args = parser.parse_args()
+
+    pdf_mid_data = build_big_mid_data(args.sample, args.pages)
+    img_buket_path = "images"
+
+    '''旧路径：每次生成markdown/content_list前都要压缩一次再解压一次'''
+    def round_trip():
+        AbsPipe.mk_markdown(JsonCompressor.compress_json(pdf_mid_data), img_buket_path)
+        AbsPipe.mk_uni_format(JsonCompressor.compress_json(pdf_mid_data), img_buket_path)
+
+    '''新路径：直接使用内存中的pdf_mid_data'''
+    def in_memory():
+        AbsPipe.mk_markdown_by_mid_data(pdf_mid_data, img_buket_path)
+        AbsPipe.mk_uni_format_by_mid_data(pdf_mid_data, img_buket_path)
+
+    compress_cost = timeit(lambda: JsonCompressor.compress_json(pdf_mid_data), args.repeat)
+    compressed = JsonCompressor.compress_json(pdf_mid_data)
+    decompress_cost = timeit(lambda: JsonCompressor.decompress_json(compressed), args.repeat)
+    round_trip_cost = timeit(round_trip, args.repeat)
+    in_memory_cost = timeit(in_memory, args.repeat)
+
+    print(f"pages: {args.pages}, compressed size: {len(compressed)} chars")
+    print(f"compress: {compress_cost:.3f}s, decompress: {decompress_cost:.3f}s")
+    print(f"markdown + content_list with round trip: {round_trip_cost:.3f}s")
+    print(f"markdown + content_list in memory:       {in_memory_cost:.3f}s")
+    print(f"saved per document: {round_trip_cost - in_memory_cost:.3f}s "
+          f"({(round_trip_cost - in_memory_cost) / round_trip_cost:.1%})")
+
+
+if __name__ == "__main__":
+    main()
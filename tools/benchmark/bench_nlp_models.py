@@ -0,0 +1,65 @@
+"""
+测量NLPModels的冷启动开销：导入、构造NLPModels、第一次实体检测的耗时和进程RSS峰值
+每次都在新的子进程里跑，模拟一个刚启动的worker
+
+用法:
+    python tools/benchmark/bench_nlp_models.py --repeat 3
+    python tools/benchmark/bench_nlp_models.py --text "张三, 李四，王五; 赵六"
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+CHILD_CODE = r"""
+import json
+import resource
+import sys
+import time
+
+start = time.perf_counter()
+from magic_pdf.libs.nlp_utils import NLPModels
+import_cost = time.perf_counter() - start
+
+start = time.perf_counter()
+nlp_model = NLPModels()
+init_cost = time.perf_counter() - start
+init_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+start = time.perf_counter()
+result = nlp_model.detect_entity_catgr_using_nlp(sys.argv[1])
+first_detect_cost = time.perf_counter() - start
+
+print(json.dumps({
+    "import": import_cost,
+    "init": init_cost,
+    "first_detect": first_detect_cost,
+    "init_rss_mb": init_rss / 1024,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "result": result,
+}))
+"""
+
+
+def run_once(text):
+    output = subprocess.run([sys.executable, "-c", CHILD_CODE, text], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--text", default="John Doe, Jane Smith; Alice Johnson", help="第一次实体检测用的文本")
+    parser.add_argument("--repeat", type=int, default=3, help="重复启动的次数，取最快一次")
+    args = parser.parse_args()
+
+    runs = [run_once(args.text) for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run["import"] + run["init"] + run["first_detect"])
+
+    print(f"text: {args.text!r}, result: {best['result']}")
+    print(f"import: {best['import']:.3f}s, NLPModels(): {best['init']:.3f}s, first detect: {best['first_detect']:.3f}s")
+    print(f"import + first document: {best['import'] + best['init'] + best['first_detect']:.3f}s")
+    print(f"rss after NLPModels(): {best['init_rss_mb']:.1f}MB, peak rss: {best['peak_rss_mb']:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+用进程内的s3替身(tests/test_rw/fake_s3.py，和单元测试共用)测量ReaderWriter层的I/O，不需要网络和真实的bucket
+延迟和单连接带宽可以调，用来验证并发、连接池、分片这类改动的效果
+- read_jsonl: 整个大jsonl对象的读取(单次GET与分块并行range读取对比)，以及按行的随机range读取
+- crop upload storm: 对样例pdf的每一页切出大量截图，分别用DiskReaderWriter、同步上传、后台上传写出，以及用skip_existing_images重跑
+- list_dir: commons.list_dir列出大量key时的分页
+
+用法:
+    python tools/benchmark/bench_s3_io.py --latency 0.02 --bandwidth 50
+    python tools/benchmark/bench_s3_io.py --only list_dir --keys 20000
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+import magic_pdf.rw.S3ReaderWriter as s3_reader_writer_module
+from magic_pdf.libs.commons import fitz, list_dir
+from magic_pdf.libs.pdf_image_tools import cut_image, skip_existing_images
+from magic_pdf.rw.AbsReaderWriter import AbsReaderWriter
+from magic_pdf.rw.DiskReaderWriter import DiskReaderWriter
+from magic_pdf.rw.S3ReaderWriter import S3ReaderWriter
+
+tests_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tests")
+pdf_dev_path = os.path.join(tests_path, "test_cli", "pdf_dev")
+
+sys.path.append(os.path.join(tests_path, "test_rw"))
+from fake_s3 import FakeS3Client, use_fake_s3_client
+
+s3_profile = {"ak": "ak", "sk": "sk", "endpoint": "http://fake-s3"}
+
+
+def new_fake_client(args):
+    return FakeS3Client(latency=args.latency, bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None)
+
+
+def timeit(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def print_stats(title, cost, fake_client):
+    requests = ", ".join(f"{name}={stats['count']}" for name, stats in sorted(fake_client.stats().items()))
+    print(f"  {title:<44} {cost:8.3f}s   requests: {requests}")
+
+
+def bench_read_jsonl(args):
+    fake_client = new_fake_client(args)
+    '''拼一个指定大小的jsonl，记下每一行的字节范围'''
+    lines = []
+    line_ranges = []
+    size = 0
+    while size < args.jsonl_mb * 1024 * 1024:
+        line = (json.dumps({"id": len(lines), "text": "x" * random.randint(200, 20000)}) + "\n").encode("utf-8")
+        line_ranges.append((size, size + len(line) - 1))
+        lines.append(line)
+        size += len(line)
+    content = b"".join(lines)
+    fake_client.put_object_directly("bucket", "dataset/big.jsonl", content)
+    print(f"read_jsonl: {size / 1024 / 1024:.1f}MB, {len(lines)} lines")
+
+    with use_fake_s3_client(fake_client):
+        s3_rw = S3ReaderWriter("ak", "sk", s3_profile["endpoint"], parent_path="s3://bucket/")
+
+        '''旧的读法：一次GET读回整个对象'''
+        chunk_size = s3_reader_writer_module.RANGE_READ_CHUNK_SIZE
+        s3_reader_writer_module.RANGE_READ_CHUNK_SIZE = len(content)
+        try:
+            fake_client.reset_stats()
+            cost, data = timeit(lambda: s3_rw.read_jsonl("dataset/big.jsonl", mode=AbsReaderWriter.MODE_BIN))
+        finally:
+            s3_reader_writer_module.RANGE_READ_CHUNK_SIZE = chunk_size
+        assert data == content
+        print_stats("whole object, single GET", cost, fake_client)
+
+        fake_client.reset_stats()
+        cost, data = timeit(lambda: s3_rw.read_jsonl("dataset/big.jsonl", mode=AbsReaderWriter.MODE_BIN))
+        assert data == content
+        print_stats(f"whole object, {chunk_size // 1024 // 1024}MB ranges", cost, fake_client)
+
+        sample_ranges = random.sample(line_ranges, min(args.range_reads, len(line_ranges)))
+
+        def read_lines():
+            for byte_start, byte_end in sample_ranges:
+                json.loads(s3_rw.read_jsonl("dataset/big.jsonl", byte_start, byte_end))
+
+        fake_client.reset_stats()
+        cost, _ = timeit(read_lines)
+        print_stats(f"{len(sample_ranges)} random line ranges", cost, fake_client)
+
+
+def crop_storm(image_writer, pages, bboxes):
+    for page_num, page in enumerate(pages):
+        for bbox in bboxes:
+            cut_image(bbox, page_num, page, "md5/images", image_writer)
+    image_writer.flush()
+
+
+def bench_upload_storm(args):
+    pdf_path = sorted(glob.glob(os.path.join(pdf_dev_path, "*.pdf")))[0]
+    pages = list(fitz.open(pdf_path))[:args.pages]
+    '''每页切成grid*grid个截图'''
+    width, height = pages[0].rect.width, pages[0].rect.height
+    bboxes = [(width * i / args.grid, height * j / args.grid, width * (i + 1) / args.grid, height * (j + 1) / args.grid)
+              for i in range(args.grid) for j in range(args.grid)]
+    print(f"crop upload storm: {len(pages)} pages x {len(bboxes)} crops")
+
+    with tempfile.TemporaryDirectory() as image_dir:
+        cost, _ = timeit(lambda: crop_storm(DiskReaderWriter(image_dir), pages, bboxes))
+    print(f"  {'DiskReaderWriter':<44} {cost:8.3f}s")
+
+    for upload_workers in (0, args.upload_workers):
+        fake_client = new_fake_client(args)
+        with use_fake_s3_client(fake_client):
+            with S3ReaderWriter("ak", "sk", s3_profile["endpoint"], parent_path="s3://bucket/",
+                                upload_workers=upload_workers) as s3_rw:
+                cost, _ = timeit(lambda: crop_storm(s3_rw, pages, bboxes))
+        title = "S3ReaderWriter, sync upload" if upload_workers == 0 \
+            else f"S3ReaderWriter, {upload_workers} upload workers"
+        print_stats(title, cost, fake_client)
+
+        '''重跑：新的writer调用skip_existing_images，每张截图一次HEAD，不再上传'''
+        fake_client.reset_stats()
+        with use_fake_s3_client(fake_client):
+            with S3ReaderWriter("ak", "sk", s3_profile["endpoint"], parent_path="s3://bucket/",
+                                upload_workers=upload_workers) as s3_rw:
+                skip_existing_images(s3_rw)
+                cost, _ = timeit(lambda: crop_storm(s3_rw, pages, bboxes))
+        print_stats(f"{title}, re-run", cost, fake_client)
+
+
+def bench_list_dir(args):
+    fake_client = new_fake_client(args)
+    for i in range(args.keys):
+        '''一半是list_dir要找的json，一半是其它文件'''
+        ext = "json" if i % 2 == 0 else "pdf"
+        fake_client.put_object_directly("bucket", f"layout_det/part-{i:08d}.{ext}", b"{}")
+    print(f"list_dir: {args.keys} keys, {fake_client.max_keys} keys per page")
+
+    with use_fake_s3_client(fake_client):
+        cost, files = timeit(lambda: list_dir("s3://bucket/layout_det/", s3_profile))
+    assert len(files) == (args.keys + 1) // 2
+    print_stats(f"list_dir ({len(files)} json files)", cost, fake_client)
+
+
+BENCHMARKS = {
+    "read_jsonl": bench_read_jsonl,
+    "upload_storm": bench_upload_storm,
+    "list_dir": bench_list_dir,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.02, help="每个请求的往返延迟(秒)")
+    parser.add_argument("--bandwidth", type=float, default=50, help="单连接带宽(MB/s)，0表示不限速")
+    parser.add_argument("--only", choices=list(BENCHMARKS), action="append", help="只跑指定的测试，可以给多次")
+    parser.add_argument("--jsonl-mb", type=int, default=64, help="read_jsonl测试的对象大小(MB)")
+    parser.add_argument("--range-reads", type=int, default=50, help="随机读取的行数")
+    parser.add_argument("--pages", type=int, default=10, help="upload storm使用的样例pdf页数")
+    parser.add_argument("--grid", type=int, default=5, help="upload storm每页切成grid*grid个截图")
+    parser.add_argument("--upload-workers", type=int, default=16, help="后台上传的线程数")
+    parser.add_argument("--keys", type=int, default=10000, help="list_dir测试的key数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    '''每次写入都有一条debug日志，会淹没结果'''
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    random.seed(args.seed)
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name](args)
+
+
+if __name__ == "__main__":
+    main()